@@ -0,0 +1,249 @@
+# Optimisation hors-ligne du profil de tangage d'ascension (module du notebook Ascent_Trajectory.ipynb)
+#
+# Les profils candidats sont intégrés tous ensemble : chaque pas de temps fait avancer N vaisseaux
+# (tableaux NumPy de kRPC_Simulator.SimState), sans boucle Python par profil. L'optimiseur est une
+# méthode d'entropie croisée (tirage d'une population, sélection des meilleurs, nouvelle gaussienne).
+#
+# Profils disponibles :
+#   'linear_tangent' : paramètres (turn_start_altitude, s), même loi que kRPC_Tools.linear_tangent
+#   'pitch_program'  : paramètres (switch_alt, scale_factor), même loi que kRPC_Tools.pitch_program
+#   'knots'          : tangage libre (°) aux altitudes KNOT_ALTITUDES, forcé décroissant
+#
+# Le profil optimisé est exporté en JSON (famille, paramètres, noeuds) : kRPC_Tools.ascent_pitch le charge
+# dans les scripts d'ascension, qui volent alors la même loi que l'optimiseur.
+
+# Librairies
+from dataclasses import dataclass, field
+import json
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'k-RPC Carrière'))
+import kRPC_Simulator as sim
+
+KNOT_ALTITUDES = np.array([0.0, 1_000.0, 5_000.0, 10_000.0, 20_000.0, 35_000.0, 50_000.0, 70_000.0])  # m
+
+PROFILES = {
+    # nom : (noms des paramètres, moyenne initiale, écart-type initial, borne basse, borne haute)
+    'linear_tangent': (['turn_start_altitude', 's'], [500.0, 8.0], [400.0, 3.0], [50.0, 1.0], [5_000.0, 30.0]),
+    'pitch_program':  (['switch_alt', 'scale_factor'], [250.0, 1.0], [300.0, 0.3], [50.0, 0.3], [5_000.0, 2.5]),
+    'knots':          ([f'pitch_{int(h)}' for h in KNOT_ALTITUDES[1:]],
+                       [85.0, 70.0, 55.0, 40.0, 25.0, 12.0, 5.0], [10.0] * 7, [0.0] * 7, [90.0] * 7),
+}
+
+#-------------------------------------------------------------------------------------------------------------
+# Lois de tangage vectorisées (une ligne de `params` par candidat)
+
+def pitch_command(profile, params, altitude, apoapsis, target_altitude, atmosphere_depth):
+    """Tangage commandé (° au-dessus de l'horizon) pour chaque candidat."""
+    if profile == 'linear_tangent':
+        turn_start, s = params[:, 0], params[:, 1]
+        h = np.minimum(altitude, 0.999 * target_altitude)
+        pitch = 90.0 - np.degrees(np.arctan(h * s / (target_altitude - h)))
+        return np.where(altitude >= turn_start, pitch, 90.0)
+    if profile == 'pitch_program':
+        switch_alt, scale_factor = params[:, 0], params[:, 1]
+        alt_diff = scale_factor * atmosphere_depth - switch_alt
+        angle = np.clip(90.0 * np.sqrt(np.maximum(apoapsis - switch_alt, 0.0) / alt_diff), 0.0, 90.0)
+        return np.where(altitude >= switch_alt, 90.0 - angle, 90.0)
+    if profile == 'knots':
+        knots = knot_values(params)
+        i = np.clip(np.searchsorted(KNOT_ALTITUDES, altitude), 1, len(KNOT_ALTITUDES) - 1)
+        x0, x1 = KNOT_ALTITUDES[i - 1], KNOT_ALTITUDES[i]
+        w = np.clip((altitude - x0) / (x1 - x0), 0.0, 1.0)
+        rows = np.arange(len(params))
+        return knots[rows, i - 1] * (1.0 - w) + knots[rows, i] * w
+    raise ValueError(f"Profil inconnu : {profile}")
+
+
+def knot_values(params):
+    """Tangage aux noeuds (90° au sol), rendu décroissant avec l'altitude."""
+    knots = np.concatenate([np.full((len(params), 1), 90.0), np.clip(params, 0.0, 90.0)], axis=1)
+    return np.minimum.accumulate(knots, axis=1)
+
+#-------------------------------------------------------------------------------------------------------------
+# Simulation d'une population de profils
+
+def simulate_profiles(profile, params, target_altitude=100_000.0, vessel=sim.DEFAULT_VESSEL,
+                      body=sim.KERBIN, dt=0.2, max_time=900.0, heading=90.0):
+    """
+    Vole N ascensions en parallèle (une par ligne de `params`) et renvoie les bilans.
+
+    Chaque vaisseau : plein gaz, staging à réservoir vide, coupure quand l'apoapse atteint la cible,
+    puis roue libre jusqu'à la sortie de l'atmosphère (ou le début de la retombée).
+
+    Returns:
+        dict de tableaux (N,) : cost, dv_ascent, dv_circularization, apoapsis, periapsis,
+        max_q, gravity_loss, drag_loss, ascent_time, ok
+    """
+    params = np.atleast_2d(np.asarray(params, dtype=float))
+    n = len(params)
+    state = sim.SimState(vessel, body, n)
+    mu = body.gravitational_parameter
+    R = body.equatorial_radius
+    state.activations[:] = 1
+    state.throttle[:] = 1.0
+
+    burning = np.ones(n, dtype=bool)
+    active = np.ones(n, dtype=bool)
+    ascent_time = np.full(n, np.nan)
+    result = {key: np.full(n, np.nan) for key in ('dv_ascent', 'apoapsis', 'semi_major_axis',
+                                                   'periapsis', 'max_q', 'gravity_loss', 'drag_loss')}
+
+    while active.any() and state.t < max_time:
+        altitude = state.altitude()
+        el = sim.orbital_elements(state.pos, state.vel, mu)
+        apoapsis = el['apoapsis'] - R
+
+        # Coupure moteur à l'apoapse visée
+        cutoff = burning & (apoapsis >= target_altitude)
+        ascent_time[cutoff] = state.t
+        burning &= ~cutoff
+        state.throttle[:] = burning
+
+        # Staging quand l'étage allumé est vide (échec si plus rien à allumer)
+        stage = state.engine_stage()
+        empty = burning & (state.prop[state.rows, stage] <= 0)
+        state.activations[empty & (state.activations < state.n_stages)] += 1
+        out_of_fuel = empty & (stage >= state.n_stages - 1)
+
+        # Fin de vol : hors atmosphère ou retombée
+        vertical = (state.pos * state.vel).sum(axis=1)
+        finished = active & ((~burning & ((altitude >= body.atmosphere_depth) | (vertical < 0))) | out_of_fuel)
+        if finished.any():
+            for key, values in (('dv_ascent', state.dv_spent), ('apoapsis', el['apoapsis']),
+                                ('semi_major_axis', el['semi_major_axis']), ('periapsis', el['periapsis']),
+                                ('max_q', state.max_q), ('gravity_loss', state.gravity_loss),
+                                ('drag_loss', state.drag_loss)):
+                result[key][finished] = values[finished]
+            active &= ~finished
+            burning &= ~finished
+
+        pitch = pitch_command(profile, params, altitude, apoapsis, target_altitude, body.atmosphere_depth)
+        state.step(dt, state.pitch_to_attitude(pitch, heading))
+
+    ra, a = result['apoapsis'], result['semi_major_axis']
+    with np.errstate(invalid='ignore'):
+        dv_circ = np.sqrt(mu / ra) - np.sqrt(mu * (2.0 / ra - 1.0 / a))
+    ok = np.isfinite(dv_circ) & (np.abs(ra - R - target_altitude) < 0.05 * target_altitude)
+    dv_total = result['dv_ascent'] + dv_circ
+    return {
+        'cost': np.where(ok, dv_total, 1e5),
+        'dv_ascent': result['dv_ascent'],
+        'dv_circularization': dv_circ,
+        'apoapsis': ra - R,
+        'periapsis': result['periapsis'] - R,
+        'max_q': result['max_q'],
+        'gravity_loss': result['gravity_loss'],
+        'drag_loss': result['drag_loss'],
+        'ascent_time': ascent_time,
+        'ok': ok,
+    }
+
+#-------------------------------------------------------------------------------------------------------------
+# Optimisation (entropie croisée)
+
+@dataclass
+class OptimizationResult:
+    profile:          str
+    parameter_names:  list
+    best_params:      np.ndarray
+    best_cost:        float
+    target_altitude:  float
+    history:          list = field(default_factory=list)  # meilleur coût par itération
+
+    def as_dict(self):
+        return dict(zip(self.parameter_names, self.best_params.tolist()))
+
+
+def optimize(profile='linear_tangent', target_altitude=100_000.0, vessel=sim.DEFAULT_VESSEL,
+             body=sim.KERBIN, population=128, elite_fraction=0.15, iterations=12, seed=0,
+             dt=0.2, verbose=True):
+    """
+    Minimise le Δv total (ascension + circularisation) pour atteindre l'orbite visée.
+
+    Chaque itération évalue toute la population en une seule simulation vectorisée.
+    """
+    names, mean, std, low, high = PROFILES[profile]
+    mean, std = np.array(mean, dtype=float), np.array(std, dtype=float)
+    low, high = np.array(low, dtype=float), np.array(high, dtype=float)
+    rng = np.random.default_rng(seed)
+    n_elite = max(2, int(population * elite_fraction))
+
+    best_params, best_cost, history = mean.copy(), np.inf, []
+    for iteration in range(iterations):
+        samples = np.clip(rng.normal(mean, std, size=(population, len(mean))), low, high)
+        samples[0] = best_params if np.isfinite(best_cost) else mean  # élitisme
+        cost = simulate_profiles(profile, samples, target_altitude, vessel, body, dt=dt)['cost']
+        order = np.argsort(cost)
+        elites = samples[order[:n_elite]]
+        if cost[order[0]] < best_cost:
+            best_cost, best_params = float(cost[order[0]]), samples[order[0]].copy()
+        mean = elites.mean(axis=0)
+        std = np.maximum(elites.std(axis=0), 1e-3 * (high - low))
+        history.append(best_cost)
+        if verbose:
+            print(f"Itération {iteration + 1:>2}/{iterations} : Δv = {best_cost:8.1f} m/s  {dict(zip(names, np.round(best_params, 2).tolist()))}")
+
+    return OptimizationResult(profile, names, best_params, best_cost, target_altitude, history)
+
+#-------------------------------------------------------------------------------------------------------------
+# Tracé et export du profil
+
+def lookup_table(result, n_points=128, body=sim.KERBIN):
+    """
+    Échantillonne le profil optimisé sur une grille uniforme (tracés du notebook).
+
+    La variable d'entrée est l'altitude (linear_tangent, knots) ou l'apoapse (pitch_program).
+    """
+    params = result.best_params[None, :]
+    if result.profile == 'pitch_program':
+        variable, x_max = 'apoapsis', result.target_altitude
+    elif result.profile == 'knots':
+        variable, x_max = 'altitude', float(KNOT_ALTITUDES[-1])
+    else:
+        variable, x_max = 'altitude', 0.99 * result.target_altitude
+    x = np.linspace(0.0, x_max, n_points)
+    rows = np.repeat(params, n_points, axis=0)
+    # Pour pitch_program, on se place au-dessus de l'altitude de bascule : seul l'apoapse compte
+    altitude = x if variable == 'altitude' else rows[:, 0] + 1.0
+    pitch = pitch_command(result.profile, rows, altitude, x, result.target_altitude, body.atmosphere_depth)
+    return {
+        'variable': variable,
+        'x0': 0.0,
+        'dx': x_max / (n_points - 1),
+        'pitch': [round(float(p), 3) for p in pitch],
+        'target_altitude': result.target_altitude,
+        'profile': result.profile,
+        'parameters': result.as_dict(),
+        'delta_v': round(result.best_cost, 1),
+    }
+
+
+def export_profile(result, path):
+    """Écrit le profil optimisé pour kRPC_Tools.ascent_pitch (paramètres de la loi, noeuds pour 'knots')."""
+    profile = {
+        'profile': result.profile,
+        'parameters': result.as_dict(),
+        'target_altitude': result.target_altitude,
+        'delta_v': round(result.best_cost, 1),
+    }
+    if result.profile == 'knots':
+        profile['knot_altitudes'] = KNOT_ALTITUDES.tolist()
+        profile['knots'] = knot_values(result.best_params[None, :])[0].tolist()
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, indent=1)
+    return profile
+
+#-------------------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    import time
+
+    start = time.perf_counter()
+    result = optimize('linear_tangent')
+    print(f"Optimisation terminée en {time.perf_counter() - start:.1f} s")
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pitch_profile.json')
+    export_profile(result, path)
+    print(f"Profil exporté : {path}")
@@ -1,7 +1,16 @@
 # Création de la fonction de telemetrie
 import krpc
+import os
+import sys
 import time
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'k-RPC Carrière'))
+from kRPC_Tools import RpcCounter, StreamRatePolicy, VesselStructureCache, stream_registry
+
+# Phase de vol (pour les fréquences des streams) selon la situation du vaisseau
+SITUATION_PHASES = {'pre_launch': 'prelaunch', 'landed': 'prelaunch', 'splashed': 'prelaunch',
+                    'flying': 'ascent', 'sub_orbital': 'coast', 'orbiting': 'orbit', 'escaping': 'orbit'}
+
 def telemetry_infos(conn):
     import time  # Assure que time est importé si non inclus
     import krpc  # Assure que kRPC est importé si non inclus
@@ -14,38 +23,30 @@ def telemetry_infos(conn):
     vessel_situation = str(vessel.situation).split(".")[-1]
 
     # Créer des streams pour récupérer les données en temps réel
-    apo_stream = conn.add_stream(getattr, vessel.orbit, 'apoapsis_altitude')
-    per_stream = conn.add_stream(getattr, vessel.orbit, 'periapsis_altitude')
-    gs_stream = conn.add_stream(getattr, vessel.flight(), 'g_force')
-    vsl_situation_stream = conn.add_stream(getattr, vessel, 'situation')
-    current_body_stream = conn.add_stream(getattr, vessel.orbit.body, 'name')
-    current_biome_stream = conn.add_stream(getattr, vessel, 'biome')
-    target_body_stream = conn.add_stream(getattr, space_center, 'target_body')
-    vessel_mass_stream = conn.add_stream(getattr, vessel, 'mass')
-    g_surface_stream = conn.add_stream(getattr, vessel.orbit.body, 'surface_gravity')
-    radius_stream = conn.add_stream(getattr, vessel.orbit.body, 'equatorial_radius')
-    altitude_stream = conn.add_stream(getattr, vessel.flight(), 'mean_altitude')
-    thrust_stream = conn.add_stream(getattr, vessel, 'thrust')
-    pressure_stream = conn.add_stream(getattr, vessel.flight(), 'static_pressure')
-
-    def get_thrust_MAX():
-        p_atm = pressure_stream() / 101325
-        return vessel.max_thrust_at(p_atm)
-
-    # Compute TWRs
-    current_TWR = thrust_stream() / (vessel_mass_stream() * g_surface_stream())
-
-    if vessel_situation == 'pre_launch':
-        max_thrust = 0
-        active_stage = vessel.control.current_stage
-        for engine in vessel.parts.engines:
-            if engine.part.stage == active_stage-1:
-                thrust = engine.max_thrust_at(pressure_stream() / 101325)
-                max_thrust += thrust
-        Max_TWR = max_thrust / (vessel_mass_stream() * g_surface_stream())
-
-    else:            
-        Max_TWR = get_thrust_MAX() / (vessel_mass_stream() * g_surface_stream())
+    # (registre partagé : un stream déjà ouvert par un autre outil sur la même connexion est réutilisé)
+    streams = stream_registry(conn)
+    apo_stream = streams.get(vessel, 'orbit.apoapsis_altitude')
+    per_stream = streams.get(vessel, 'orbit.periapsis_altitude')
+    gs_stream = streams.get(vessel, 'flight.g_force')
+    vsl_situation_stream = streams.get(vessel, 'situation')
+    current_body_stream = streams.get(vessel, 'orbit.body.name')
+    current_biome_stream = streams.get(vessel, 'biome')
+    target_body_stream = streams.get(space_center, 'target_body')
+    vessel_mass_stream = streams.get(vessel, 'mass')
+    g_surface_stream = streams.get(vessel, 'orbit.body.surface_gravity')
+    thrust_stream = streams.get(vessel, 'thrust')
+    pressure_stream = streams.get(vessel, 'flight.static_pressure')
+
+    # Fréquences adaptées à la phase de vol et à la variation de chaque signal
+    # (Q et apoapse rapides en ascension, biome à 1 Hz, corps ciblé quasi statique...)
+    rates = StreamRatePolicy(streams)
+    rates.set_phase(SITUATION_PHASES.get(vessel_situation))
+
+    # Structure du vaisseau : relue uniquement au changement d'étage (stream current_stage)
+    structure = VesselStructureCache(conn, vessel)
+    engine_names = {'snapshot': None, 'names': '-'}
+
+    body_names = {None: '-'}  # corps ciblé -> nom (un seul RPC par corps)
 
 
 
@@ -148,7 +149,7 @@ def telemetry_infos(conn):
             "position": (-60, y0 - 5*15)
         },
         "TWR":{
-            "content":f"TWR (Max): {current_TWR} ({Max_TWR})",
+            "content":f"TWR (Max): -",
             "color": (1, 1, 1),
             "size": 12,
             "position": (90, y0 - 5*15)
@@ -183,6 +184,7 @@ def telemetry_infos(conn):
 
     # Créer un dictionnaire pour stocker les objets Text créés
     texts = {}
+    shown = {}  # dernier contenu envoyé pour chaque texte
 
     # Boucle pour créer et ajouter chaque texte
     for param, settings in text_params.items():
@@ -191,12 +193,28 @@ def telemetry_infos(conn):
         text.size = settings["size"]
         text.rect_transform.position = settings["position"]
         texts[param] = text
+        shown[param] = settings["content"]
+
+    def show(param, content):
+        # Chaque écriture de Text.content est un RPC : on n'envoie que ce qui a changé
+        if shown[param] != content:
+            texts[param].content = content
+            shown[param] = content
+
+    # Nombre d'allers-retours avec le serveur par rafraîchissement
+    rpc_counter = RpcCounter(conn)
+    rpc_total = 0
+    refreshes = 0
 
     # Mise à jour des textes en temps réel
     try:
         while True:
             # Récupérer les données en temps réel
             vsl_situation = str(vsl_situation_stream()).split(".")[-1]
+            phase = SITUATION_PHASES.get(vsl_situation)
+            if phase != rates.phase:
+                rates.set_phase(phase)
+            rates.update()
             crt_body = current_body_stream()
             crt_biome = current_biome_stream()
             vsl_mass = vessel_mass_stream()/1000
@@ -205,51 +223,44 @@ def telemetry_infos(conn):
             Gs = gs_stream()
             
             # Compute TWR
-            current_TWR = thrust_stream() / (vessel_mass_stream() * g_surface_stream())
+            weight = vessel_mass_stream() * g_surface_stream()
+            current_TWR = thrust_stream() / weight
 
             # Compute Engines parameters
-            active_stage = vessel.control.current_stage
-            engine_names = []
-            names = []
-            max_thrusts = []
-            for engine in vessel.parts.engines:
-                if engine.part.stage == active_stage:
-                    engine_names.append(engine.part.title)
-                    thrust = engine.max_thrust_at(pressure_stream()/101325)
-                    max_thrusts.append(thrust)
-
-            for name in engine_names:
-                names.append(f"{name.split()[4]} {name.split()[5]}")
-
+            p_atm = pressure_stream() / 101325
             if vsl_situation == 'pre_launch':
-                max_thrust = 0
-                active_stage = vessel.control.current_stage
-                for engine in vessel.parts.engines:
-                    if engine.part.stage == active_stage-1:
-                        thrust = engine.max_thrust_at(pressure_stream() / 101325)
-                        max_thrust += thrust
-                Max_TWR = max_thrust / (vessel_mass_stream() * g_surface_stream())
+                Max_TWR = structure.max_thrust(p_atm, structure.next_stage_engines()) / weight
                 names = "-"
-
-            else:            
-                Max_TWR = get_thrust_MAX() / (vessel_mass_stream() * g_surface_stream())
-
-            try:
-                target_body = target_body_stream().name
-            except:
-                target_body = '-'
+            else:
+                Max_TWR = structure.max_thrust(p_atm) / weight
+                if engine_names['snapshot'] != structure.snapshots:
+                    engine_names['snapshot'] = structure.snapshots
+                    engine_names['names'] = [f"{e.title.split()[4]} {e.title.split()[5]}"
+                                             for e in structure.engines_in_stage(structure.current_stage)]
+                names = engine_names['names']
+
+            target = target_body_stream()
+            if target not in body_names:
+                body_names[target] = target.name
+            target_body = body_names[target]
 
             # Mettre à jour le contenu des textes avec les nouvelles valeurs
-            texts['Vessel_situation'].content = f"Status: {vsl_situation}"
-            texts['Current_body'].content = f"Current Body: {crt_body}"
-            texts['Current_biome'].content = f"Current Biome: {crt_biome}"
-            texts['Target_body'].content = f"Target Body: {target_body}"
-            texts['Mass'].content = f"Mass: {vsl_mass:.3f} To"
-            texts['TWR'].content = f"TWR (Max): {current_TWR:.2f} ({Max_TWR:.2f})"
-            texts["Apo"].content = f"Apoapsis: {apo:.3f} km"
-            texts["Per"].content = f"Periapsis: {per:.3f} km"
-            texts["Gs"].content = f"G-Force: {Gs:.1f}"
-            texts['Engine_names'].content = f"{names}"
+            show('Vessel_situation', f"Status: {vsl_situation}")
+            show('Current_body', f"Current Body: {crt_body}")
+            show('Current_biome', f"Current Biome: {crt_biome}")
+            show('Target_body', f"Target Body: {target_body}")
+            show('Mass', f"Mass: {vsl_mass:.3f} To")
+            show('TWR', f"TWR (Max): {current_TWR:.2f} ({Max_TWR:.2f})")
+            show("Apo", f"Apoapsis: {apo:.3f} km")
+            show("Per", f"Periapsis: {per:.3f} km")
+            show("Gs", f"G-Force: {Gs:.1f}")
+            show('Engine_names', f"{names}")
+
+            refreshes += 1
+            rpc_total += rpc_counter.delta()
+            if refreshes % 50 == 0:
+                print(f"\rRPC par rafraîchissement : {rpc_total / 50:5.1f}   ", end='', flush=True)
+                rpc_total = 0
 
             # Attendre un petit moment avant la prochaine mise à jour
             time.sleep(0.1)
@@ -258,19 +269,11 @@ def telemetry_infos(conn):
         print("\nScript interrompu.")
 
     finally:
-        vsl_situation_stream.remove()
-        current_body_stream.remove()
-        current_biome_stream.remove()
-        target_body_stream.remove()
-        vessel_mass_stream.remove()
-        g_surface_stream.remove()
-        radius_stream.remove()
-        altitude_stream.remove()
-        apo_stream.remove()
-        per_stream.remove()
-        gs_stream.remove()
-        thrust_stream.remove()
-        pressure_stream.remove()
+        for handle in (vsl_situation_stream, current_body_stream, current_biome_stream, target_body_stream,
+                       vessel_mass_stream, g_surface_stream, apo_stream, per_stream, gs_stream,
+                       thrust_stream, pressure_stream):
+            handle.release()
+        structure.release()
         print("Streams déconnectés")
 
 
@@ -0,0 +1,517 @@
+# This file is part of k-RPC Carrière.
+
+# Réglage automatique du PID de la boucle de Q (gaz -> pression dynamique)
+#
+# Essai en relais (Åström-Hägglund) : les gaz basculent entre bias + d et bias - d selon le signe de
+# l'erreur. La boucle entre en oscillation entretenue à la période critique Pu ; l'amplitude a de Q
+# donne le gain critique Ku = 4d / (π·√(a² - ε²)) (ε : hystérésis du relais). Les règles de
+# Ziegler-Nichols transforment (Ku, Pu) en gains. Un essai de consigne en échelon vérifie ensuite le
+# réglage (dépassement, temps de réponse, IAE).
+#
+# AutoTuner a la même interface que PID (update, setpoint, integral) : il remplace le PID dans la
+# boucle d'un script de vol (kRPC_Throttle_PID.py, AUTOTUNE = True) ou du simulateur.
+#
+# Utilisation :
+#     python kRPC_AutoTune.py                 # simulateur, consigne 20 kPa
+#     python kRPC_AutoTune.py 15000 no_overshoot
+#
+#     tuner = AutoTuner(PID(kp=0.002, setpoint=20000))
+#     ... throttle = tuner.update(q, dt) ...
+#     tuner.report()                          # Ku, Pu, gains retenus, réponse à l'échelon
+
+# Librairies
+from dataclasses import dataclass, field
+import math
+import sys
+import time
+import numpy as np
+
+import kRPC_Simulator as sim
+from kRPC_Tools import PID, linear_tangent
+
+# Règles de Ziegler-Nichols et variantes : (kp / Ku, Ti / Pu, Td / Pu) ; Ti = None : pas d'intégrale
+TUNING_RULES = {
+    'P':            (0.50, None, 0.0),
+    'PI':           (0.45, 1 / 1.2, 0.0),
+    'classic':      (0.60, 1 / 2, 1 / 8),
+    'pessen':       (0.70, 1 / 2.5, 3 / 20),
+    'some_overshoot': (0.33, 1 / 2, 1 / 3),
+    'no_overshoot': (0.20, 1 / 2, 1 / 3),
+}
+
+#-------------------------------------------------------------------------------------------------------------
+# Gain et période critiques
+
+@dataclass
+class UltimateGain:
+    ku:        float  # gain critique (sortie / unité de mesure, ex. gaz / Pa)
+    pu:        float  # s (période critique)
+    amplitude: float  # demi-amplitude crête à crête de la mesure pendant l'essai
+    cycles:    int    # cycles retenus pour la moyenne
+    duration:  float  # s (durée de l'essai en relais)
+    spread:    float = 0.0  # dispersion relative des périodes mesurées
+
+    def gains(self, rule='classic'):
+        """Gains {kp, ki, kd} de la règle choisie (voir TUNING_RULES)."""
+        k, ti, td = TUNING_RULES[rule]
+        kp = k * self.ku
+        return {'kp': kp, 'ki': kp / (ti * self.pu) if ti else 0.0, 'kd': kp * td * self.pu}
+
+    def pid(self, setpoint, rule='classic', production=True, **kwargs):
+        """PID réglé (mode production par défaut, voir PID.production)."""
+        make = PID.production if production else PID
+        return make(**self.gains(rule), setpoint=setpoint, **kwargs)
+
+
+class RelayExperiment:
+    """
+    Essai en relais avec hystérésis, pas à pas : update(mesure, dt) renvoie la commande.
+
+    Le biais est recentré après chaque cycle pour que les deux demi-périodes s'égalisent (la Q d'une
+    ascension dérive : sans correction, l'oscillation est asymétrique et Pu faussée).
+    """
+
+    def __init__(self, setpoint, amplitude, bias, hysteresis=0.0, cycles=4, skip=1, max_time=60.0,
+                 min_output=0.0, max_output=1.0, tolerance=0.15):
+        """
+        Args:
+            amplitude: d, demi-amplitude du relais (unités de sortie)
+            bias: sortie moyenne de départ (ex. gaz qui maintiennent à peu près la consigne)
+            hysteresis: ε, bande morte autour de la consigne (unités de mesure, contre le bruit)
+            cycles: cycles moyennés ; skip : premiers cycles ignorés (transitoire)
+            tolerance: dispersion relative maximale des périodes pour conclure avant max_time
+        """
+        self.setpoint = setpoint
+        self.amplitude = amplitude
+        self.bias = bias
+        self.hysteresis = hysteresis
+        self.cycles = cycles
+        self.skip = skip
+        self.max_time = max_time
+        self.min_output = min_output
+        self.max_output = max_output
+        self.tolerance = tolerance
+
+        self.t = 0.0
+        self.high = True
+        self.periods = []     # s
+        self.amplitudes = []  # demi crête à crête
+        self._cycle_start = None
+        self._switch_t = 0.0
+        self._high_time = 0.0
+        self._low = math.inf
+        self._peak = -math.inf
+        self.done = False
+
+    def update(self, current_value, dt):
+        self.t += dt
+        error = self.setpoint - current_value
+        self._low = min(self._low, current_value)
+        self._peak = max(self._peak, current_value)
+
+        if self.high and error < -self.hysteresis:
+            self.high = False
+            self._high_time = self.t - self._switch_t
+            self._switch_t = self.t
+        elif not self.high and error > self.hysteresis:
+            # Mesure repassée sous la consigne : fin d'un cycle complet
+            self.high = True
+            if self._cycle_start is not None:
+                period = self.t - self._cycle_start
+                self.periods.append(period)
+                self.amplitudes.append((self._peak - self._low) / 2)
+                low_time = self.t - self._switch_t
+                self.bias += self.amplitude * (self._high_time - low_time) / period
+                self.bias = min(max(self.bias, self.min_output + self.amplitude), self.max_output - self.amplitude)
+            self._cycle_start = self._switch_t = self.t
+            self._low, self._peak = math.inf, -math.inf
+            self.done = self._converged() or self.t >= self.max_time
+        elif self.t >= self.max_time:
+            self.done = True
+
+        output = self.bias + self.amplitude if self.high else self.bias - self.amplitude
+        return min(max(output, self.min_output), self.max_output)
+
+    def _retained(self):
+        return self.periods[self.skip:][-self.cycles:], self.amplitudes[self.skip:][-self.cycles:]
+
+    def _converged(self):
+        periods, _ = self._retained()
+        return len(periods) >= self.cycles and np.ptp(periods) <= self.tolerance * np.mean(periods)
+
+    def result(self):
+        """UltimateGain mesuré (ValueError si aucun cycle complet n'a été observé)."""
+        periods, amplitudes = self._retained()
+        if not periods:
+            raise ValueError(f"Pas d'oscillation entretenue en {self.t:.1f} s (amplitude du relais trop faible ?)")
+        a = float(np.mean(amplitudes))
+        ku = 4 * self.amplitude / (math.pi * math.sqrt(max(a ** 2 - self.hysteresis ** 2, 1e-12)))
+        pu = float(np.mean(periods))
+        return UltimateGain(ku, pu, a, len(periods), self.t, float(np.ptp(periods) / pu))
+
+#-------------------------------------------------------------------------------------------------------------
+# Réponse à un échelon de consigne
+
+@dataclass
+class StepResponse:
+    initial:        float  # mesure avant l'échelon
+    setpoint:       float
+    overshoot:      float  # % de l'échelon
+    rise_time:      float  # s (10 % -> 90 % de l'échelon ; nan si jamais atteint)
+    settling_time:  float  # s (entrée définitive dans la bande ; nan si jamais stabilisé)
+    iae:            float  # intégrale de |erreur| (unités·s)
+    steady_error:   float  # erreur moyenne sur le dernier quart de la fenêtre
+    band:           float  # fraction de l'échelon
+    t:              np.ndarray = field(default=None, repr=False)
+    y:              np.ndarray = field(default=None, repr=False)
+
+    def report(self, unit='Pa'):
+        print(f"Échelon {self.initial:.0f} -> {self.setpoint:.0f} {unit} : dépassement {self.overshoot:.1f} %, "
+              f"montée {self.rise_time:.2f} s, stabilisation (±{self.band * 100:.0f} %) {self.settling_time:.2f} s, "
+              f"IAE {self.iae:.0f} {unit}·s, erreur finale {self.steady_error:+.0f} {unit}")
+
+
+def step_response(t, y, setpoint, initial=None, band=0.05):
+    """Mesures de la réponse y(t) (t = 0 à l'échelon) vers setpoint."""
+    t = np.asarray(t, dtype=float)
+    y = np.asarray(y, dtype=float)
+    initial = float(y[0]) if initial is None else initial
+    step = setpoint - initial
+    progress = (y - initial) / step if step else np.ones_like(y)
+
+    def first_time(mask):
+        i = np.flatnonzero(mask)
+        return float(t[i[0]]) if len(i) else math.nan
+
+    outside = np.flatnonzero(np.abs(setpoint - y) > band * abs(step))
+    if not len(outside):
+        settling = 0.0
+    elif outside[-1] + 1 < len(t):
+        settling = float(t[outside[-1] + 1])
+    else:
+        settling = math.nan
+    error = np.abs(setpoint - y)
+    return StepResponse(
+        initial=initial,
+        setpoint=setpoint,
+        overshoot=max(0.0, float(progress.max()) - 1.0) * 100,
+        rise_time=first_time(progress >= 0.9) - first_time(progress >= 0.1),
+        settling_time=settling,
+        iae=float(np.sum((error[1:] + error[:-1]) / 2 * np.diff(t))),
+        steady_error=float(np.mean((setpoint - y)[3 * len(y) // 4:])),
+        band=band,
+        t=t,
+        y=y,
+    )
+
+class StepTest:
+    """
+    Échelon de vérification dans la boucle : régulation à la consigne pendant hold s, puis consigne
+    ramenée à step_to x consigne et réponse mesurée sur window s. L'échelon est descendant : réduire
+    les gaz est toujours possible, alors qu'une Q plus haute peut demander plus que plein gaz.
+    """
+
+    def __init__(self, pid, step_to=0.95, hold=1.0, window=4.0, band=0.05):
+        self.pid = pid
+        self.target = pid.setpoint
+        self.step_to = step_to
+        self.hold = hold
+        self.window = window
+        self.band = band
+        self.result = None
+        self.saturated = 0.0  # s passées gaz au maximum pendant l'essai (consigne hors d'atteinte)
+        self._timer = 0.0
+        self._initial = None
+        self._t = []
+        self._y = []
+
+    def update(self, current_value, dt):
+        self._timer += dt
+        if self._initial is None:
+            if self._timer >= self.hold:
+                self._initial = current_value
+                self.pid.setpoint = self.step_to * self.target
+                self._timer = 0.0
+        elif self.result is None:
+            self._t.append(self._timer)
+            self._y.append(current_value)
+            if self._timer >= self.window:
+                # Échelon rapporté à l'ancienne consigne (la mesure au moment de l'échelon peut en différer)
+                self.result = step_response(self._t, self._y, self.pid.setpoint, self.target, self.band)
+                self.pid.setpoint = self.target
+        output = min(max(self.pid.update(current_value, dt), self.pid.min_output), self.pid.max_output)
+        if output >= self.pid.max_output:
+            self.saturated += dt
+        return output
+
+    @property
+    def done(self):
+        return self.result is not None
+
+#-------------------------------------------------------------------------------------------------------------
+# Réglage dans la boucle
+
+class AutoTuner:
+    """
+    Remplaçant de PID pour la boucle de Q, en quatre phases :
+        approach : le PID fourni amène la mesure vers la consigne
+        relay    : essai en relais (Ku, Pu), une fois la mesure stabilisée près de la consigne
+        step     : nouveau PID, échelon de vérification (StepTest)
+        tuned    : régulation normale avec le PID réglé
+    Si l'essai échoue (pas d'oscillation, gaz saturés), le PID d'origine reprend la main (phase 'failed').
+    """
+
+    def __init__(self, pid, amplitude=0.2, hysteresis=None, rule='PI', production=True, engage=0.95, settle=1.0,
+                 cycles=3, max_time=30.0, step_to=0.95, hold=1.0, window=4.0, band=0.05):
+        """
+        Args:
+            pid: PID d'approche (gains actuels) ; sa consigne est celle à régler
+            amplitude: demi-amplitude du relais sur les gaz (0-1)
+            hysteresis: bande morte du relais (défaut : 0.5 % de la consigne)
+            rule: règle de TUNING_RULES appliquée à (Ku, Pu)
+            production: PID réglé en mode production (PID.production) plutôt qu'avec la loi d'origine
+            engage, settle: début de l'essai après settle s de régulation (gaz non saturés ou mesure
+                au-dessus de engage x consigne)
+            step_to, hold, window, band: échelon de vérification (voir StepTest)
+        """
+        self.pid = pid
+        self.original = pid
+        self.target = pid.setpoint
+        self.amplitude = amplitude
+        self.hysteresis = 0.005 * abs(pid.setpoint) if hysteresis is None else hysteresis
+        self.rule = rule
+        self.production = production
+        self.engage = engage
+        self.settle = settle
+        self.cycles = cycles
+        self.max_time = max_time
+        self.step_test = dict(step_to=step_to, hold=hold, window=window, band=band)
+
+        self.phase = 'approach'
+        self.relay = None
+        self.ultimate = None
+        self.gains = None
+        self.step = None
+        self._test = None
+        self._timer = 0.0
+        self._output = 0.0
+
+    # Interface PID
+    @property
+    def setpoint(self):
+        return self.pid.setpoint if self.relay is None or self.phase != 'relay' else self.relay.setpoint
+
+    @property
+    def integral(self):
+        return self.pid.integral
+
+    def _clamp(self, output):
+        return min(max(output, self.pid.min_output), self.pid.max_output)
+
+    def update(self, current_value, dt):
+        if self.phase == 'approach':
+            self._output = self._clamp(self.pid.update(current_value, dt))
+            regulating = self._output < self.pid.max_output or current_value >= self.engage * self.target
+            self._timer = self._timer + dt if regulating else 0.0
+            if self._timer >= self.settle:
+                self.relay = RelayExperiment(self.target, self.amplitude, bias=self._output,
+                                             hysteresis=self.hysteresis, cycles=self.cycles, max_time=self.max_time,
+                                             min_output=self.pid.min_output, max_output=self.pid.max_output)
+                self.phase = 'relay'
+        elif self.phase == 'relay':
+            self._output = self.relay.update(current_value, dt)
+            if self.relay.done:
+                self._finish_relay()
+        elif self.phase == 'step':
+            self._output = self._test.update(current_value, dt)
+            if self._test.done:
+                self.step = self._test.result
+                self.phase = 'tuned'
+        else:
+            self._output = self._clamp(self.pid.update(current_value, dt))
+        return self._output
+
+    def _finish_relay(self):
+        try:
+            self.ultimate = self.relay.result()
+        except ValueError:
+            self.phase = 'failed'
+            self.pid = self.original
+            return
+        self.gains = self.ultimate.gains(self.rule)
+        pid = self.ultimate.pid(self.target, self.rule, self.production, min_output=self.original.min_output,
+                                max_output=self.original.max_output)
+        # Reprise sans à-coup : l'intégrale redonne la sortie moyenne du relais
+        if pid.ki:
+            pid.integral = self.relay.bias / pid.ki
+        self.pid = pid
+        self._test = StepTest(pid, **self.step_test)
+        self.phase = 'step'
+
+    @property
+    def done(self):
+        return self.phase in ('tuned', 'failed')
+
+    def report(self):
+        if self.ultimate is None:
+            print(f"Réglage automatique : {'échec (pas d’oscillation entretenue)' if self.phase == 'failed' else 'non terminé'}"
+                  f" (phase {self.phase})")
+            return
+        u = self.ultimate
+        print(f"Essai en relais : Ku = {u.ku:.5f} /Pa, Pu = {u.pu:.3f} s "
+              f"(±{self.amplitude:.2f} de gaz, Q ±{u.amplitude:.0f} Pa, {u.cycles} cycles, dispersion {u.spread * 100:.0f} %, "
+              f"{u.duration:.1f} s de vol)")
+        if u.spread > self.relay.tolerance:
+            print(f"⚠️ Périodes irrégulières (essai arrêté à {self.max_time:.0f} s) : Ku et Pu approximatifs")
+        print(f"Gains ({self.rule}) : kp={self.gains['kp']:.5f}, ki={self.gains['ki']:.5f}, kd={self.gains['kd']:.6f}")
+        if self.step is not None:
+            self.step.report()
+            if self._test.saturated > 0.1 * (self._test.hold + self._test.window):
+                print(f"⚠️ Gaz au maximum pendant {self._test.saturated:.1f} s de l'échelon : Q visée hors d'atteinte, "
+                      f"essai peu représentatif")
+
+#-------------------------------------------------------------------------------------------------------------
+# Simulateur
+
+class SimulatedAscent:
+    """
+    Ascension simulée (kRPC_Simulator.SimState, un vaisseau) pilotée pas à pas par les gaz :
+    step(gaz) -> Q. Guidage linear_tangent, staging à poussée nulle comme dans kRPC_MonteCarlo.
+
+    latency : retard de la commande (s), arrondi au pas ; en vol, les gaz envoyés par RPC ne sont
+    appliqués qu'à la frame physique suivante et la mesure du stream date de la frame précédente.
+    noise : écart-type (Pa) d'un bruit blanc ajouté à la Q mesurée (la vraie Q reste dans .q).
+    """
+
+    def __init__(self, vessel=sim.DEFAULT_VESSEL, dt=0.05, latency=0.05, target_altitude=100_000.0,
+                 turn_start_altitude=500.0, s=8.0, noise=0.0, seed=0):
+        self.state = sim.SimState(vessel, n=1)
+        self.state.activations[:] = 1
+        self.dt = dt
+        self.target_altitude = target_altitude
+        self.turn_start_altitude = turn_start_altitude
+        self.s = s
+        self._pending = [1.0] * max(int(round(latency / dt)), 0)
+        self.noise = noise
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def t(self):
+        return self.state.t
+
+    @property
+    def q(self):
+        return float(self.state.q[0])
+
+    @property
+    def apoapsis(self):
+        """Altitude de l'apoapse (m)."""
+        state = self.state
+        el = sim.orbital_elements(state.pos, state.vel, state.body.gravitational_parameter)
+        return float(el['apoapsis'][0]) - state.body.equatorial_radius
+
+    def step(self, throttle):
+        state = self.state
+        self._pending.append(throttle)
+        state.throttle[:] = self._pending.pop(0)
+        if state.available_thrust()[0] <= 0.1 and state.activations[0] < state.n_stages:
+            state.activations += 1
+        h = float(state.altitude()[0])
+        pitch = linear_tangent(min(h, 0.999 * self.target_altitude), self.target_altitude, self.s) \
+            if h >= self.turn_start_altitude else 90.0
+        state.step(self.dt, state.pitch_to_attitude(pitch))
+        if self.noise:
+            return float(state.q[0]) + self._rng.normal(0.0, self.noise)
+        return float(state.q[0])
+
+
+def run_simulated(controller, ascent=None, max_time=240.0):
+    """
+    Fait voler `controller` (PID ou AutoTuner) ; renvoie (t, q vraie, gaz) et s'arrête quand un
+    AutoTuner a fini ou quand l'apoapse visée est atteinte.
+    """
+    ascent = ascent or SimulatedAscent()
+    t, q, throttle = [], [], []
+    value = 0.0
+    while ascent.t < max_time and not getattr(controller, 'done', False):
+        output = min(max(controller.update(value, ascent.dt), 0.0), 1.0)
+        value = ascent.step(output)
+        t.append(ascent.t)
+        q.append(ascent.q)
+        throttle.append(output)
+        if ascent.apoapsis >= ascent.target_altitude:
+            break
+    return np.array(t), np.array(q), np.array(throttle)
+
+
+def tracking_metrics(t, q, throttle, setpoint):
+    """
+    Qualité de la régulation sur une ascension (mêmes critères que kRPC_MonteCarlo.q_gain_sweep) :
+    iae (Pa·s) et rms (Pa) de l'erreur tant que les gaz ont de la marge, max_q (Pa), variation
+    totale des gaz et nombre d'inversions de sens (oscillations).
+    """
+    dt = np.diff(t, prepend=0.0)
+    error = q - setpoint
+    regulated = (q > 0.5 * setpoint) & ((throttle < 0.999) | (error > 0))
+    moves = np.diff(throttle)
+    moves = moves[np.abs(moves) > 1e-6]
+    return {
+        'iae': float(np.sum(np.abs(error) * dt * regulated)),
+        'rms': float(np.sqrt(np.sum(error ** 2 * dt * regulated) / max(np.sum(dt * regulated), 1e-9))),
+        'max_q': float(q.max()),
+        'throttle_variation': float(np.abs(np.diff(throttle)).sum()),
+        'reversals': int(np.sum(moves[1:] * moves[:-1] < 0)),
+    }
+
+
+def simulated_step(pid, setpoint, ascent_kwargs=None, settle=3.0, **step_test):
+    """
+    Échelon de vérification (StepTest) d'un PID donné, lancé après settle s (cumulées) de régulation
+    (gaz non saturés), comme après l'essai en relais d'AutoTuner.
+    """
+    ascent = SimulatedAscent(**(ascent_kwargs or {}))
+    pid.setpoint = setpoint
+    test = None
+    value, regulating = 0.0, 0.0
+    while ascent.t < 240.0:
+        if test is None:
+            output = min(max(pid.update(value, ascent.dt), 0.0), 1.0)
+            regulating += ascent.dt * (output < 1.0)
+            if regulating >= settle:
+                test = StepTest(pid, **step_test)
+        else:
+            output = test.update(value, ascent.dt)
+            if test.done:
+                return test.result
+        value = ascent.step(output)
+    raise ValueError("Consigne jamais atteinte par le PID")
+
+
+def autotune_simulated(setpoint=20000, rule='PI', approach=None, vessel=sim.DEFAULT_VESSEL, **kwargs):
+    """Réglage complet sur le simulateur ; renvoie l'AutoTuner (gains, Ku/Pu, réponse à l'échelon)."""
+    tuner = AutoTuner(approach or PID(kp=0.002, setpoint=setpoint), rule=rule, **kwargs)
+    run_simulated(tuner, SimulatedAscent(vessel))
+    return tuner
+
+#-------------------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    setpoint = float(sys.argv[1]) if len(sys.argv) > 1 else 20000.0
+    rule = sys.argv[2] if len(sys.argv) > 2 else 'PI'
+
+    start = time.perf_counter()
+    tuner = autotune_simulated(setpoint, rule)
+    elapsed = time.perf_counter() - start
+    print(f"Réglage automatique de la boucle de Q ({setpoint:.0f} Pa, simulateur) en {elapsed:.2f} s de calcul\n")
+    tuner.report()
+
+    if tuner.gains is not None:
+        print(f"\nComparaison (même échelon, ±{tuner.step_test['band'] * 100:.0f} %) :")
+        for name, pid in [('manuel kp=0.002', PID(kp=0.002)),
+                          ('manuel 0.0024/0.013/0.0002', PID(kp=0.0024, ki=0.013, kd=0.0002)),
+                          *((f"{r} (auto)", tuner.ultimate.pid(setpoint, r)) for r in TUNING_RULES)]:
+            print(f"  {name:<28}", end='')
+            try:
+                simulated_step(pid, setpoint).report()
+            except ValueError as e:
+                print(e)
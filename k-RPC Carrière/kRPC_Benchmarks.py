@@ -0,0 +1,279 @@
+# This file is part of k-RPC Carrière.
+
+# Mesures de performance des outils de guidage (exécutables sans KSP)
+#
+#     python kRPC_Benchmarks.py
+
+# Librairies
+import os
+import sys
+import tempfile
+import time
+import timeit
+from kRPC_Tools import *
+from kRPC_Recorder import DEFAULT_FIELDS, FlightLog, FlightRecorder
+from kRPC_Replay import PitchLaw, ThrottlePID, replay
+
+#-------------------------------------------------------------------------------------------------------------
+# Outils de mesure
+
+def per_call(stmt, number=200_000, repeat=5, **namespace):
+    """Latence par appel (ns), meilleur de `repeat` séries de `number` appels."""
+    return min(timeit.repeat(stmt, number=number, repeat=repeat, globals=namespace)) / number * 1e9
+
+
+def print_results(title, results):
+    print(f"\n{BOLD}{title}{RESET}")
+    reference = next(iter(results.values()))
+    for name, ns in results.items():
+        print(f"  {pad(name, 44)}{ns:>9.0f} ns/appel   x{reference / ns:>5.1f}")
+
+#-------------------------------------------------------------------------------------------------------------
+# Profil de guidage : fonctions actuelles vs table précalculée
+
+def benchmark_guidance():
+    orbit_height = 100000 # m
+    atmosphere_depth = 70000 # m
+    altitudes = [i * 37.0 for i in range(2700)]
+    tangent_profile = GuidanceProfile.linear_tangent(orbit_height, s=8).lookup
+    program_profile = GuidanceProfile.pitch_program(atmosphere_depth, switch_alt=250).lookup
+
+    # Écart maximal entre la table et la fonction d'origine
+    max_error = max(abs(tangent_profile(h) - linear_tangent(h, orbit_height, 8)) for h in altitudes)
+    max_error_program = max(abs(program_profile(ap) - (90 - pitch_program(250, ap, atmosphere_depth))) for ap in altitudes)
+
+    h = 43_210.0 # m
+    print_results("linear_tangent (tangage en fonction de l'altitude)", {
+        'linear_tangent() (NumPy scalaire)': per_call('f(h, 100000, 8)', f=linear_tangent, h=h),
+        'GuidanceProfile.linear_tangent (table)': per_call('f(h)', f=tangent_profile, h=h),
+    })
+    print(f"  écart max table / fonction : {max_error:.4f} °")
+
+    print_results("pitch_program (tangage en fonction de l'apoapse)", {
+        'pitch_program() (math)': per_call('90 - f(250, h, 70000)', f=pitch_program, h=h),
+        'GuidanceProfile.pitch_program (table)': per_call('f(h)', f=program_profile, h=h),
+    })
+    print(f"  écart max table / fonction : {max_error_program:.4f} °")
+
+    # Loi complète des scripts (krpc_Tests.py, sans profil optimisé) : test d'altitude + table
+    law, _ = ascent_pitch(atmosphere_depth, orbit_height, path=None)
+    print_results("ascent_pitch (loi des scripts, pitch_program par défaut)", {
+        '90 - pitch_program() (math)': per_call('90 - f(h, h, 70000, 250, 1)', f=pitch_program, h=h),
+        'ascent_pitch() (table)': per_call('f(h, h)', f=law, h=h),
+    })
+    print("  (dans krpc_Tests.py, l'ancien pitch_program() faisait en plus un RPC atmosphere_depth par appel)")
+
+#-------------------------------------------------------------------------------------------------------------
+# Enregistrement : listes Python vs enregistreur en colonnes
+
+def benchmark_recorder():
+    row = (12.5, 3_456.7, 23_456.0, 71_000.0, 18_500.0, 0.62, 54.3, 21_000.0, 2)
+    n = 4 * 3600 * 20  # 4 h à 20 Hz
+    logs = [[] for _ in row]
+
+    def append_lists(row=row, logs=logs):
+        for log, value in zip(logs, row):
+            log.append(value)
+
+    memory = FlightRecorder(capacity=n)
+    with tempfile.TemporaryDirectory() as directory:
+        disk = FlightRecorder(capacity=n, path=os.path.join(directory, 'bench.rec'))
+        print_results(f"Enregistrement d'une ligne de {len(row)} colonnes", {
+            'listes Python (append par colonne)': per_call('f()', f=append_lists),
+            'FlightRecorder en mémoire': per_call('f(*row)', f=memory.append, row=row),
+            'FlightRecorder mmap (fichier)': per_call('f(*row)', f=disk.append, row=row),
+        })
+        disk.close()
+    list_bytes = len(row) * (8 + sys.getsizeof(1.0))  # pointeur de liste + objet float par valeur
+    print(f"  mémoire par ligne : listes ≈ {list_bytes:.0f} o (sans borne) ; enregistreur {memory.dtype.itemsize} o "
+          f"(borné à {n} lignes = {n * memory.dtype.itemsize / 1e6:.0f} Mo)")
+
+#-------------------------------------------------------------------------------------------------------------
+# Archive compressée : coût d'écriture dans la boucle et lecture partielle
+
+def benchmark_flight_log():
+    n = 4 * 3600 * 20  # 4 h à 20 Hz
+    t = np.arange(n) * 0.05
+    rows = np.zeros(n, dtype=DEFAULT_FIELDS)
+    rows['t'], rows['ut'] = t, 12_000.0 + t
+    rows['altitude'] = 80_000.0 * (1 - np.cos(t / 900))
+    rows['apoapsis'] = 100_000.0 * np.minimum(t / 300, 1)
+    rows['q'] = 20_000.0 * np.exp(-t / 200) * (1 + 0.01 * np.sin(t))
+    rows['throttle'] = np.clip(1 - t / 600, 0, 1)
+    rows['pitch'] = np.maximum(90 - t / 4, 0)
+    rows['mass'] = np.maximum(20_000.0 - 20 * t, 5_000.0)
+    rows['stage'] = t // 3600
+    values = [tuple(row) for row in rows.tolist()]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.klog')
+        rec = FlightRecorder(capacity=20 * 3600, path=os.path.join(directory, 'bench.rec'), archive=path)
+        append = rec.append
+        worst = 0.0
+        start = time.perf_counter()
+        for row in values:
+            t0 = time.perf_counter()
+            append(*row)
+            worst = max(worst, time.perf_counter() - t0)
+        elapsed = time.perf_counter() - start
+        rec.close()
+        size = os.path.getsize(path)
+
+        log = FlightLog(path)
+        start = time.perf_counter()
+        log.read()
+        full = time.perf_counter() - start
+        start = time.perf_counter()
+        column = log['q']
+        one_column = time.perf_counter() - start
+        start = time.perf_counter()
+        window = log.read(['t', 'q'], t_start=7_200, t_end=7_500)
+        one_window = time.perf_counter() - start
+
+    print(f"\n{BOLD}Archive .klog ({n} lignes, {len(DEFAULT_FIELDS)} colonnes, {len(log.index)} blocs){RESET}")
+    print(f"  écriture dans la boucle : {elapsed / n * 1e6:.2f} µs/ligne en moyenne, pire ligne {worst * 1e3:.2f} ms "
+          f"(budget à 20 Hz : 50 ms)")
+    print(f"  taille : {size / 1e6:.1f} Mo contre {n * rows.dtype.itemsize / 1e6:.1f} Mo brut (x{n * rows.dtype.itemsize / size:.1f})")
+    print(f"  lecture complète {full * 1e3:.0f} ms ; une colonne ({len(column)} valeurs) {one_column * 1e3:.0f} ms ; "
+          f"fenêtre de 5 min ({len(window)} lignes, 2 colonnes) {one_window * 1e3:.1f} ms")
+
+#-------------------------------------------------------------------------------------------------------------
+# Rejeu : une heure de télémétrie à 20 Hz à travers PID.update et linear_tangent
+
+def benchmark_replay():
+    n = 3600 * 20
+    t = np.arange(n) * 0.05
+    data = np.zeros(n, dtype=[('t', 'f8'), ('altitude', 'f8'), ('q', 'f4'), ('throttle', 'f4'), ('pitch', 'f4')])
+    data['t'] = t
+    data['altitude'] = 99_000.0 * np.minimum(t / 600, 1)
+    data['q'] = 20_000.0 + 3_000.0 * np.sin(t / 5)
+    controllers = [ThrottlePID(PID(kp=0.002, setpoint=20000), dt=0.05), PitchLaw.linear_tangent(100000, 8, 500)]
+    report = replay(data, controllers)
+    print(f"\n{BOLD}Rejeu d'une heure à 20 Hz (PID.update + linear_tangent){RESET}")
+    print(f"  {n} lignes en {report.elapsed:.2f} s ({report.elapsed / n * 1e6:.1f} µs/ligne, x{report.duration / report.elapsed:.0f} temps réel)")
+
+#-------------------------------------------------------------------------------------------------------------
+# Régulateurs : N PID.update scalaires vs un PIDBank.update
+
+def benchmark_pid_bank():
+    import kRPC_MonteCarlo as mc
+    print(f"\n{BOLD}N régulateurs PID, un pas de 0.05 s{RESET}")
+    rng = np.random.default_rng(0)
+    for n in (4, 100, 10_000):
+        measures = rng.normal(20_000.0, 2_000.0, n)
+        pids = [PID(kp=0.002, ki=0.01, kd=0.0002, setpoint=20000) for _ in range(n)]
+        bank = PIDBank.from_pids(pids)
+        number = max(200_000 // n, 20)
+        scalar = per_call('[p.update(m, 0.05) for p, m in zip(pids, values)]', number=number,
+                          pids=pids, values=measures.tolist()) / n
+        vector = per_call('bank.update(values, 0.05)', number=number, bank=bank, values=measures) / n
+        print(f"  N = {n:>6} : PID.update {scalar:>6.0f} ns/régulateur ; PIDBank.update {vector:>6.1f} ns/régulateur   x{scalar / vector:>5.1f}")
+
+    bank = PIDBank.grid(kp=np.linspace(0.0005, 0.005, 20), ki=np.linspace(0, 0.02, 10), kd=[0, 0.0001, 0.0002, 0.0005],
+                        setpoint=20000)
+    result = mc.q_gain_sweep(bank)
+    best = int(np.argmin(result['iae']))
+    print(f"  Balayage de la boucle de Q : {len(bank)} ascensions simulées en {result['elapsed']:.1f} s ; "
+          f"meilleur IAE {result['iae'][best]:.0f} Pa·s avec {result['params'][best]}")
+
+#-------------------------------------------------------------------------------------------------------------
+# PID : loi d'origine vs mode production, boucle de Q à 20 Hz sur le simulateur
+
+def benchmark_pid_modes():
+    import kRPC_AutoTune as autotune
+    setpoint = 20000 # Pa
+    print(f"\n{BOLD}Boucle de Q à 20 Hz (ascension simulée) : PID d'origine vs PID.production{RESET}")
+    print(f"  {'gains':<26}{'bruit':>7}{'mode':>12}{'IAE':>9}{'RMS':>7}{'Var. gaz':>10}{'Inversions':>12}"
+          f"{'Échelon : dépass.':>19}{'IAE':>7}")
+    for label, gains in [('0.0024 / 0.013 / 0.0002', dict(kp=0.0024, ki=0.013, kd=0.0002)),
+                         ('0.00083 / 0.00072 (auto PI)', dict(kp=0.00083, ki=0.00072))]:
+        for noise in (0.0, 50.0):
+            for mode, make in (('origine', PID), ('production', PID.production)):
+                flight = autotune.run_simulated(make(**gains, setpoint=setpoint), autotune.SimulatedAscent(noise=noise))
+                m = autotune.tracking_metrics(*flight, setpoint)
+                step = autotune.simulated_step(make(**gains), setpoint, ascent_kwargs=dict(noise=noise))
+                print(f"  {label:<26}{noise:>5.0f}Pa{mode:>12}{m['iae']:>9.0f}{m['rms']:>7.0f}"
+                      f"{m['throttle_variation']:>10.1f}{m['reversals']:>12}{step.overshoot:>17.1f} %{step.iae:>7.0f}")
+    print("  (IAE en Pa·s et RMS en Pa tant que les gaz ont de la marge ; échelon 20 -> 19 kPa)")
+
+    legacy = PID(kp=0.0024, ki=0.013, kd=0.0002, setpoint=setpoint)
+    production = PID.production(kp=0.0024, ki=0.013, kd=0.0002, setpoint=setpoint)
+    print_results("PID.update (coût par appel)", {
+        "loi d'origine": per_call('pid.update(19500.0, 0.05)', pid=legacy),
+        'mode production': per_call('pid.update(19500.0, 0.05)', pid=production),
+    })
+
+#-------------------------------------------------------------------------------------------------------------
+# Budget de Δv : DeltaVBudget (cache + streams) vs calcul mono-étage par RPC, sur le simulateur
+
+def benchmark_delta_v():
+    import kRPC_Simulator
+    from kRPC_DeltaV import DeltaVBudget
+    conn = kRPC_Simulator.connect(name='DeltaV')
+    vessel = conn.space_center.active_vessel
+    vessel.control.activate_next_stage()  # moteurs allumés, gaz à zéro
+    rpc = conn.rpc_count
+    budget = DeltaVBudget(conn, vessel)
+    budget.stages()
+    rpc = conn.rpc_count - rpc
+
+    def single_stage(delta_v=500.0):  # ancien calcul des scripts : 3 RPC, un seul étage
+        isp = vessel.specific_impulse * G0
+        return vessel.mass * (1 - math.exp(-delta_v / isp)) / (vessel.available_thrust / isp)
+
+    start = conn.rpc_count
+    single_stage()
+    budget.delta_v()
+    budget.burn_time(500.0)
+    print(f"\n{BOLD}Budget de Δv (2 étages){RESET}")
+    print(f"  Construction : {rpc} RPC (une fois par étage) ; lectures suivantes : "
+          f"{conn.rpc_count - start - 3} RPC, contre 3 RPC par appel pour le calcul mono-étage")
+
+    results = {
+        'DeltaVBudget.delta_v (cache)': per_call('budget.delta_v()', number=5_000, budget=budget),
+        'DeltaVBudget.burn_time(1500 m/s)': per_call('budget.burn_time(1500.0)', number=5_000, budget=budget),
+        # Ergols en train de brûler : chaque appel refait le parcours des étages
+        'DeltaVBudget.stages (recalcul)': per_call('budget._stages.clear(); budget.stages(1.0)', number=5_000,
+                                                   budget=budget),
+        # Part du simulateur : ses streams recalculent la valeur à chaque lecture (kRPC la garde en mémoire)
+        'dont lecture des streams (étage, poussée)': per_call('budget.structure.current_stage; budget._thrust()',
+                                                              number=5_000, budget=budget),
+        # En burn (poussée non nulle) : un stream par ressource et étage de largage relu à chaque appel
+        'lecture des streams d\'ergols (en burn)': per_call('[a() for *_, a in budget._amounts]', number=5_000,
+                                                            budget=budget),
+    }
+    print_results("Budget de Δv (coût par appel, sans RPC)", results)
+    budget.release()
+
+
+def benchmark_orbit():
+    import numpy as np
+    from kRPC_Orbit import KeplerOrbit, circularize, hohmann, solve_kepler
+    # Orbite 80 x 250 km autour de Kerbin : vecteur d'état lu une fois, tout le reste est local
+    mu, radius = 3.5316e12, 600_000.0
+    r = radius + 80_000.0
+    orbit = KeplerOrbit((r, 0.0, 0.0), (0.0, 0.0, math.sqrt(mu * (2 / r - 2 / (2 * radius + 330_000.0)))),
+                        0.0, mu, radius)
+    times = orbit.ut + np.linspace(0.0, orbit.period, 5_000)
+    anomalies = np.linspace(-math.pi, math.pi, 5_000)
+    results = {
+        'circularize (1 instant)': per_call('circularize(orbit)', number=2_000, circularize=circularize, orbit=orbit),
+        'circularize (5000 instants, par instant)': per_call('circularize(orbit, times)', number=50,
+                                                             circularize=circularize, orbit=orbit, times=times) / 5_000,
+        'hohmann (1 instant)': per_call('hohmann(orbit, 850_000.0)', number=2_000, hohmann=hohmann, orbit=orbit),
+        'solve_kepler (5000 anomalies, par anomalie)': per_call('solve_kepler(M, orbit.e)', number=200,
+                                                                solve_kepler=solve_kepler, M=anomalies, orbit=orbit) / 5_000,
+    }
+    print_results("Orbite képlérienne locale (coût par appel, sans RPC)", results)
+
+#-------------------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    benchmark_guidance()
+    benchmark_recorder()
+    benchmark_flight_log()
+    benchmark_replay()
+    benchmark_pid_bank()
+    benchmark_pid_modes()
+    benchmark_delta_v()
+    benchmark_orbit()
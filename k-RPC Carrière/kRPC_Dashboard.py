@@ -0,0 +1,113 @@
+# This file is part of k-RPC Carrière.
+
+# Tableau de bord de vol dans un processus séparé
+#
+# Le script de vol publie une ligne par tick dans un FlightRecorder en mémoire partagée
+# (multiprocessing.shared_memory) : une écriture d'environ 1 µs, jamais bloquante. Chaque tableau de
+# bord est un processus Python distinct qui relit les nouvelles lignes et les trace avec LivePlot.
+# Matplotlib ne tourne donc jamais dans le processus de vol, et plusieurs tableaux de bord peuvent
+# suivre le même vol sans ouvrir le moindre stream kRPC.
+#
+# Utilisation (script de vol) :
+#     bus = publish('Throttle_PID')
+#     launch('Throttle_PID')
+#     ...
+#     bus.append(t, altitude, apoapsis, q, throttle, pitch, twr)
+#     ...
+#     bus.close()
+#
+# Spectateur supplémentaire (autre terminal) :
+#     python kRPC_Dashboard.py Throttle_PID
+
+# Librairies
+import os
+import subprocess
+import sys
+import time
+
+from kRPC_Recorder import FlightRecorder
+
+# Une ligne par tick du script de vol
+DASHBOARD_FIELDS = [
+    ('t',        'f8'),  # s
+    ('altitude', 'f8'),  # m
+    ('apoapsis', 'f8'),  # m
+    ('q',        'f4'),  # Pa
+    ('throttle', 'f4'),  # 0-1
+    ('pitch',    'f4'),  # °
+    ('twr',      'f4'),  # -
+]
+
+# Colonne : (libellé, couleur) ; ordre d'affichage
+CHANNELS = {
+    'altitude': ('Altitude (m)', 'tab:red'),
+    'apoapsis': ('Apoapse (m)', 'tab:purple'),
+    'q':        ('Q dynamique (Pa)', 'tab:blue'),
+    'throttle': ('Gaz (0-1)', 'tab:orange'),
+    'pitch':    ('Tangage (°)', 'tab:green'),
+    'twr':      ('TWR (-)', 'tab:brown'),
+}
+
+
+def segment_name(name):
+    """Nom du segment de mémoire partagée d'un vol."""
+    return f"krpc_{name}"
+
+#-------------------------------------------------------------------------------------------------------------
+# Côté script de vol
+
+def publish(name, capacity=20 * 60 * 30, fields=DASHBOARD_FIELDS):
+    """Enregistreur partagé que les tableaux de bord liront (par défaut 30 min à 20 Hz conservées)."""
+    return FlightRecorder.shared(segment_name(name), capacity, fields)
+
+
+def launch(name, interval=200):
+    """
+    Démarre un tableau de bord dans un nouveau processus.
+
+    subprocess plutôt que multiprocessing : le script de vol (sans `if __name__ == '__main__'`)
+    n'est pas ré-importé par le processus fils.
+    """
+    return subprocess.Popen([sys.executable, os.path.abspath(__file__), name, str(interval)])
+
+#-------------------------------------------------------------------------------------------------------------
+# Côté tableau de bord
+
+def run(name, interval=200, timeout=60.0):
+    """Attache le vol `name` et affiche ses canaux jusqu'à la fermeture de la fenêtre (bloquant)."""
+    from kRPC_LivePlot import LivePlot  # matplotlib seulement dans le processus du tableau de bord
+
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            view = FlightRecorder.attach(segment_name(name))
+            break
+        except FileNotFoundError:  # le script de vol n'a pas encore publié
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.5)
+
+    columns = [column for column in CHANNELS if column in view.dtype.names]
+    plot = LivePlot([CHANNELS[column] for column in columns], title=f"Tableau de bord : {name}",
+                    figsize=(10, 1.5 + 1.5 * len(columns)))
+    seen = 0
+
+    def poll():
+        nonlocal seen
+        rows, seen = view.since(seen)
+        if len(rows):
+            plot.extend(rows['t'], *(rows[column] for column in columns))
+
+    try:
+        plot.run(poll, interval)
+    finally:
+        plot.report()
+        view.close()
+
+#-------------------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(f"Utilisation : python {os.path.basename(__file__)} <nom du vol> [intervalle ms]")
+        sys.exit(1)
+    run(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 200)
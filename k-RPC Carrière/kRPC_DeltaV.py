@@ -0,0 +1,267 @@
+# This file is part of k-RPC Carrière.
+
+# Budget de Δv et durées de burn multi-étages
+#
+# La structure du vaisseau (moteurs, masses par étage de largage) vient du VesselStructureCache, relu
+# seulement au changement d'étage. Les ergols sont suivis par un stream par ressource et par étage de
+# largage (resources_in_decouple_stage : un total par étage, pas une lecture par pièce). Moteurs coupés
+# (stream de poussée nul), ces streams ne sont pas relus : un appel lit deux streams (étage, poussée) et
+# renvoie le résultat en cache. En burn, les ergols sont relus à chaque appel et le parcours des étages
+# est refait localement (aucun RPC ; coût mesuré par benchmark_delta_v dans kRPC_Benchmarks).
+# La consommation moteurs coupés (RCS, transfert d'ergols) n'est vue qu'au burn ou au staging suivant.
+#
+# Modèle : chaque moteur puise dans les réservoirs de son propre étage de largage (ou, s'il n'en a pas,
+# dans l'étage le plus proche qui reste attaché plus longtemps). Un étage brûle jusqu'à ce que les
+# réservoirs largués à l'étage suivant soient vides ou que tous ses moteurs soient à sec, puis l'étage
+# suivant est activé et ses pièces larguées.
+#
+# Utilisation :
+#     budget = DeltaVBudget(conn, vessel)
+#     burn_time = budget.burn_time(delta_v)        # s, largages compris
+#     for stage in budget.stages(pressure=1.0):    # atm
+#         print(stage.stage, stage.delta_v, stage.burn_time)
+
+# Librairies
+import math
+from dataclasses import dataclass
+
+from kRPC_Tools import G0, VesselStructureCache, stream_registry
+
+# Densité des ressources de KSP (kg par unité)
+RESOURCE_DENSITY = {
+    'LiquidFuel':     5.0,
+    'Oxidizer':       5.0,
+    'SolidFuel':      7.5,
+    'MonoPropellant': 4.0,
+    'XenonGas':       0.1,
+    'Ore':            10.0,
+}
+
+
+@dataclass
+class StageDeltaV:
+    stage:     int    # étage actif
+    wet_mass:  float  # kg à l'allumage
+    dry_mass:  float  # kg à l'extinction (avant largage)
+    thrust:    float  # N (à l'allumage, à la pression donnée)
+    isp:       float  # s (combinée, à la pression donnée)
+    delta_v:   float  # m/s
+    burn_time: float  # s
+
+    def time_for(self, delta_v, g0=G0):
+        """Durée (s) pour fournir `delta_v` à pleine poussée depuis l'allumage de l'étage."""
+        exhaust_velocity = self.isp * g0
+        return self.wet_mass * (1 - math.exp(-delta_v / exhaust_velocity)) * exhaust_velocity / self.thrust
+
+    def twr(self, gravity):
+        return self.thrust / (self.wet_mass * gravity)
+
+
+class _WalkState:
+    """Étage courant, masse et ergols restants par étage de largage pendant un parcours."""
+
+    __slots__ = ('stage', 'mass', 'propellant')
+
+    def __init__(self, stage, mass, propellant):
+        self.stage = stage
+        self.mass = mass
+        self.propellant = propellant
+
+
+class DeltaVBudget:
+    """
+    Δv et durées de burn par étage, tenus à jour sans polling.
+
+    stages(), delta_v() et burn_time() peuvent être appelés à chaque tick de guidage : aucun RPC tant
+    que l'étage ne change pas ; moteurs coupés, deux lectures de stream et le résultat en cache ; en
+    burn, une lecture de stream par ressource et étage de largage plus un parcours des étages.
+    """
+
+    def __init__(self, conn, vessel, structure=None, g0=G0):
+        self.conn = conn
+        self.vessel = vessel
+        self.g0 = g0
+        self._owns_structure = structure is None
+        self.structure = VesselStructureCache(conn, vessel) if structure is None else structure
+        self._amounts = []       # [(étage de largage, ressource, densité, stream)]
+        self._fixed = {}         # étage de largage -> masse hors ergols (kg)
+        self._sources = {}       # id moteur -> étage de largage alimentant le moteur
+        self._engines = {}       # pression -> [(étage d'allumage, étage de largage, source, poussée, débit)]
+        self._thrust = stream_registry(conn).get(vessel, 'thrust')
+        self._flowing = False    # poussée non nulle au dernier appel
+        self._key = None         # (génération de la structure, ergols) du dernier calcul
+        self._current = None     # (étage, masse, ergols par étage de largage) pour self._key
+        self._stages = {}        # pression -> tuple de StageDeltaV pour self._key
+        self.rebuilds = 0        # relectures (changements d'étage)
+        self.walks = 0           # parcours complets des étages
+
+    # --- Structure (relue au changement d'étage) ---
+    def _rebuild(self):
+        streams = stream_registry(self.conn)
+        for *_, handle in self._amounts:
+            handle.release()
+        structure = self.structure
+        propellants = {name for engine in structure.engines for name in engine.propellants}
+        self._amounts = []
+        for stage, tanks in structure.tanks.items():
+            names = [name for name in tanks if name in propellants and tanks[name] > 0]
+            if names:
+                resources = self.vessel.resources_in_decouple_stage(stage, cumulative=False)
+                self._amounts += [(stage, name, RESOURCE_DENSITY.get(name, 0.0), streams.get(resources, 'amount', name))
+                                  for name in names]
+        propellant = self._propellant()
+        self._fixed = {stage: mass - propellant.get(stage, 0.0) for stage, mass in structure.stage_mass.items()}
+        # Masse non portée par les pièces (pièces sans physique, charge utile) : jamais larguée
+        unassigned = self.vessel.mass - sum(structure.stage_mass.values())
+        self._fixed[-1] = self._fixed.get(-1, 0.0) + max(0.0, unassigned)
+        tanks = set(propellant) | {stage for stage, *_ in self._amounts}
+        self._sources = {}
+        for engine in structure.engines:
+            candidates = [stage for stage in tanks if stage <= engine.decouple_stage]
+            self._sources[id(engine)] = max(candidates) if candidates else engine.decouple_stage
+        self._engines = {}
+        self._stages = {}
+        self.rebuilds += 1
+
+    def _propellant(self, amounts=None):
+        """Masse d'ergols (kg) par étage de largage."""
+        if amounts is None:
+            amounts = [amount() for *_, amount in self._amounts]
+        propellant = {}
+        for (stage, _, density, _), amount in zip(self._amounts, amounts):
+            propellant[stage] = propellant.get(stage, 0.0) + amount * density
+        return propellant
+
+    def _engines_at(self, pressure):
+        engines = self._engines.get(pressure)
+        if engines is None:
+            if len(self._engines) > 16:  # pression variable en montée : cache borné
+                self._engines.clear()
+            engines = self._engines[pressure] = [
+                (e.stage, e.decouple_stage, self._sources[id(e)], e.thrust_at(pressure),
+                 e.thrust_at(pressure) / (e.isp_at(pressure) * self.g0))
+                for e in self.structure.engines if e.isp_at(pressure) > 0]
+        return engines
+
+    def _update(self):
+        """Relit la structure au besoin, et les ergols seulement s'ils ont pu bouger depuis le dernier appel."""
+        structure = self.structure
+        if structure.refresh() or self._key is None:
+            self._rebuild()
+        # Une lecture de plus après la coupure : les streams d'ergols de cette frame sont les valeurs finales
+        flowing, self._flowing = self._flowing, self._thrust() > 0
+        if self._key is not None and self._key[0] == structure.snapshots and not (flowing or self._flowing):
+            return
+        amounts = tuple(amount() for *_, amount in self._amounts)
+        key = (structure.snapshots, amounts)
+        if key != self._key:
+            self._key = key
+            self._stages = {}
+            propellant = self._propellant(amounts)
+            self._current = (structure.stage, sum(self._fixed.values()) + sum(propellant.values()), propellant)
+
+    def _state(self):
+        """Copie de l'état courant (étage, masse, ergols) pour un parcours (après _update)."""
+        stage, mass, propellant = self._current
+        return _WalkState(stage, mass, dict(propellant))
+
+    # --- Parcours des étages ---
+    def _walk(self, state, pressure, delta_v=math.inf):
+        """Brûle jusqu'à `delta_v` depuis `state` (modifié) ; renvoie ([StageDeltaV] par segment, Δv non fourni)."""
+        self.walks += 1
+        engines = self._engines_at(pressure)
+        propellant = state.propellant
+        segments = []
+        while delta_v > 1e-9:
+            stage = state.stage
+            active = [e for e in engines if e[0] >= stage and e[1] < stage]
+            burning = [e for e in active if propellant.get(e[2], 0.0) > 1e-6]
+            # Réservoirs du prochain largage vides : le poids mort est largué même si d'autres moteurs poussent
+            spent = propellant.get(stage - 1, 0.0) <= 1e-6 and any(e[2] == stage - 1 for e in active)
+            if burning and not spent:
+                flow = {}
+                for _, _, source, _, engine_flow in burning:
+                    flow[source] = flow.get(source, 0.0) + engine_flow
+                thrust = sum(e[3] for e in burning)
+                total_flow = sum(flow.values())
+                exhaust_velocity = thrust / total_flow
+                duration = min(propellant[source] / rate for source, rate in flow.items())  # premier réservoir vide
+                dv = exhaust_velocity * math.log(state.mass / (state.mass - total_flow * duration))
+                if dv > delta_v:
+                    dv = delta_v
+                    duration = state.mass * (1 - math.exp(-dv / exhaust_velocity)) / total_flow
+                segments.append(StageDeltaV(stage, state.mass, state.mass - total_flow * duration, thrust,
+                                            exhaust_velocity / self.g0, dv, duration))
+                for source, rate in flow.items():
+                    propellant[source] = max(0.0, propellant[source] - rate * duration)
+                state.mass -= total_flow * duration
+                delta_v -= dv
+                continue
+            if stage <= 0:
+                break
+            # Étage suivant : largage des pièces de decouple_stage == nouvel étage
+            state.stage = stage - 1
+            state.mass -= self._fixed.get(state.stage, 0.0) + propellant.pop(state.stage, 0.0)
+        return segments, max(delta_v, 0.0)
+
+    # --- Lecture ---
+    def stages(self, pressure=0.0):
+        """Un StageDeltaV par étage encore capable de pousser, de l'étage courant au dernier."""
+        self._update()
+        stages = self._stages.get(pressure)
+        if stages is None:
+            state = self._state()
+            if len(self._stages) > 16:
+                self._stages.clear()
+            merged = {}
+            for segment in self._walk(state, pressure)[0]:
+                stage = merged.get(segment.stage)
+                if stage is None:
+                    merged[segment.stage] = segment
+                else:
+                    stage.dry_mass = segment.dry_mass
+                    stage.delta_v += segment.delta_v
+                    stage.burn_time += segment.burn_time
+            stages = self._stages[pressure] = tuple(merged.values())
+        return stages
+
+    def delta_v(self, pressure=0.0):
+        """Δv total restant (m/s) à la pression donnée (atm)."""
+        return sum(stage.delta_v for stage in self.stages(pressure))
+
+    def burn(self, delta_v, pressure=0.0):
+        """Segments de burn (StageDeltaV) pour `delta_v` m/s et Δv que les étages ne peuvent pas fournir."""
+        self._update()
+        return self._walk(self._state(), pressure, delta_v)
+
+    def burn_time(self, delta_v, pressure=0.0):
+        """Durée (s) d'un burn de `delta_v` m/s à pleine poussée, largages compris (inf si Δv insuffisant)."""
+        segments, shortfall = self.burn(delta_v, pressure)
+        return math.inf if shortfall > 1e-6 else sum(segment.burn_time for segment in segments)
+
+    def plan(self, delta_vs, pressure=0.0):
+        """Burns successifs : masse et ergols passent d'un burn au suivant ; [(segments, Δv non fourni)]."""
+        self._update()
+        state = self._state()
+        return [self._walk(state, pressure, delta_v) for delta_v in delta_vs]
+
+    def release(self):
+        for *_, handle in self._amounts:
+            handle.release()
+        self._amounts = []
+        self._thrust.release()
+        if self._owns_structure:
+            self.structure.release()
+
+#-------------------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    import kRPC_Simulator
+
+    conn = kRPC_Simulator.connect(name='DeltaV')
+    budget = DeltaVBudget(conn, conn.space_center.active_vessel)
+    for pressure in (1.0, 0.0):
+        print(f"Pression {pressure:.0f} atm : Δv total {budget.delta_v(pressure):.0f} m/s")
+        for stage in budget.stages(pressure):
+            print(f"  étage {stage.stage} : {stage.wet_mass:.0f} -> {stage.dry_mass:.0f} kg, "
+                  f"Isp {stage.isp:.0f} s, Δv {stage.delta_v:.0f} m/s, {stage.burn_time:.1f} s")
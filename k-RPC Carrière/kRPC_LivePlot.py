@@ -0,0 +1,230 @@
+# This file is part of k-RPC Carrière.
+
+# Tracé en temps réel à coût constant pour les vols longs
+#
+# Chaque courbe garde au plus `recent` échantillons bruts récents et `history` points plus anciens,
+# décimés par seaux en conservant le min et le max de chaque seau (les pics comme le max Q restent
+# visibles). Quand l'historique est plein, il est re-décimé d'un facteur 2 : la taille tracée, donc
+# le coût d'une image, ne dépend plus de la durée du vol.
+#
+# Affichage par blitting (fond mis en cache, seules les courbes sont redessinées). Les limites des axes
+# sont suivies incrémentalement et élargies par paliers géométriques : un redessin complet (axes,
+# graduations) n'a lieu que O(log n) fois.
+#
+# Utilisation :
+#     plot = LivePlot([('Altitude (m)', 'tab:red')], title="Évolution de l'altitude en temps réel")
+#     plot.run(lambda: plot.append(ut() - start_ut, altitude()), interval=100)
+
+# Librairies
+from collections import deque
+import time
+import numpy as np
+import matplotlib.pyplot as plt
+
+#-------------------------------------------------------------------------------------------------------------
+# Décimation
+
+def decimate_minmax(t, y, bucket):
+    """
+    Garde, pour chaque seau de `bucket` échantillons consécutifs, le min et le max de y
+    (dans leur ordre chronologique). len(t) doit être un multiple de bucket.
+    """
+    ty = np.stack((t.reshape(-1, bucket), y.reshape(-1, bucket)))
+    i_min = ty[1].argmin(axis=1)
+    i_max = ty[1].argmax(axis=1)
+    order = np.stack((np.minimum(i_min, i_max), np.maximum(i_min, i_max)), axis=1)
+    rows = np.arange(len(order))[:, None]
+    return ty[0][rows, order].ravel(), ty[1][rows, order].ravel()
+
+
+class MinMaxBuffer:
+    """Tampon de taille fixe : échantillons récents bruts + historique décimé min/max."""
+
+    def __init__(self, recent=2048, history=4096, bucket=8):
+        if recent % 4 or (recent // 4) % bucket or history % 4 or 2 * (recent // 4) // bucket > history // 2:
+            raise ValueError("Tailles incompatibles (recent/4 multiple de bucket, history multiple de 4)")
+        self.recent = recent
+        self.history = history
+        self.bucket = bucket
+        self._block = recent // 4  # échantillons versés dans l'historique à la fois
+        self._t = np.empty(recent)
+        self._y = np.empty(recent)
+        self._n = 0
+        self._ht = np.empty(history)
+        self._hy = np.empty(history)
+        self._h = 0
+        self.total = 0  # échantillons reçus depuis le début
+        self.t_min = self.t_max = self.y_min = self.y_max = None
+
+    def append(self, t, y):
+        if self._n == self.recent:
+            self._spill()
+        n = self._n
+        self._t[n] = t
+        self._y[n] = y
+        self._n = n + 1
+        self.total += 1
+        # Limites incrémentales (O(1), sans max() sur tout l'historique)
+        if self.t_min is None:
+            self.t_min = self.t_max = t
+            self.y_min = self.y_max = y
+        else:
+            self.t_max = t
+            if y < self.y_min:
+                self.y_min = y
+            elif y > self.y_max:
+                self.y_max = y
+
+    def extend(self, t, y):
+        for ti, yi in zip(np.asarray(t, dtype=float).tolist(), np.asarray(y, dtype=float).tolist()):
+            self.append(ti, yi)
+
+    def _spill(self):
+        """Décime le bloc le plus ancien vers l'historique (re-décimé par 2 quand il est plein)."""
+        b = self._block
+        dt, dy = decimate_minmax(self._t[:b], self._y[:b], self.bucket)
+        if self._h + len(dt) > self.history:
+            h = self._h - self._h % 4
+            ht, hy = decimate_minmax(self._ht[:h], self._hy[:h], 4)
+            self._ht[:len(ht)] = ht
+            self._hy[:len(hy)] = hy
+            self._h = len(ht)
+        self._ht[self._h:self._h + len(dt)] = dt
+        self._hy[self._h:self._h + len(dy)] = dy
+        self._h += len(dt)
+        self._t[:-b] = self._t[b:]
+        self._y[:-b] = self._y[b:]
+        self._n -= b
+
+    def data(self):
+        """(t, y) tracés : historique décimé puis échantillons récents."""
+        return (np.concatenate((self._ht[:self._h], self._t[:self._n])),
+                np.concatenate((self._hy[:self._h], self._y[:self._n])))
+
+    def __len__(self):
+        return self._h + self._n
+
+#-------------------------------------------------------------------------------------------------------------
+# Figure animée
+
+class LivePlot:
+    def __init__(self, channels, title=None, recent=2048, history=4096, bucket=8, growth=0.5, figsize=None):
+        """
+        Args:
+            channels: [(libellé, couleur), ...], une courbe (et un axe) par canal, axe des temps partagé
+            title: titre de la figure
+            recent, history, bucket: voir MinMaxBuffer
+            growth: marge ajoutée quand une limite d'axe est dépassée (fraction de l'étendue)
+        """
+        self.fig, axes = plt.subplots(len(channels), 1, sharex=True, squeeze=False,
+                                      figsize=figsize or (10, 2.5 + 2 * len(channels)))
+        self.axes = list(axes[:, 0])
+        self.buffers = [MinMaxBuffer(recent, history, bucket) for _ in channels]
+        self.lines = []
+        for ax, (label, color) in zip(self.axes, channels):
+            line, = ax.plot([], [], label=label, color=color, animated=True)
+            ax.set_ylabel(label)
+            ax.legend(loc='upper left')
+            ax.grid(axis='y')
+            self.lines.append(line)
+        if title:
+            self.axes[0].set_title(title)
+        self.axes[-1].set_xlabel("Temps (s)")
+        self.growth = growth
+        self.frame_times = deque(maxlen=500)  # s
+        self.full_redraws = 0
+        self._background = None
+        self._limits_set = False
+        self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+
+    # --- Données ---
+    def append(self, t, *values):
+        """Ajoute un échantillon (une valeur par canal)."""
+        for buffer, value in zip(self.buffers, values):
+            buffer.append(t, value)
+
+    def extend(self, t, *columns):
+        """Ajoute un lot d'échantillons (tableaux de même longueur)."""
+        for buffer, column in zip(self.buffers, columns):
+            buffer.extend(t, column)
+
+    # --- Affichage ---
+    def _on_draw(self, event):
+        # Redessin complet (démarrage, fenêtre redimensionnée, axes élargis) : nouveau fond en cache
+        self._background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_lines()
+
+    def _draw_lines(self):
+        for ax, line in zip(self.axes, self.lines):
+            ax.draw_artist(line)
+
+    def _expand(self, low, high, data_low, data_high, minimum_span):
+        """Nouvelles limites si les données sortent des limites actuelles (sinon None)."""
+        if data_low >= low and data_high <= high:
+            return None
+        span = max(data_high - data_low, minimum_span)
+        return (min(low, data_low - self.growth * span * (data_low < low)),
+                max(high, data_high + self.growth * span * (data_high > high)))
+
+    def _update_limits(self):
+        """Élargit les axes dont les données sortent des limites ; True si un redessin complet est nécessaire."""
+        live = [b for b in self.buffers if b.total]
+        if not live:
+            return False
+        first = not self._limits_set
+        self._limits_set = True
+        changed = False
+        t_min, t_max = min(b.t_min for b in live), max(b.t_max for b in live)
+        low, high = (t_min, t_min + 10.0) if first else self.axes[0].get_xlim()
+        limits = self._expand(low, high, t_min, t_max, 10.0)
+        if first or limits is not None:
+            self.axes[0].set_xlim(*(limits or (low, high)))  # axe des temps partagé
+            changed = True
+        for ax, buffer in zip(self.axes, self.buffers):
+            if not buffer.total:
+                continue
+            low, high = (buffer.y_min, buffer.y_min + 1.0) if first else ax.get_ylim()
+            limits = self._expand(low, high, buffer.y_min, buffer.y_max, 1.0)
+            if first or limits is not None:
+                ax.set_ylim(*(limits or (low, high)))
+                changed = True
+        return changed
+
+    def refresh(self):
+        """Une image : blitting des courbes, redessin complet seulement si un axe s'élargit."""
+        start = time.perf_counter()
+        for line, buffer in zip(self.lines, self.buffers):
+            line.set_data(*buffer.data())
+        canvas = self.fig.canvas
+        if self._update_limits() or self._background is None:
+            self.full_redraws += 1
+            canvas.draw()  # déclenche _on_draw
+        else:
+            canvas.restore_region(self._background)
+            self._draw_lines()
+        canvas.blit(self.fig.bbox)
+        canvas.flush_events()
+        self.frame_times.append(time.perf_counter() - start)
+
+    def run(self, poll=None, interval=100):
+        """
+        Boucle d'affichage (bloquante, plt.show) : toutes les `interval` ms, poll() puis refresh().
+        """
+        def tick():
+            if poll is not None:
+                poll()
+            self.refresh()
+        timer = self.fig.canvas.new_timer(interval=interval)
+        timer.add_callback(tick)
+        timer.start()
+        self._timer = timer  # garder une référence, sinon le timer est collecté
+        plt.show()
+
+    def report(self):
+        if not self.frame_times:
+            return
+        frames = np.array(self.frame_times) * 1e3
+        points = sum(len(b) for b in self.buffers)
+        samples = sum(b.total for b in self.buffers)
+        print(f"Image : {frames.mean():.1f} ms en moyenne, {frames.max():.1f} ms max "
+              f"({points} points tracés pour {samples} échantillons, {self.full_redraws} redessins complets)")
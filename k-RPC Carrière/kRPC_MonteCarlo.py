@@ -0,0 +1,339 @@
+# This file is part of k-RPC Carrière.
+
+# Évaluation par lots (grille ou tirage aléatoire) de paramètres de guidage d'ascension,
+# sur le simulateur hors-ligne et sur tous les cœurs (ProcessPoolExecutor).
+#
+# Utilisation :
+#     import kRPC_MonteCarlo as mc
+#     cases = mc.grid(turn_start_altitude=[250, 500, 1000], s=[4, 6, 8, 10])
+#     rows = mc.run_batch(cases)
+#     mc.print_table(rows, sort_by='dv_total')
+#
+# Sous Windows, run_batch doit être appelé sous `if __name__ == '__main__':`.
+#
+# Réglage de la boucle de Q : un vaisseau simulé par jeu de gains, tous avancés ensemble
+# (SimState vectorisé + PIDBank), sans processus ni connexion simulée :
+#     bank = PIDBank.grid(kp=[0.001, 0.002, 0.003], ki=[0, 0.01], kd=[0, 0.0002], setpoint=20000)
+#     result = mc.q_gain_sweep(bank)
+#     mc.print_sweep(result)
+
+# Librairies
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict, replace
+import itertools
+import math
+import os
+import random
+import time
+import numpy as np
+
+import kRPC_Simulator as sim
+from kRPC_Tools import PID, PIDBank, linear_tangent, pitch_program
+
+#-------------------------------------------------------------------------------------------------------------
+# Paramètres d'une ascension
+
+@dataclass
+class AscentParams:
+    guidance:            str   = 'linear_tangent'  # 'linear_tangent' ; 'pitch_program'
+    target_altitude:     float = 100_000.0  # m
+    turn_start_altitude: float = 500.0      # m
+    s:                   float = 8.0        # - (forme de la tangente linéaire)
+    scale_factor:        float = 1.0        # - (pitch_program)
+    q_setpoint:          float = 0.0        # Pa (0 = pas de régulation de Q)
+    q_kp:                float = 0.002
+    q_ki:                float = 0.0
+    q_kd:                float = 0.0
+    twr_target:          float = 0.0        # - (0 = pas de régulation du TWR)
+    heading:             float = 90.0       # °
+    dt:                  float = 0.1        # s (période de la boucle de guidage)
+    max_time:            float = 600.0      # s
+
+
+def grid(base=None, **axes):
+    """Produit cartésien des valeurs données pour chaque paramètre (les autres restent à `base`)."""
+    base = base or AscentParams()
+    names = list(axes)
+    return [replace(base, **dict(zip(names, values))) for values in itertools.product(*(axes[n] for n in names))]
+
+
+def random_sample(n, base=None, seed=None, **ranges):
+    """Tirage uniforme de n jeux de paramètres dans les intervalles (min, max) donnés."""
+    base = base or AscentParams()
+    rng = random.Random(seed)
+    return [replace(base, **{name: rng.uniform(lo, hi) for name, (lo, hi) in ranges.items()}) for _ in range(n)]
+
+#-------------------------------------------------------------------------------------------------------------
+# Vol simulé
+
+def remaining_delta_v(state):
+    """Δv restant (m/s, Isp vide) des étages encore attachés du vaisseau 0."""
+    dv = 0.0
+    mass = float(state.mass()[0])
+    first = max(int(state.activations[0]) - 1, 0)
+    for i in range(first, state.n_stages):
+        m0 = mass
+        m1 = mass - state.prop[0, i]
+        dv += state.isp_vac[i] * sim.G0 * math.log(m0 / m1)
+        mass = m1 - state.dry[i]
+    return dv
+
+
+def fly_ascent(conn, params):
+    """
+    Vole une ascension avec les mêmes lois que les scripts (linear_tangent ou pitch_program,
+    PID sur Q et/ou TWR, staging à poussée nulle) puis sort de l'atmosphère moteurs coupés.
+    La simulation avance en pas fixes de params.dt (aucun time.sleep).
+    """
+    p = params
+    vessel = conn.space_center.active_vessel
+    flight = vessel.flight()
+    body = vessel.orbit.body
+    mu = body.gravitational_parameter
+    atmosphere_depth = body.atmosphere_depth
+
+    altitude = conn.add_stream(getattr, flight, 'mean_altitude')
+    apoapsis = conn.add_stream(getattr, vessel.orbit, 'apoapsis_altitude')
+    radius = conn.add_stream(getattr, vessel.orbit, 'radius')
+    dynamic_pressure = conn.add_stream(getattr, flight, 'dynamic_pressure')
+    available_thrust = conn.add_stream(getattr, vessel, 'available_thrust')
+    thrust = conn.add_stream(getattr, vessel, 'thrust')
+    mass = conn.add_stream(getattr, vessel, 'mass')
+    current_stage = conn.add_stream(getattr, vessel.control, 'current_stage')
+
+    q_pid = PID(kp=p.q_kp, ki=p.q_ki, kd=p.q_kd, setpoint=p.q_setpoint) if p.q_setpoint > 0 else None
+    twr_pid = PID(kp=1, ki=0.05, setpoint=p.twr_target, anti_integral_windup=False) if p.twr_target > 0 else None
+
+    control = vessel.control
+    ap = vessel.auto_pilot
+    control.throttle = 1.0
+    control.activate_next_stage()
+    ap.engage()
+    ap.target_pitch_and_heading(90, p.heading)
+
+    t0 = conn.state.t
+    while conn.state.t - t0 < p.max_time:
+        h = altitude()
+        if h >= p.turn_start_altitude:
+            if p.guidance == 'pitch_program':
+                pitch = 90 - pitch_program(h, apoapsis(), atmosphere_depth, p.turn_start_altitude, p.scale_factor)
+            else:
+                pitch = linear_tangent(h, p.target_altitude, p.s)
+            ap.target_pitch_and_heading(pitch, p.heading)
+
+        throttle = 1.0
+        if q_pid is not None:
+            throttle = min(throttle, max(0.0, min(1.0, q_pid.update(dynamic_pressure(), p.dt))))
+        if twr_pid is not None:
+            twr = thrust() / (mass() * mu / radius() ** 2)
+            throttle = min(throttle, max(0.0, min(1.0, twr_pid.update(twr, p.dt))))
+        if apoapsis() >= 0.95 * p.target_altitude:
+            throttle = min(throttle, 0.25)
+        control.throttle = throttle
+
+        if available_thrust() <= 0.1 and current_stage() > 0:
+            control.activate_next_stage()
+        if apoapsis() >= p.target_altitude:
+            break
+        conn.advance(p.dt)
+
+    burn_time = conn.state.t - t0
+    control.throttle = 0.0
+    # Sortie de l'atmosphère (la traînée grignote encore l'apoapse)
+    while altitude() < atmosphere_depth and flight.vertical_speed > 0:
+        conn.advance(1.0)
+    return burn_time
+
+#-------------------------------------------------------------------------------------------------------------
+# Évaluation d'un cas (exécutée dans les processus de travail)
+
+def evaluate(params, vessel=sim.DEFAULT_VESSEL):
+    """Vole un cas et renvoie une ligne de résultats (dict)."""
+    row = {'vessel': vessel.name, **asdict(params)}
+    try:
+        conn = sim.connect(name='MonteCarlo', vessel=vessel)
+        ascent_time = fly_ascent(conn, params)
+        state = conn.state
+        mu = state.body.gravitational_parameter
+        R = state.body.equatorial_radius
+        el = sim.orbital_elements(state.pos, state.vel, mu)
+        ra, a = float(el['apoapsis'][0]), float(el['semi_major_axis'][0])
+        dv_circ = math.sqrt(mu / ra) - math.sqrt(mu * (2 / ra - 1 / a)) if math.isfinite(ra) else float('nan')
+        dv_left = remaining_delta_v(state)
+        row.update(
+            apoapsis=ra - R,
+            periapsis=float(el['periapsis'][0]) - R,
+            dv_ascent=float(state.dv_spent[0]),
+            dv_circularization=dv_circ,
+            dv_total=float(state.dv_spent[0]) + dv_circ,
+            dv_remaining=dv_left - dv_circ,
+            max_q=float(state.max_q[0]),
+            gravity_loss=float(state.gravity_loss[0]),
+            drag_loss=float(state.drag_loss[0]),
+            ascent_time=ascent_time,
+            reached=abs(ra - R - params.target_altitude) < 0.05 * params.target_altitude and dv_left >= dv_circ,
+            error='',
+        )
+    except Exception as e:
+        row.update(reached=False, error=repr(e))
+    return row
+
+
+def _evaluate_case(case):
+    return evaluate(*case)
+
+
+def run_batch(param_sets, vessels=(sim.DEFAULT_VESSEL,), max_workers=None, chunksize=None):
+    """
+    Évalue chaque jeu de paramètres sur chaque configuration de vaisseau, en parallèle.
+
+    Args:
+        param_sets: liste d'AscentParams (voir grid / random_sample)
+        vessels: configurations kRPC_Simulator.VesselConfig à croiser avec les paramètres
+        max_workers: nombre de processus (défaut : nombre de cœurs)
+        chunksize: nombre de cas envoyés par lot à chaque processus
+    Returns:
+        liste de dicts (une ligne par cas, même ordre que l'entrée)
+    """
+    cases = [(p, v) for v in vessels for p in param_sets]
+    max_workers = max_workers or os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, len(cases) // (4 * max_workers))
+    if max_workers == 1:
+        return [_evaluate_case(case) for case in cases]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_evaluate_case, cases, chunksize=chunksize))
+
+#-------------------------------------------------------------------------------------------------------------
+# Balayage vectorisé des gains de la boucle de Q
+
+def q_gain_sweep(bank, vessel=sim.DEFAULT_VESSEL, target_altitude=100_000.0, turn_start_altitude=500.0, s=8.0,
+                 dt=0.05, max_time=300.0):
+    """
+    Vole une ascension par régulateur du banc, toutes en même temps : même guidage (linear_tangent),
+    gaz = PID sur Q borné à [0, 1], staging à poussée nulle, moteurs coupés à l'apoapse visée.
+
+    Args:
+        bank: PIDBank (setpoint = Q visée, Pa), un vaisseau simulé par régulateur
+    Returns:
+        dict de tableaux (N,) : iae (Pa·s), rms (Pa) et overshoot (Pa) de l'erreur de Q pendant la
+        régulation (gaz non saturés à 1), throttle_variation (somme des |Δgaz|), reversals (changements de sens des gaz),
+        max_q (Pa), dv_ascent (m/s), apoapsis (m) ; plus 'params' (bank.params si défini) et 'elapsed' (s)
+    """
+    n = len(bank)
+    state = sim.SimState(vessel, n=n)
+    R = state.body.equatorial_radius
+    mu = state.body.gravitational_parameter
+    bank.reset()
+    state.throttle[:] = 1.0
+    state.activations[:] = 1
+
+    active = np.ones(n, dtype=bool)
+    iae = np.zeros(n)
+    sq = np.zeros(n)
+    regulated = np.zeros(n)          # s passées sous régulation
+    overshoot = np.zeros(n)
+    variation = np.zeros(n)
+    reversals = np.zeros(n, dtype=int)
+    last_move = np.zeros(n)
+    apoapsis = np.zeros(n)
+
+    start = time.perf_counter()
+    for _ in range(int(max_time / dt)):
+        h = state.altitude()
+        pitch = np.where(h >= turn_start_altitude, linear_tangent(np.minimum(h, 0.999 * target_altitude), target_altitude, s), 90.0)
+        throttle = np.clip(bank.update(state.q, dt), 0.0, 1.0)
+        throttle = np.where(active, throttle, 0.0)
+        move = throttle - state.throttle
+        variation += np.abs(move) * active
+        reversals += (move * last_move < 0) & active
+        last_move = np.where(np.abs(move) > 1e-6, move, last_move)
+        state.throttle = throttle
+
+        empty = (state.available_thrust() <= 0.1) & (state.activations < state.n_stages)
+        state.activations += empty
+        state.step(dt, state.pitch_to_attitude(pitch))
+
+        error = state.q - bank.setpoint
+        # Q n'est régulée que si les gaz ont de la marge : Q sous la consigne à plein gaz (montée
+        # initiale, haute atmosphère) ne dépend pas des gains et n'est pas comptée
+        in_loop = active & (state.q > 0.5 * bank.setpoint) & ((throttle < 0.999) | (error > 0))
+        iae += np.abs(error) * dt * in_loop
+        sq += error ** 2 * dt * in_loop
+        regulated += dt * in_loop
+        overshoot = np.maximum(overshoot, np.where(in_loop, error, 0.0))
+
+        el = sim.orbital_elements(state.pos, state.vel, mu)
+        apoapsis = np.where(active, el['apoapsis'] - R, apoapsis)
+        active &= (apoapsis < target_altitude) & (state.t < max_time)
+        if not active.any():
+            break
+
+    return {
+        'params': getattr(bank, 'params', None),
+        'iae': iae,
+        'rms': np.sqrt(sq / np.maximum(regulated, dt)),
+        'overshoot': overshoot,
+        'throttle_variation': variation,
+        'reversals': reversals,
+        'max_q': state.max_q.copy(),
+        'dv_ascent': state.dv_spent.copy(),
+        'apoapsis': apoapsis,
+        'elapsed': time.perf_counter() - start,
+    }
+
+
+def print_sweep(result, sort_by='iae', limit=20):
+    """Classement d'un balayage q_gain_sweep (meilleurs en premier)."""
+    order = np.argsort(result[sort_by])[:limit]
+    params = result['params'] or [{'#': i} for i in range(len(result[sort_by]))]
+    names = list(params[0])
+    header = [*names, 'iae', 'rms', 'overshoot', 'throttle_variation', 'reversals', 'max_q', 'dv_ascent']
+    print(" | ".join(f"{h:>12.12}" for h in header))
+    for i in order:
+        cells = [params[i][name] for name in names] + [result[c][i] for c in header[len(names):]]
+        print(" | ".join(f"{c:>12.4g}" if isinstance(c, float) else f"{c:>12}" for c in cells))
+
+#-------------------------------------------------------------------------------------------------------------
+# Présentation des résultats
+
+RESULT_COLUMNS = ['apoapsis', 'periapsis', 'dv_ascent', 'dv_circularization', 'dv_total',
+                  'dv_remaining', 'max_q', 'gravity_loss', 'drag_loss', 'ascent_time']
+
+
+def to_array(rows, columns=RESULT_COLUMNS):
+    """Colonnes de résultats sous forme de tableau NumPy (n_cas, n_colonnes)."""
+    return np.array([[row.get(c, np.nan) for c in columns] for row in rows], dtype=float)
+
+
+def to_dataframe(rows):
+    import pandas as pd  # optionnel, comme dans krp_start.ipynb
+    return pd.DataFrame(rows)
+
+
+def print_table(rows, sort_by='dv_total', columns=('guidance', 'turn_start_altitude', 's', 'scale_factor', 'q_setpoint', 'twr_target'), limit=20):
+    rows = sorted((r for r in rows if r.get('reached')), key=lambda r: r[sort_by])
+    header = [*columns, 'apoapsis', 'periapsis', 'dv_total', 'max_q', 'gravity_loss']
+    print(" | ".join(f"{h:>14}" for h in header))
+    for row in rows[:limit]:
+        cells = [row[c] for c in header]
+        print(" | ".join(f"{c:>14.1f}" if isinstance(c, float) else f"{c:>14}" for c in cells))
+
+#-------------------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    cases = grid(turn_start_altitude=[250, 500, 1000, 2000], s=[4, 6, 8, 10, 12], q_setpoint=[0, 20000])
+    cases += random_sample(40, base=AscentParams(guidance='pitch_program'), seed=1,
+                           turn_start_altitude=(100, 2000), scale_factor=(0.6, 1.4))
+    start = time.perf_counter()
+    rows = run_batch(cases)
+    elapsed = time.perf_counter() - start
+    print(f"{len(rows)} ascensions simulées en {elapsed:.1f} s ({os.cpu_count()} cœurs)\n")
+    print_table(rows)
+
+    # Gains de la boucle de Q (réglage actuel kp=0.002 et ancien réglage commenté des scripts inclus)
+    bank = PIDBank.grid(kp=[0.001, 0.002, 0.0024, 0.003, 0.004, 0.005], ki=[0, 0.005, 0.01, 0.013, 0.02],
+                        kd=[0, 0.0002], setpoint=20000)
+    result = q_gain_sweep(bank)
+    print(f"\n{len(bank)} réglages de la boucle de Q simulés en {result['elapsed']:.1f} s\n")
+    print_sweep(result)
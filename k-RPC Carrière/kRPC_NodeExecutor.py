@@ -1,143 +1,340 @@
 import time
-import math
+from dataclasses import dataclass
+from kRPC_Tools import VesselStructureCache, RpcCounter, stream_registry
+from kRPC_DeltaV import DeltaVBudget
 
-def nodeExec(conn):
-    vessel = conn.space_center.active_vessel
+# Exécution des nœuds de manœuvre sans polling
+#
+# Le script ne boucle plus sur des RPC : il dort sur des événements évalués par le serveur à chaque
+# frame physique (conn.krpc.add_event) et sur des streams. La coupure finale est anticipée : le Δv
+# parcouru pendant l'aller-retour RPC (mesuré avant le burn) est retranché du seuil, à partir de
+# l'accélération mesurée en phase finale.
+#
+# planExec exécute tous les nœuds en file : les fenêtres de burn (durée multi-étages, largages compris)
+# sont calculées une fois avant le premier burn, puis un seul warp est lancé par attente assez longue
+# pour en valoir la peine. Le vaisseau est orienté avant le warp (l'attitude est conservée en warp), le
+# warp s'arrête donc juste avant l'allumage au lieu de T-20 s suivi d'une attente en temps réel.
+
+PHYSICS_FRAME = 0.02  # s (une frame physique de KSP entre l'événement et la prise en compte des gaz)
+
+
+@dataclass
+class BurnReport:
+    delta_v:      float  # m/s (Δv du nœud)
+    residual:     float  # m/s (Δv restant le long du burn après coupure ; < 0 : dépassement)
+    burn_time:    float  # s de jeu (allumage -> coupure)
+    predicted:    float  # s (durée estimée avant le burn)
+    latency:      float  # s de jeu (aller-retour RPC mesuré)
+    acceleration: float  # m/s² (mesurée en phase finale)
+    cutoff:       float  # m/s (Δv restant au moment de l'ordre de coupure visé)
+    wall:         float  # s réelles (allumage -> coupure)
+    cpu:          float  # s CPU du processus pendant le burn
+    rpc:          int    # RPC pendant le burn
+    wakeups:      int    # réveils du script (événements et mises à jour de streams)
+
+    def report(self):
+        print(f"Burn : Δv {self.delta_v:.2f} m/s, résidu {self.residual:+.3f} m/s, "
+              f"{self.burn_time:.2f} s (estimé {self.predicted:.2f} s)")
+        print(f"Coupure anticipée de {self.cutoff:.3f} m/s (accélération {self.acceleration:.2f} m/s², "
+              f"latence {self.latency * 1000:.0f} ms) ; CPU {self.cpu * 1000:.0f} ms pour {self.wall:.1f} s de burn, "
+              f"{self.rpc} RPC, {self.wakeups} réveils")
+
+#-------------------------------------------------------------------------------------------------------------
+# Fenêtres de burn (calculées localement, une fois pour tout le plan)
+
+@dataclass
+class BurnWindow:
+    node:      object
+    ut:        float  # s (instant du nœud)
+    delta_v:   float  # m/s
+    stages:    list   # [StageDeltaV] par segment, dans l'ordre de largage
+    shortfall: float  # m/s que les étages restants ne peuvent pas fournir
+    warp_to:   float = None   # UT d'arrêt du warp (None : pas de warp avant cette fenêtre)
+    late:      float = 0.0    # s de retard si la fenêtre précédente déborde
+
+    @property
+    def burn_time(self):
+        return sum(segment.burn_time for segment in self.stages)
+
+    @property
+    def start(self):
+        """Allumage : la moitié du Δv (et non de la durée) est fournie avant le nœud."""
+        half, elapsed = self.delta_v / 2, 0.0
+        for segment in self.stages:
+            if half <= segment.delta_v:
+                return self.ut - elapsed - segment.time_for(half)
+            half -= segment.delta_v
+            elapsed += segment.burn_time
+        return self.ut - elapsed
+
+    @property
+    def end(self):
+        return self.start + self.burn_time
+
+
+def plan_burns(budget, nodes):
+    """Fenêtres de burn de tous les nœuds (triés par instant), masse et étages propagés d'un nœud à l'autre."""
+    nodes = sorted(nodes, key=lambda n: n.ut)
+    delta_vs = [node.delta_v for node in nodes]
+    return [BurnWindow(node, node.ut, delta_v, segments, shortfall)
+            for node, delta_v, (segments, shortfall) in zip(nodes, delta_vs, budget.plan(delta_vs))]
+
+
+def schedule_warps(windows, now, lead_time=5.0, min_warp=60.0):
+    """
+    Fixe l'arrêt du warp de chaque fenêtre ; renvoie le nombre de cycles warp/arrêt.
+
+    Un warp n'est lancé que si l'attente dépasse `min_warp` s (accélérer puis ralentir coûte plus
+    qu'une courte attente à 1x) ; il s'arrête `lead_time` s avant l'allumage. Les fenêtres trop proches
+    sont donc enchaînées sans warp, et une fenêtre qui chevauche la précédente est marquée en retard.
+    """
+    ready, warps = now, 0
+    for window in windows:
+        start = window.start
+        window.late = max(0.0, ready - start)
+        if start - lead_time - ready >= min_warp:
+            window.warp_to = start - lead_time
+            warps += 1
+        else:
+            window.warp_to = None
+        ready = max(ready, start) + window.burn_time + lead_time
+    return warps
+
+#-------------------------------------------------------------------------------------------------------------
+# Attentes côté serveur
+
+def measure_latency(conn, samples=8):
+    """Aller-retour RPC moyen, en temps de jeu (s) : UT avance pendant une série d'appels."""
+    space_center = conn.space_center
+    start = space_center.ut
+    for _ in range(samples - 1):
+        space_center.ut
+    return (space_center.ut - start) / samples
+
+
+class _Events:
+    """Attentes sur des expressions évaluées côté serveur (un événement par attente)."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.E = conn.krpc.Expression
+        self.wakeups = 0
+
+    def value(self, obj, attr):
+        return self.E.call(self.conn.get_call(getattr, obj, attr))
+
+    def constant(self, value):
+        return self.E.constant_double(float(value))
+
+    def any(self, *expressions):
+        result = expressions[0]
+        for expression in expressions[1:]:
+            result = self.E.or_(result, expression)
+        return result
+
+    def wait(self, expression, timeout=None):
+        event = self.conn.krpc.add_event(expression)
+        with event.condition:
+            event.wait(timeout)
+        event.remove()
+        self.wakeups += 1
+
+
+def _measure_acceleration(remaining, ut, events, duration=0.3, floor=0.0):
+    """Pente du Δv restant (m/s²) sur environ `duration` s de mises à jour du stream."""
+    t0, dv0 = ut(), remaining()
+    t1, dv1 = t0, dv0
+    while t1 - t0 < duration and dv1 > floor:
+        with remaining.condition:
+            remaining.wait(1.0)
+        events.wakeups += 1
+        t1, dv1 = ut(), remaining()
+    return (dv0 - dv1) / (t1 - t0) if t1 > t0 else 0.0
 
-    vessel.control.sas = False
 
-    # Vérifier s'il existe un nœud de manœuvre
+def _next_stage(vessel, structure):
+    """Active l'étage suivant s'il en reste un ; False quand le vaisseau n'a plus rien à allumer."""
+    if structure.current_stage <= 0:
+        return False
+    structure.activate_next_stage()  # attend la mise à jour des streams avant toute lecture de poussée
+    return True
+
+#-------------------------------------------------------------------------------------------------------------
+# Burn d'une fenêtre
+
+def _burn(conn, vessel, window, structure, streams, events, latency, target_dv, fine_time):
+    """Exécute le burn d'une fenêtre (allumage sur événement UT) ; renvoie un BurnReport ou None."""
+    node, delta_v = window.node, window.delta_v
+    control, auto_pilot = vessel.control, vessel.auto_pilot
+    mass = streams.get(vessel, 'mass')
+    ut = streams.get(conn.space_center, 'ut')
+    remaining = streams.get(node, 'remaining_delta_v')
+
+    try:
+        # Attendre le moment exact du burn (événement côté serveur, aucun RPC pendant l'attente)
+        events.wait(events.E.greater_than_or_equal(events.value(conn.space_center, 'ut'),
+                                                   events.constant(window.start)))
+
+        # Pas de moteur allumé (étage vide non largué) : activer l'étage supérieur ; un seul étage ici, le
+        # stream de poussée n'est à jour qu'à la frame suivante (l'événement de poussée nulle prend le relais)
+        if structure.available_thrust() <= 0.1:
+            print("Pas de moteur actif trouvé, activation de l'étage supérieur")
+            if not _next_stage(vessel, structure):
+                print("Erreur : Poussée nulle, vérifiez les moteurs ou le carburant !")
+                return None
+
+        rpc = RpcCounter(conn)
+        wakeups = events.wakeups
+        cpu_start, wall_start, ut_start = time.process_time(), time.perf_counter(), ut()
+
+        # Phase 1 : Burn principal à pleine poussée, réveil seulement sur événement
+        print("Début du burn principal !")
+        control.throttle = 1.0
+        full_acceleration = structure.available_thrust() / mass()  # m/s²
+        fine_dv = max(min(0.05 * delta_v, 10), 5 * full_acceleration * (latency + PHYSICS_FRAME))
+        remaining_dv = events.value(node, 'remaining_delta_v')
+        no_thrust = events.E.less_than_or_equal(events.value(vessel, 'available_thrust'), events.constant(0.1))
+        misaligned = events.E.greater_than(events.value(auto_pilot, 'error'), events.constant(5))
+        burning = True
+        while burning and remaining() > fine_dv:
+            events.wait(events.any(events.E.less_than(remaining_dv, events.constant(fine_dv)), no_thrust, misaligned))
+            if structure.available_thrust() <= 0.1:
+                burning = _next_stage(vessel, structure)
+            elif remaining() > fine_dv:  # Erreur d'angle de plus de 5 degrés
+                print("Réajustement de l'orientation...")
+                auto_pilot.wait()
+
+        # Phase 2 : Burn précis, poussée réduite pour durer environ fine_time secondes
+        acceleration, cutoff = full_acceleration, 0.0
+        if burning:
+            print("Passage au burn précis...")
+            full_acceleration = structure.available_thrust() / mass()
+            fine_throttle = max(0.01, min(1.0, remaining() / (full_acceleration * fine_time)))
+            # Phase 3 : derniers mètres par seconde à une poussée telle qu'une frame ne parcourt que target_dv
+            trim_throttle = max(0.005, min(fine_throttle, target_dv / (PHYSICS_FRAME * full_acceleration)))
+            trim_dv = max(20 * target_dv, 3 * fine_throttle * full_acceleration * (latency + PHYSICS_FRAME))
+        else:
+            print("Erreur : plus aucun étage à allumer, burn interrompu !")
+
+        for throttle, switch_dv in ((fine_throttle, trim_dv), (trim_throttle, None)) if burning else ():
+            control.throttle = throttle
+            # Accélération réelle (pente du Δv restant) ; la coupure est anticipée de la latence
+            acceleration = _measure_acceleration(remaining, ut, events, duration=0.3 if switch_dv else 0.1,
+                                                 floor=0.5 * remaining())
+            if acceleration <= 0:
+                acceleration = throttle * full_acceleration
+            cutoff = acceleration * (latency + PHYSICS_FRAME)
+            threshold = max(switch_dv, cutoff) if switch_dv else cutoff
+            while remaining() > threshold:
+                events.wait(events.any(events.E.less_than_or_equal(remaining_dv, events.constant(threshold)), no_thrust))
+                if structure.available_thrust() <= 0.1 and remaining() > threshold:
+                    print("Changement d'étage détecté ! Recalcul des paramètres...")
+                    if not _next_stage(vessel, structure):
+                        break
+
+        # Arrêter le burn
+        print("Approche finale, coupure poussée...")
+        control.throttle = 0.0
+        wall, cpu, duration = time.perf_counter() - wall_start, time.process_time() - cpu_start, ut() - ut_start
+        burn_rpc = rpc.delta()
+
+        # Résidu signé le long du burn (composante y du repère du nœud)
+        residual = node.remaining_burn_vector(node.reference_frame)[1]
+        print(f"Burn terminé avec Δv restant : {residual:+.3f} m/s")
+        return BurnReport(delta_v, residual, duration, window.burn_time, latency, acceleration, cutoff, wall, cpu,
+                          burn_rpc, events.wakeups - wakeups)
+    finally:
+        for handle in (ut, mass, remaining):
+            handle.release()
+
+#-------------------------------------------------------------------------------------------------------------
+# Plan complet
+
+def planExec(conn, target_dv=0.05, fine_time=2.0, lead_time=5.0, min_warp=60.0, max_nodes=None, verbose=True):
+    """
+    Exécute les nœuds de manœuvre en file, dans l'ordre ; renvoie la liste des BurnReport.
+
+    Args:
+        target_dv: tolérance visée sur le Δv restant (m/s)
+        fine_time: durée visée de la phase finale à poussée réduite (s)
+        lead_time: arrêt du warp avant l'allumage (s de jeu, stabilisation de l'auto-pilote)
+        min_warp: attente minimale (s de jeu) justifiant un cycle de warp
+        max_nodes: nombre de nœuds à exécuter (None : tous)
+    """
+    vessel = conn.space_center.active_vessel
     control = vessel.control
-    if not control.nodes:
+
+    # Vérifier s'il existe des nœuds de manœuvre
+    nodes = control.nodes[:max_nodes]
+    if not nodes:
         print("Erreur : Aucun nœud de manœuvre trouvé !")
-        conn.close()
-        exit()
-
-    # Récupérer le premier nœud de manœuvre
-    node = control.nodes[0]
-    delta_v = node.delta_v
-    print(f"Nœud de manœuvre trouvé avec Delta-V : {delta_v:.2f} m/s")
-
-    # Configurer l'auto-pilote pour pointer vers le nœud
-    vessel.auto_pilot.reference_frame = node.reference_frame
-    vessel.auto_pilot.target_direction = (0, 1, 0)  # Vecteur du nœud de manœuvre
-    vessel.auto_pilot.engage()
-    print("Auto-pilote engagé, orientation vers le nœud...")
-
-    # Attendre que le vaisseau soit orienté correctement
-    vessel.auto_pilot.wait()
-    print("Vaisseau orienté vers le nœud !")
-
-    # Calculer la durée du burn
-    isp = vessel.specific_impulse  # Impulsion spécifique (s)
-    if isp == 0:
-        print("Pas de moteur actif trouvé ...")
-        print("Activation de l'étage supérieur")
-        vessel.control.activate_next_stage()
-
-    g0 = 9.81  # Accélération gravitationnelle standard (m/s²)
-    mass = vessel.mass  # Masse du vaisseau (kg)
-    thrust = vessel.available_thrust  # Poussée disponible (N)
-    if thrust == 0:
-        print("Erreur : Poussée nulle, vérifiez les moteurs ou le carburant !")
-        conn.close()
-        exit()
-
-    # Calculer la durée du burn avec la formule de Tsiolkovsky
-    flow_rate = thrust / (isp * g0)  # Débit massique (kg/s)
-    burn_time = mass * (1 - math.exp(-delta_v / (isp * g0))) / flow_rate
-    print(f"Durée du burn estimée : {burn_time:.2f} secondes")
-
-    # Attendre le bon moment pour commencer le burn (T- burn_time/2)
-    ut = conn.space_center.ut  # Temps universel actuel
-    node_time = node.ut  # Temps du nœud
-    burn_start = node_time - (burn_time / 2)
-    print(f"En attente du début du burn à T-{burn_time/2:.2f} secondes...")
-
-    # Warper jusqu'à 20 secondes avant le nœud de manœuvre
-    node_time = node.ut  # Temps universel du nœud
-    warp_target = node_time - 20  # T-20 secondes
-    print(f"Warping jusqu'à 10 secondes avant le nœud ...")
-    conn.space_center.warp_to(warp_target)
-
-    # Phase 1 : Burn principal à pleine poussée (jusqu'à 5% du Δv restant)
-    # Attendre le moment exact du burn
-    ut = conn.add_stream(getattr, conn.space_center, 'ut')
-    while ut() < burn_start:
-        time.sleep(0.1)
-
-    print("Début du burn principal !")
-    vessel.control.throttle = 1.0
-    remaining_dv = node.remaining_delta_v
-    while remaining_dv > min(0.05 * delta_v, 10):  # Continuer jusqu'à 5% du Δv initial ou 10 m/s
-        remaining_dv = node.remaining_delta_v
-        # Vérifier l'orientation
-        if vessel.auto_pilot.error > 5:  # Si l'erreur d'angle dépasse 5 degrés
-            print("Réajustement de l'orientation...")
-            vessel.auto_pilot.wait()
-        if vessel.available_thrust <= 0.1:
-            vessel.control.activate_next_stage()
-        time.sleep(0.01)
-
-    # Phase 2 : Burn précis à faible poussée avec ajustement basé sur le TWR
-    print("Passage au burn précis...")
-    target_dv = 0.05  # Tolérance : arrêter quand Δv restant < 0.1 m/s
-
-    # Récupérer la référence au corps céleste
-    body = vessel.orbit.body
-    gravity = body.gravitational_parameter / vessel.orbit.radius**2  # Gravité locale
-
-    # Suivre les changements d'étage
-    last_stage = vessel.control.current_stage
-
-    while remaining_dv > target_dv:
-        remaining_dv = node.remaining_delta_v
-
-        if vessel.available_thrust <= 0.1:
-            vessel.control.activate_next_stage()
-        
-        # Vérifier si l'étage a changé (staging)
-        current_stage = vessel.control.current_stage
-        if current_stage != last_stage:
-            print("Changement d'étage détecté ! Recalcul des paramètres...")
-            last_stage = current_stage
-        
-        # Calculer le TWR actuel
-        thrust = vessel.available_thrust  # Poussée max disponible (N)
-        mass = vessel.mass  # Masse du vaisseau (kg)
-        weight = mass * gravity  # Poids (N)
-        twr = thrust / weight if weight > 0 else 1.0
-        
-        # Calculer l'accélération pour anticiper l'arrêt
-        acceleration = thrust * vessel.control.throttle / mass  # Accélération (m/s²)
-        time_to_target = remaining_dv / acceleration if acceleration > 0 else float('inf')
-        
-        # Ajuster la poussée en fonction du Δv restant et du TWR
-        base_throttle = min(0.1, remaining_dv / (remaining_dv + 0.01 * delta_v))  # Courbe hyperbolique
-        twr_factor = min(1.0, 1 / twr)  # Plus contraignant pour TWR élevés
-        
-        # Poussée minimale dynamique plus fine
-        min_throttle = max(0.0005, 0.005 / (twr * mass / 1000))  # Réduit pour moteurs puissants
-        throttle = max(min_throttle, base_throttle * twr_factor)
-        
-        # Arrêt anticipé plus agressif
-        if remaining_dv < target_dv or time_to_target < 0.1:  # Ex. < 0.2 m/s ou 0.1s avant cible
-            print("Approche finale, coupure poussée...")
-            vessel.control.throttle = 0.0
-            break
-        
-        vessel.control.throttle = throttle
-        
-        # Pas de time.sleep pour maximiser la réactivité
-
-    # Arrêter le burn
-    vessel.control.throttle = 0.0
-    print(f"Burn terminé avec Δv restant : {remaining_dv:.2f} m/s")
-
-    # Désactiver l'auto-pilote
-    vessel.auto_pilot.disengage()
-    print("Auto-pilote désengagé.")
-
-    # Supprimer le nœud de manœuvre
-    node.remove()
-    print("Nœud de manœuvre supprimé.")
\ No newline at end of file
+        return []
+
+    vessel.control.sas = False
+    wall_start, rpc = time.perf_counter(), RpcCounter(conn)
+
+    # Structure du vaisseau (moteurs actifs, Isp, masses par étage) et budget de Δv multi-étages
+    structure = VesselStructureCache(conn, vessel)
+    budget = DeltaVBudget(conn, vessel, structure)
+    streams = stream_registry(conn)
+    events = _Events(conn)
+    windows = plan_burns(budget, nodes)
+    warps = schedule_warps(windows, conn.space_center.ut, lead_time, min_warp)
+
+    print(f"{len(windows)} nœud(s) de manœuvre, {warps} warp(s) :")
+    for i, window in enumerate(windows, 1):
+        stages = ", ".join(f"étage {s.stage} {s.delta_v:.0f} m/s en {s.burn_time:.1f} s" for s in window.stages)
+        print(f"  {i}. Δv {window.delta_v:.2f} m/s, burn {window.burn_time:.2f} s ({stages}), "
+              f"allumage T{window.start - window.ut:+.2f} s"
+              + ("" if window.warp_to is None else ", warp")
+              + (f", en retard de {window.late:.1f} s" if window.late > 0 else "")
+              + (f", Δv insuffisant de {window.shortfall:.1f} m/s" if window.shortfall > 0 else ""))
+
+    auto_pilot = vessel.auto_pilot
+    auto_pilot.engage()
+    latency, reports = None, []
+    try:
+        for window in windows:
+            node = window.node
+            print(f"Nœud de manœuvre avec Delta-V : {window.delta_v:.2f} m/s")
+
+            # Orientation avant le warp : l'attitude est conservée pendant le warp
+            auto_pilot.reference_frame = node.reference_frame
+            auto_pilot.target_direction = (0, 1, 0)  # Vecteur du nœud de manœuvre
+            print("Auto-pilote engagé, orientation vers le nœud...")
+            auto_pilot.wait()
+            print("Vaisseau orienté vers le nœud !")
+
+            if window.warp_to is not None and window.warp_to > conn.space_center.ut:
+                print(f"Warping jusqu'à {window.ut - window.warp_to:.0f} secondes avant le nœud ...")
+                conn.space_center.warp_to(window.warp_to)
+
+            # Latence mesurée avant le premier allumage (compensée à la coupure)
+            if latency is None:
+                latency = measure_latency(conn)
+
+            report = _burn(conn, vessel, window, structure, streams, events, latency, target_dv, fine_time)
+            node.remove()
+            print("Nœud de manœuvre supprimé.")
+            if report is None:
+                break
+            reports.append(report)
+            if verbose:
+                report.report()
+    finally:
+        # Désactiver l'auto-pilote
+        auto_pilot.disengage()
+        print("Auto-pilote désengagé.")
+        budget.release()
+        structure.release()
+
+    if verbose:
+        print(f"Plan exécuté : {len(reports)}/{len(windows)} burn(s), {warps} warp(s), "
+              f"{time.perf_counter() - wall_start:.1f} s réelles, {rpc.delta()} RPC")
+    return reports
+
+
+def nodeExec(conn, target_dv=0.05, fine_time=2.0, verbose=True):
+    """Exécute le premier nœud de manœuvre ; renvoie un BurnReport (None sans nœud ni poussée)."""
+    reports = planExec(conn, target_dv, fine_time, max_nodes=1, verbose=verbose)
+    return reports[0] if reports else None
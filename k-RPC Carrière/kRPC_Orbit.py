@@ -0,0 +1,293 @@
+# This file is part of k-RPC Carrière.
+
+# Orbites képlériennes locales et planification de manœuvres
+#
+# Le vecteur d'état (position et vitesse dans le repère inertiel du corps) est lu une seule fois ;
+# apoapse, instants de passage, vitesses et nœuds de manœuvre (circularisation, Hohmann, changement de
+# plan) sont ensuite calculés localement. La propagation résout l'équation de Kepler par itérations de
+# Newton vectorisées : un appel évalue des milliers d'instants de burn candidats.
+#
+# Les repères de kRPC sont main gauche : le vecteur W = r × v calculé sur les composantes est opposé au
+# moment cinétique physique, d'où NORMAL_SIGN pour la composante « normal » des nœuds.
+#
+# Utilisation :
+#     orbit = KeplerOrbit.from_vessel(conn, vessel)
+#     node = circularize(orbit).add_node(vessel.control)             # à la prochaine apoapse
+#     first, second = hohmann(orbit, orbit.body_radius + 250_000)
+#     times = orbit.ut + np.linspace(0, orbit.period, 5000)
+#     best = circularize(orbit, times).best()                          # 5000 candidats, un appel
+
+# Librairies
+from dataclasses import dataclass
+
+import numpy as np
+
+NORMAL_SIGN = -1.0  # normale physique = NORMAL_SIGN · (r × v) dans les repères main gauche de kRPC
+POLE = np.array([0.0, 1.0, 0.0])  # axe de rotation du corps dans son repère non tournant (y = nord)
+
+_bodies = {}  # corps -> (mu, rayon équatorial) : constantes lues une fois par corps
+
+
+def _norm(v):
+    return np.sqrt(np.sum(v * v, axis=-1))
+
+
+def _unit(v):
+    return v / _norm(v)[..., None]
+
+
+def solve_kepler(M, e, tol=1e-12, max_iter=30):
+    """
+    Anomalie excentrique E (rad, dans [-π, π]) telle que E - e sin E = M, pour un tableau d'anomalies moyennes.
+
+    Newton vectorisé : toutes les valeurs avancent ensemble, arrêt quand la plus lente a convergé.
+    """
+    M = np.remainder(np.asarray(M, dtype=float) + np.pi, 2 * np.pi) - np.pi
+    E = M + e * np.sin(M) if e < 0.8 else np.pi * np.sign(M)
+    for _ in range(max_iter):
+        step = (E - e * np.sin(E) - M) / (1 - e * np.cos(E))
+        E = E - step
+        if np.max(np.abs(step), initial=0.0) < tol:
+            break
+    return E
+
+#-------------------------------------------------------------------------------------------------------------
+# Orbite
+
+class KeplerOrbit:
+    """
+    Orbite elliptique figée à partir d'un vecteur d'état (position, vitesse) à l'instant `ut`.
+
+    Toutes les méthodes acceptent un instant ou un tableau d'instants (UT, s).
+    """
+
+    def __init__(self, position, velocity, ut, mu, body_radius=0.0):
+        r = np.asarray(position, dtype=float)
+        v = np.asarray(velocity, dtype=float)
+        self.ut = float(ut)
+        self.mu = float(mu)
+        self.body_radius = float(body_radius)
+        self.position, self.velocity = r, v
+
+        radius, speed2 = _norm(r), float(v @ v)
+        h = np.cross(r, v)
+        e_vec = ((speed2 - mu / radius) * r - float(r @ v) * v) / mu
+        self.a = 1.0 / (2.0 / radius - speed2 / mu)
+        self.e = float(_norm(e_vec))
+        if self.e >= 1.0:
+            raise ValueError(f"Orbite non elliptique (e = {self.e:.3f}) : propagation elliptique seulement")
+
+        # Base périfocale : P vers la périapse (la position actuelle si l'orbite est circulaire),
+        # Q à 90° dans le sens du mouvement, W = r × v
+        self.W = h / _norm(h)
+        self.P = e_vec / self.e if self.e > 1e-10 else r / radius
+        self.Q = np.cross(self.W, self.P)
+        self.n = np.sqrt(mu / self.a ** 3)  # moyen mouvement (rad/s)
+        self.M0 = self._mean_anomaly_of(np.arctan2(r @ self.Q, r @ self.P))
+
+    @classmethod
+    def from_vessel(cls, conn, vessel):
+        """Lit le vecteur d'état du vaisseau (position, UT, vitesse) ; mu et rayon une fois par corps."""
+        body = vessel.orbit.body
+        if body not in _bodies:
+            _bodies[body] = (body.gravitational_parameter, body.equatorial_radius, body.non_rotating_reference_frame)
+        mu, radius, frame = _bodies[body]
+        position = vessel.position(frame)
+        ut = conn.space_center.ut
+        velocity = vessel.velocity(frame)
+        return cls(position, velocity, ut, mu, radius)
+
+    # --- Éléments ---
+    @property
+    def apoapsis(self):
+        return self.a * (1 + self.e)
+
+    @property
+    def periapsis(self):
+        return self.a * (1 - self.e)
+
+    @property
+    def apoapsis_altitude(self):
+        return self.apoapsis - self.body_radius
+
+    @property
+    def periapsis_altitude(self):
+        return self.periapsis - self.body_radius
+
+    @property
+    def period(self):
+        return 2 * np.pi / self.n
+
+    @property
+    def normal(self):
+        """Normale physique (sens du moment cinétique), dans les composantes du repère."""
+        return NORMAL_SIGN * self.W
+
+    @property
+    def inclination(self):
+        """Inclinaison (rad) par rapport à l'équateur du corps."""
+        return float(np.arccos(np.clip(self.normal @ POLE, -1.0, 1.0)))
+
+    # --- Anomalies et instants ---
+    def _mean_anomaly_of(self, true_anomaly):
+        e = self.e
+        E = np.arctan2(np.sqrt(1 - e * e) * np.sin(true_anomaly), e + np.cos(true_anomaly))
+        return E - e * np.sin(E)
+
+    def mean_anomaly(self, ut):
+        return self.M0 + self.n * (np.asarray(ut, dtype=float) - self.ut)
+
+    def eccentric_anomaly(self, ut):
+        return solve_kepler(self.mean_anomaly(ut), self.e)
+
+    def time_of(self, true_anomaly, after=None):
+        """Prochain passage (UT) à l'anomalie vraie donnée (rad) après `after` (défaut : ut de l'orbite)."""
+        after = self.ut if after is None else after
+        M = self._mean_anomaly_of(np.asarray(true_anomaly, dtype=float))
+        M_after = self.mean_anomaly(after)
+        return after + np.remainder(M - M_after, 2 * np.pi) / self.n
+
+    def next_apoapsis(self, after=None):
+        return float(self.time_of(np.pi, after))
+
+    def next_periapsis(self, after=None):
+        return float(self.time_of(0.0, after))
+
+    # --- Propagation ---
+    def state_at(self, ut):
+        """Position et vitesse (tableaux (..., 3)) aux instants donnés."""
+        E = self.eccentric_anomaly(ut)
+        a, e = self.a, self.e
+        cos_E, sin_E = np.cos(E), np.sin(E)
+        root = np.sqrt(1 - e * e)
+        radius = a * (1 - e * cos_E)
+        x, y = a * (cos_E - e), a * root * sin_E
+        k = np.sqrt(self.mu * a) / radius
+        vx, vy = -k * sin_E, k * root * cos_E
+        position = x[..., None] * self.P + y[..., None] * self.Q
+        velocity = vx[..., None] * self.P + vy[..., None] * self.Q
+        return position, velocity
+
+    def radius_at(self, ut):
+        return self.a * (1 - self.e * np.cos(self.eccentric_anomaly(ut)))
+
+    def speed_at(self, ut):
+        return np.sqrt(self.mu * (2 / self.radius_at(ut) - 1 / self.a))
+
+#-------------------------------------------------------------------------------------------------------------
+# Manœuvres
+
+@dataclass
+class Maneuver:
+    """Nœud de manœuvre (composantes du repère du nœud, m/s) ; des tableaux pour plusieurs candidats."""
+    ut:       object
+    prograde: object
+    normal:   object
+    radial:   object
+
+    @property
+    def delta_v(self):
+        return np.sqrt(self.prograde ** 2 + self.normal ** 2 + self.radial ** 2)
+
+    def at(self, i):
+        if np.ndim(self.ut) == 0:
+            return self
+        return Maneuver(*(float(np.asarray(value)[i]) for value in (self.ut, self.prograde, self.normal, self.radial)))
+
+    def best(self):
+        """Candidat de Δv minimal."""
+        return self.at(int(np.argmin(self.delta_v)))
+
+    def add_node(self, control):
+        """Crée le nœud dans KSP (un seul RPC)."""
+        return control.add_node(float(self.ut), prograde=float(self.prograde), normal=float(self.normal),
+                                radial=float(self.radial))
+
+
+def node_components(position, velocity, delta_v):
+    """Décompose des Δv (..., 3) dans le repère du nœud : (prograde, normal, radial)."""
+    prograde = _unit(velocity)
+    normal = NORMAL_SIGN * _unit(np.cross(position, velocity))
+    up = _unit(position)
+    radial = _unit(up - np.sum(up * prograde, axis=-1)[..., None] * prograde)  # radial extérieur
+    return (np.sum(delta_v * prograde, axis=-1), np.sum(delta_v * normal, axis=-1),
+            np.sum(delta_v * radial, axis=-1))
+
+
+def _maneuver(ut, position, velocity, target_velocity):
+    return Maneuver(ut, *node_components(position, velocity, target_velocity - velocity))
+
+
+def _horizontal(orbit, position, plane_normal=None):
+    """Direction horizontale du mouvement (unitaire) dans le plan de normale W donnée (défaut : l'orbite)."""
+    W = orbit.W if plane_normal is None else plane_normal
+    return _unit(np.cross(W, position))
+
+
+def circularize(orbit, ut=None):
+    """Circularisation à l'instant `ut` (défaut : prochaine apoapse) ; `ut` peut être un tableau de candidats."""
+    ut = np.asarray(orbit.next_apoapsis() if ut is None else ut, dtype=float)
+    position, velocity = orbit.state_at(ut)
+    speed = np.sqrt(orbit.mu / _norm(position))
+    return _maneuver(ut, position, velocity, speed[..., None] * _horizontal(orbit, position))
+
+
+def hohmann(orbit, target_radius, ut=None):
+    """
+    Transfert de Hohmann vers une orbite circulaire de rayon `target_radius` (m).
+
+    Premier burn à `ut` (défaut : périapse pour monter, apoapse pour descendre), second burn à l'apside
+    opposée de l'orbite de transfert. Renvoie (premier, second) ; avec un tableau d'instants, le meilleur
+    candidat est argmin(premier.delta_v + second.delta_v).
+    """
+    if ut is None:
+        ut = orbit.next_periapsis() if target_radius > orbit.a else orbit.next_apoapsis()
+    ut = np.asarray(ut, dtype=float)
+    mu = orbit.mu
+    position, velocity = orbit.state_at(ut)
+    r1 = _norm(position)
+    transfer = (r1 + target_radius) / 2
+    departure = np.sqrt(mu * (2 / r1 - 1 / transfer))
+    first = _maneuver(ut, position, velocity, departure[..., None] * _horizontal(orbit, position))
+    arrival = np.sqrt(mu * (2 / target_radius - 1 / transfer))
+    second = Maneuver(ut + np.pi * np.sqrt(transfer ** 3 / mu), np.sqrt(mu / target_radius) - arrival,
+                      np.zeros_like(ut), np.zeros_like(ut))
+    return first, second
+
+
+def plane_change(orbit, target, ut=None):
+    """
+    Changement de plan vers le plan de `target` (KeplerOrbit, ou vecteur W = r × v de ce plan).
+
+    Sans `ut`, les deux nœuds (ascendant et descendant) sont évalués et le moins coûteux est retenu.
+    La composante radiale de la vitesse est conservée ; seule la vitesse horizontale est tournée.
+    """
+    W = _unit(np.asarray(target.W if isinstance(target, KeplerOrbit) else target, dtype=float))
+    nodes = ut is None
+    if nodes:
+        line = np.cross(orbit.W, W)
+        if _norm(line) < 1e-12:  # plans confondus
+            return Maneuver(orbit.ut, 0.0, 0.0, 0.0)
+        nu = np.arctan2(line @ orbit.Q, line @ orbit.P)
+        ut = orbit.time_of(np.array([nu, nu + np.pi]))
+    ut = np.asarray(ut, dtype=float)
+    position, velocity = orbit.state_at(ut)
+    up = _unit(position)
+    vertical = np.sum(velocity * up, axis=-1)[..., None] * up
+    horizontal = _norm(velocity - vertical)[..., None] * _horizontal(orbit, position, W)
+    maneuver = _maneuver(ut, position, velocity, vertical + horizontal)
+    return maneuver.best() if nodes else maneuver
+
+
+def inclination_target(orbit, inclination):
+    """Vecteur W du plan d'inclinaison `inclination` (rad) ayant la même ligne des nœuds que l'orbite."""
+    line = np.cross(POLE, orbit.W)
+    line = orbit.P if _norm(line) < 1e-12 else _unit(line)  # orbite équatoriale : ligne quelconque
+    m = _unit(np.cross(line, POLE))
+    side = 1.0 if orbit.W @ m >= 0 else -1.0
+    return NORMAL_SIGN * np.cos(inclination) * POLE + side * np.sin(inclination) * m
+
+
+def inclination_change(orbit, inclination, ut=None):
+    """Changement d'inclinaison (rad) au nœud le moins coûteux, ligne des nœuds conservée."""
+    return plane_change(orbit, inclination_target(orbit, inclination), ut)
@@ -3,24 +3,18 @@ import time
 import os
 import sys
 from kRPC_Tools import *
+from kRPC_DeltaV import DeltaVBudget
+from kRPC_Orbit import KeplerOrbit, circularize
+from kRPC_Phases import PhaseEngine, above, below, when
+from kRPC_Recorder import FlightRecorder, log_path
 import math
 
-inside_width = 36
-title_text = "Télémetrie"
-
-def telemetry(altitude, q, throttle, turn_angle):
-    print("\033[H", end='')  # Curseur en haut
-
-    print( "┌────────────────────────────────────┐")
-    print(f"│{center_colored_text(title_text, BOLD + BLUE, inside_width)}│")
-    print( "├────────────────────────────────────┤")
-    print(f"│ {pad(f'Altitude    : {altitude:>10.3f} km', 35)}│")
-    print(f"│ {pad(f'Q dynamique : {q:>10.0f} Pa', 35)}│")
-    print(f"│ {pad(f'Gaz         : {throttle*100:>10.0f} %', 35)}│")
-    print(f"│ {pad(f'Inclinaison : {turn_angle:>10.0f} °', 35)}│")
-    print( "└────────────────────────────────────┘")
-    sys.stdout.flush()
-
+screen = TerminalRenderer("Télémetrie", [
+    ('Altitude',    '{:>10.3f} km'),
+    ('Q dynamique', '{:>10.0f} Pa'),
+    ('Gaz',         '{:>10.0f} %'),
+    ('Inclinaison', '{:>10.0f} °'),
+], max_rate=10)
 
 # === Initialisation ===
 os.system('cls')
@@ -31,6 +25,7 @@ print("\033[H", end='')     # Curseur en haut
 # Connexion à KSP
 conn = krpc.connect(name='Orbiter1')
 vessel = conn.space_center.active_vessel
+streams = stream_registry(conn)
 print("Connecté à KSP : ", conn.krpc.get_status().version,"\n")
 print(f"Vaisseau actif : {vessel.name}")
 print(f"Kerbals à bord : {[kerbal.name for kerbal in vessel.crew]}")
@@ -47,22 +42,20 @@ turn_end_altitude = 45000 # m
 target_altitude = 150000 # m
 turn_angle = 0.0 # °
 
-dynamic_pressure = conn.add_stream(getattr, vessel.flight(), 'dynamic_pressure')
-ut = conn.add_stream(getattr, conn.space_center, 'ut')
-altitude = conn.add_stream(getattr, vessel.flight(), 'mean_altitude')
-apoapsis = conn.add_stream(getattr, vessel.orbit, 'apoapsis_altitude')
+dynamic_pressure = streams.get(vessel, 'flight.dynamic_pressure')
+ut = streams.get(conn.space_center, 'ut')
+altitude = streams.get(vessel, 'flight.mean_altitude')
+apoapsis = streams.get(vessel, 'orbit.apoapsis_altitude')
 stage_2_resources = vessel.resources_in_decouple_stage(stage=2, cumulative=False)
-srb_fuel = conn.add_stream(stage_2_resources.amount, 'SolidFuel')
+srb_fuel = streams.get(stage_2_resources, 'amount', 'SolidFuel')
 
 # Régulateur PID pour la pression dynamique
 dt = 0.05
 thrust_pid = PID(kp=0.002, setpoint=20000)
 
-# Logs
-time_log = []
-throttle_log = []
-q_log = []
-altitude_log = []
+# Logs (mmap : relisible après un plantage ; archive compressée .klog)
+rec = FlightRecorder(fields=[('t', 'f8'), ('altitude', 'f8'), ('q', 'f4'), ('throttle', 'f4'), ('pitch', 'f4')],
+                     path=log_path('Orbiter1'), archive=log_path('Orbiter1', ext='.klog'))
 start_time = time.time()
 
 # Décollage + 1ère phase de vol
@@ -82,6 +75,9 @@ space_phase = False
 circularization_calc_done = False
 os.system('cls')
 
+# Phases d'attente (événements serveur) : statistiques affichées en fin de script
+phases = PhaseEngine(conn, verbose=False)
+
 # === Boucle ===
 try:
     while True:
@@ -121,36 +117,32 @@ try:
         
         elif space_phase:
             vessel.control.throttle = 0.25
-            while apoapsis() < target_altitude:
-                pass
+            phases.wait('Apoapse visée', above(conn, target_altitude, getattr, vessel.orbit, 'apoapsis_altitude'))
             print('Target apoapsis reached')
             vessel.control.throttle = 0.0
 
             # Wait until out of atmosphere
             print('Coasting out of atmosphere')
-            while altitude() < 70500:
-                pass
+            phases.wait('Sortie de l\'atmosphère', above(conn, 70500, getattr, vessel.flight(), 'mean_altitude'))
 
             # Circularisation
             if not circularization_calc_done:
                 print('Planning circularization burn')
-                mu = vessel.orbit.body.gravitational_parameter
-                r = vessel.orbit.apoapsis
-                a1 = vessel.orbit.semi_major_axis
-                a2 = r
-                v1 = math.sqrt(mu*((2./r)-(1./a1)))
-                v2 = math.sqrt(mu*((2./r)-(1./a2)))
-                delta_v = v2 - v1
-                node = vessel.control.add_node(
-                    ut() + vessel.orbit.time_to_apoapsis, prograde=delta_v)
-
-                # Calculate burn time (using rocket equation)
-                F = vessel.available_thrust
-                Isp = vessel.specific_impulse * 9.81
-                m0 = vessel.mass
-                m1 = m0 / math.exp(delta_v/Isp)
-                flow_rate = F / Isp
-                burn_time = (m0 - m1) / flow_rate
+                orbit = KeplerOrbit.from_vessel(conn, vessel)
+                maneuver = circularize(orbit)  # à la prochaine apoapse
+                delta_v = maneuver.delta_v
+                node = maneuver.add_node(vessel.control)
+
+                # Calculate burn time (rocket equation, stage by stage)
+                budget = DeltaVBudget(conn, vessel)
+                burn_time = budget.burn_time(delta_v)
+                if not math.isfinite(burn_time):
+                    available = budget.delta_v()
+                    budget.release()
+                    node.remove()
+                    print(f"Δv insuffisant pour circulariser : {delta_v:.0f} m/s requis, {available:.0f} m/s disponibles. Abandon")
+                    sys.exit(1)
+                budget.release()
                 # Orientate ship
                 print('Orientating ship for circularization burn')
                 vessel.auto_pilot.reference_frame = node.reference_frame
@@ -159,24 +151,22 @@ try:
 
                 # Wait until burn
                 print('Waiting until circularization burn')
-                burn_ut = ut() + vessel.orbit.time_to_apoapsis - (burn_time/2.)
+                burn_ut = maneuver.ut - (burn_time/2.)
                 lead_time = 5
                 conn.space_center.warp_to(burn_ut - lead_time)
 
                 # Execute burn
                 print('Ready to execute burn')
-                time_to_apoapsis = conn.add_stream(getattr, vessel.orbit, 'time_to_apoapsis')
-                while time_to_apoapsis() - (burn_time/2.) > 0:
-                    pass
+                phases.wait('Attente du burn', below(conn, burn_time/2., getattr, vessel.orbit, 'time_to_apoapsis'))
                 print('Executing burn')
                 vessel.control.throttle = 1.0
                 time.sleep(burn_time - 0.1)
                 print('Fine tuning')
                 vessel.control.throttle = 0.05
-                remaining_burn = conn.add_stream(node.remaining_burn_vector, node.reference_frame)
-                while remaining_burn()[1] > 0.1:
-                    pass
+                remaining_burn = streams.get(node, 'remaining_burn_vector', frame=node.reference_frame)
+                phases.wait('Ajustement fin', when(remaining_burn, lambda burn: burn[1] <= 0.1))
                 vessel.control.throttle = 0.0
+                remaining_burn.release()
                 node.remove()
 
                 print('Vaisseau en orbite')
@@ -184,18 +174,20 @@ try:
                 break
 
         # Logs
-        time_log.append(elapsed)
-        throttle_log.append(vessel.control.throttle)
-        q_log.append(current_q)
+        rec.append(elapsed, altitude(), current_q, vessel.control.throttle, 90 - turn_angle)
         
     # Affichage de la télémetrie
-        telemetry(altitude()/1000, current_q, vessel.control.throttle, turn_angle)
+        screen.render(altitude()/1000, current_q, vessel.control.throttle*100, turn_angle)
 
         time.sleep(dt)
 
 except KeyboardInterrupt:
     print('\033[?25h', end='')  # Réaffiche le curseur
     print("\nArrêt manuel du script de lancement.\n")
+    screen.report()
+
+rec.close()  # dernier bloc + index de l'archive .klog
+phases.report()
 
 faire_experiences(vessel)
 
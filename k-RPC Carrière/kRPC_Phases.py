@@ -0,0 +1,156 @@
+# This file is part of k-RPC Carrière.
+
+# Moteur de phases de vol piloté par événements (remplace les boucles `while ...: pass`)
+#
+# Chaque phase déclare ses conditions de sortie :
+#   - expressions évaluées côté serveur (conn.krpc.Expression + add_event), comme dans kRPC_SubOrbiter1.py
+#   - ou callbacks de stream évalués côté client (pour les valeurs non exprimables, ex. un vecteur)
+# Le script dort sur un threading.Event jusqu'au déclenchement : aucun cœur n'est monopolisé.
+#
+# Utilisation :
+#     phases = PhaseEngine(conn)
+#     phases.wait('Sortie de l\'atmosphère', above(conn, 70500, getattr, vessel.flight(), 'mean_altitude'))
+#     ...
+#     phases.report()
+
+# Librairies
+from dataclasses import dataclass
+import threading
+import time
+
+#-------------------------------------------------------------------------------------------------------------
+# Conditions de sortie
+
+class Condition:
+    """Condition de sortie : arm(trigger) appelle trigger() dès qu'elle devient vraie."""
+
+    def arm(self, trigger):
+        raise NotImplementedError
+
+    def disarm(self):
+        pass
+
+
+class ExpressionCondition(Condition):
+    """Condition évaluée par le serveur kRPC (krpc.Expression)."""
+
+    def __init__(self, conn, expression):
+        self.conn = conn
+        self.expression = expression
+        self.event = None
+
+    def arm(self, trigger):
+        self.event = self.conn.krpc.add_event(self.expression)
+        self.event.add_callback(trigger)
+        self.event.start()
+
+    def disarm(self):
+        if self.event is not None:
+            self.event.remove()
+            self.event = None
+
+
+class StreamCondition(Condition):
+    """Condition évaluée côté client à chaque mise à jour d'un stream."""
+
+    def __init__(self, stream, predicate):
+        self.stream = stream
+        self.predicate = predicate
+        self._callback = None
+
+    def arm(self, trigger):
+        def callback(value):
+            if self.predicate(value):
+                trigger()
+        self._callback = callback
+        self.stream.add_callback(callback)
+        self.stream.start()
+        if self.predicate(self.stream()):  # déjà vraie au moment de l'armement
+            trigger()
+
+    def disarm(self):
+        if self._callback is not None:
+            self.stream.remove_callback(self._callback)
+            self._callback = None
+
+
+def _compare(conn, operator, threshold, func, args, value_type):
+    Expression = conn.krpc.Expression
+    constant = getattr(Expression, f'constant_{value_type}')
+    call = Expression.call(conn.get_call(func, *args))
+    return ExpressionCondition(conn, getattr(Expression, operator)(call, constant(threshold)))
+
+
+def above(conn, threshold, func, *args, value_type='double'):
+    """func(*args) > threshold, évalué côté serveur (value_type : 'double', 'float' ou 'int')."""
+    return _compare(conn, 'greater_than', threshold, func, args, value_type)
+
+
+def below(conn, threshold, func, *args, value_type='double'):
+    """func(*args) < threshold, évalué côté serveur."""
+    return _compare(conn, 'less_than', threshold, func, args, value_type)
+
+
+def when(stream, predicate):
+    """predicate(valeur du stream) devient vrai (évalué côté client, sans polling)."""
+    return StreamCondition(stream, predicate)
+
+#-------------------------------------------------------------------------------------------------------------
+# Moteur de phases
+
+@dataclass
+class PhaseStats:
+    name:     str
+    wall:     float  # s
+    cpu:      float  # s (temps CPU du processus)
+    fired:    object = None
+    timeout:  bool  = False
+
+
+class PhaseEngine:
+    def __init__(self, conn, verbose=True):
+        self.conn = conn
+        self.verbose = verbose
+        self.stats = []
+
+    def wait(self, name, *conditions, timeout=None):
+        """
+        Bloque jusqu'à ce qu'une des conditions se déclenche (ou timeout).
+
+        Returns:
+            la condition déclenchée, ou None en cas de timeout
+        """
+        done = threading.Event()
+        fired = []
+
+        def trigger_for(condition):
+            def trigger(*_):
+                if not fired:
+                    fired.append(condition)
+                done.set()
+            return trigger
+
+        if self.verbose:
+            print(f"⏳ {name}")
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            for condition in conditions:
+                condition.arm(trigger_for(condition))
+            run_until = getattr(self.conn, 'run_until', None)
+            if run_until is not None:  # kRPC_Simulator : le temps de jeu n'avance que sur demande
+                run_until(done.is_set, timeout)
+            else:
+                done.wait(timeout)
+        finally:
+            for condition in conditions:
+                condition.disarm()
+        self.stats.append(PhaseStats(name, time.perf_counter() - wall0, time.process_time() - cpu0,
+                                     fired[0] if fired else None, not fired))
+        return fired[0] if fired else None
+
+    def report(self):
+        print(f"{'Phase':<36}{'Durée (s)':>10}{'CPU (s)':>10}{'CPU (%)':>9}")
+        for s in self.stats:
+            load = 100 * s.cpu / s.wall if s.wall > 0 else 0.0
+            status = " (timeout)" if s.timeout else ""
+            print(f"{s.name[:35]:<36}{s.wall:>10.2f}{s.cpu:>10.3f}{load:>8.1f}%{status}")
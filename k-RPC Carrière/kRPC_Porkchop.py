@@ -0,0 +1,347 @@
+# This file is part of k-RPC Carrière.
+
+# Fenêtres de transfert interplanétaire (porkchop plot)
+#
+# Les éphémérides des corps (mu, rayon, sphère d'influence, vecteur d'état dans le repère non tournant du
+# parent) sont lues une seule fois puis gardées sur disque : les corps sont sur rails, un vecteur d'état
+# suffit à propager leur orbite (KeplerOrbit) à n'importe quelle date, sans RPC.
+#
+# Le problème de Lambert est résolu pour toute la grille départ x arrivée d'un coup (variables universelles,
+# bissection vectorisée sur z : même nombre d'itérations pour toutes les cases). Le Δv d'éjection depuis
+# une orbite de parking circulaire et le Δv de capture donnent la carte ; le minimum est converti en nœud
+# d'éjection sur l'orbite actuelle du vaisseau, prêt pour planExec.
+#
+# Hypothèses : coniques raccordées, sphère d'influence de rayon nul (le temps passé dans la SOI de départ
+# est négligé), transferts directs (moins d'un tour), repères non tournants de tous les corps parallèles.
+#
+# Utilisation :
+#     python kRPC_Porkchop.py                    # vers la cible sélectionnée dans KSP
+#     python kRPC_Porkchop.py Duna node          # idem vers Duna, puis nœud d'éjection
+#
+#     ephemerides = Ephemerides.load(conn)       # RPC à la première exécution seulement
+#     chart = porkchop(ephemerides, 'Kerbin', 'Duna', start=ut, size=200)
+#     maneuver = departure_node(chart, KeplerOrbit.from_vessel(conn, vessel))
+#     maneuver.add_node(vessel.control); planExec(conn)
+
+# Librairies
+from dataclasses import dataclass, asdict
+import json
+import math
+import os
+import sys
+import time
+import numpy as np
+
+from kRPC_Orbit import KeplerOrbit, Maneuver, node_components
+
+EPHEMERIS_CACHE = os.path.join('Cache', 'ephemerides.json')
+KSP_DAY = 6 * 3600  # s (jour kerbin)
+
+
+def _norm(v):
+    return np.sqrt(np.sum(v * v, axis=-1))
+
+#-------------------------------------------------------------------------------------------------------------
+# Éphémérides
+
+@dataclass
+class BodyEphemeris:
+    name:     str
+    mu:       float  # m³/s²
+    radius:   float  # m (équatorial)
+    soi:      float  # m (inf pour l'étoile)
+    parent:   object = None  # nom du corps parent (None pour l'étoile)
+    position: tuple = None   # m, repère non tournant du parent, à `ut`
+    velocity: tuple = None   # m/s, idem
+    ut:       float = 0.0
+
+
+class Ephemerides:
+    """Corps du système et leurs orbites, propagées localement à partir d'un vecteur d'état par corps."""
+
+    def __init__(self, bodies):
+        self.bodies = {body.name: body for body in bodies}
+        self._orbits = {}
+
+    @classmethod
+    def read(cls, conn):
+        """Lit tous les corps (8 RPC par corps, une fois)."""
+        bodies = conn.space_center.bodies
+        ut = conn.space_center.ut
+        result = []
+        for name, body in bodies.items():
+            orbit = body.orbit
+            entry = BodyEphemeris(name, body.gravitational_parameter, body.equatorial_radius,
+                                  body.sphere_of_influence, ut=ut)
+            if orbit is not None:
+                parent = orbit.body
+                frame = parent.non_rotating_reference_frame
+                entry.parent = parent.name
+                entry.position = tuple(body.position(frame))
+                entry.velocity = tuple(body.velocity(frame))
+            result.append(entry)
+        return cls(result)
+
+    @classmethod
+    def load(cls, conn=None, path=EPHEMERIS_CACHE, refresh=False):
+        """Éphémérides du cache disque ; lues via `conn` (et mises en cache) si absentes ou `refresh`."""
+        if not refresh and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                return cls([BodyEphemeris(**entry) for entry in json.load(f)])
+        if conn is None:
+            raise FileNotFoundError(f"Pas d'éphémérides en cache ({path}) et pas de connexion pour les lire")
+        ephemerides = cls.read(conn)
+        ephemerides.save(path)
+        return ephemerides
+
+    def save(self, path=EPHEMERIS_CACHE):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump([asdict(body) for body in self.bodies.values()], f, indent=1)
+
+    def __getitem__(self, name):
+        return self.bodies[name]
+
+    def orbit(self, name):
+        """KeplerOrbit du corps autour de son parent."""
+        orbit = self._orbits.get(name)
+        if orbit is None:
+            body = self.bodies[name]
+            if body.parent is None:
+                raise ValueError(f"{name} n'orbite autour d'aucun corps")
+            parent = self.bodies[body.parent]
+            orbit = self._orbits[name] = KeplerOrbit(body.position, body.velocity, body.ut, parent.mu, parent.radius)
+        return orbit
+
+    def state(self, name, ut):
+        """Position et vitesse (..., 3) du corps dans le repère non tournant de son parent."""
+        return self.orbit(name).state_at(ut)
+
+#-------------------------------------------------------------------------------------------------------------
+# Problème de Lambert
+
+def _stumpff(z):
+    """Fonctions de Stumpff C(z) et S(z) (tableaux)."""
+    C, S = np.full_like(z, 0.5), np.full_like(z, 1 / 6)
+    positive, negative = z > 1e-8, z < -1e-8
+    s = np.sqrt(z[positive])
+    C[positive] = (1 - np.cos(s)) / z[positive]
+    S[positive] = (s - np.sin(s)) / s ** 3
+    s = np.sqrt(-z[negative])
+    C[negative] = (np.cosh(s) - 1) / -z[negative]
+    S[negative] = (np.sinh(s) - s) / s ** 3
+    return C, S
+
+
+def lambert(r1, r2, time_of_flight, mu, normal, iterations=64):
+    """
+    Vitesses de départ et d'arrivée (..., 3) du transfert direct de r1 à r2 en `time_of_flight` (s).
+
+    `normal` (vecteur r × v de l'orbite de départ) fixe le sens du transfert : celui du mouvement.
+    Bissection sur z entre -400 et 4π² (transfert de moins d'un tour) : le temps de vol est croissant en z,
+    toutes les cases convergent au même rythme. NaN pour les cas dégénérés (transfert à 180°, Δt <= 0).
+    """
+    r1, r2 = np.asarray(r1, dtype=float), np.asarray(r2, dtype=float)
+    shape = np.broadcast_shapes(r1.shape, r2.shape, np.shape(time_of_flight) + (3,))
+    r1, r2 = np.broadcast_to(r1, shape).reshape(-1, 3), np.broadcast_to(r2, shape).reshape(-1, 3)
+    dt = np.broadcast_to(np.asarray(time_of_flight, dtype=float), shape[:-1]).ravel()
+
+    n1, n2 = _norm(r1), _norm(r2)
+    cos_angle = np.clip(np.sum(r1 * r2, axis=-1) / (n1 * n2), -1.0, 1.0)
+    angle = np.arccos(cos_angle)
+    angle = np.where(np.cross(r1, r2) @ np.asarray(normal, dtype=float) >= 0, angle, 2 * np.pi - angle)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        A = np.sin(angle) * np.sqrt(n1 * n2 / (1 - cos_angle))
+
+        def y_of(z):
+            C, S = _stumpff(z)
+            return n1 + n2 + A * (z * S - 1) / np.sqrt(C), C, S
+
+        root_mu = math.sqrt(mu)
+        low, high = np.full_like(dt, -400.0), np.full_like(dt, 4 * np.pi ** 2)
+        for _ in range(iterations):
+            z = (low + high) / 2
+            y, C, S = y_of(z)
+            flight = ((y / C) ** 1.5 * S + A * np.sqrt(y)) / root_mu
+            short = (y < 0) | (flight < dt)  # y < 0 : z trop petit
+            low = np.where(short, z, low)
+            high = np.where(short, high, z)
+        y, _, _ = y_of((low + high) / 2)
+        f = 1 - y / n1
+        g = A * np.sqrt(y / mu)
+        g_dot = 1 - y / n2
+        v1 = (r2 - f[:, None] * r1) / g[:, None]
+        v2 = (g_dot[:, None] * r2 - r1) / g[:, None]
+    bad = (dt <= 0) | (1 + cos_angle < 1e-10) | ~(y > 0)
+    v1[bad] = np.nan
+    v2[bad] = np.nan
+    return v1.reshape(shape), v2.reshape(shape)
+
+#-------------------------------------------------------------------------------------------------------------
+# Porkchop
+
+def _escape_delta_v(v_inf, mu, radius):
+    """Δv (m/s) entre une orbite circulaire de rayon `radius` et une hyperbole d'excès `v_inf`."""
+    return np.sqrt(v_inf ** 2 + 2 * mu / radius) - np.sqrt(mu / radius)
+
+
+@dataclass
+class Porkchop:
+    origin:         str
+    target:         str
+    departure:      np.ndarray  # UT de départ (n,)
+    arrival:        np.ndarray  # UT d'arrivée (m,)
+    v_inf:          np.ndarray  # excès de vitesse hyperbolique au départ (n, m, 3), repère du parent
+    departure_dv:   np.ndarray  # m/s (n, m), éjection depuis l'orbite de parking
+    arrival_dv:     np.ndarray  # m/s (n, m), capture (excès d'arrivée si survol)
+    parking_radius: float       # m
+    origin_mu:      float       # m³/s²
+    elapsed:        float = 0.0  # s de calcul
+
+    @property
+    def total_dv(self):
+        return self.departure_dv + self.arrival_dv
+
+    def best(self):
+        """Indices (départ, arrivée) du Δv total minimal."""
+        return np.unravel_index(np.nanargmin(self.total_dv), self.total_dv.shape)
+
+    def summary(self):
+        i, j = self.best()
+        return (f"{self.origin} -> {self.target} : départ UT {self.departure[i]:.0f} s, "
+                f"vol {(self.arrival[j] - self.departure[i]) / KSP_DAY:.1f} j, "
+                f"Δv éjection {self.departure_dv[i, j]:.0f} m/s + arrivée {self.arrival_dv[i, j]:.0f} m/s")
+
+    def plot(self, path=None, levels=30):
+        """Carte du Δv total (jours kerbin depuis le premier départ) ; enregistrée si `path`, affichée sinon."""
+        import matplotlib.pyplot as plt
+
+        t0 = self.departure[0]
+        fig, ax = plt.subplots(figsize=(8, 6))
+        total = self.total_dv
+        ceiling = min(np.nanpercentile(total, 60), 3 * np.nanmin(total))  # contraste autour des fenêtres
+        contour = ax.contourf((self.departure - t0) / KSP_DAY, (self.arrival - t0) / KSP_DAY,
+                              np.minimum(total, ceiling).T, levels=levels, cmap='viridis_r')
+        fig.colorbar(contour, ax=ax, label='Δv total (m/s)')
+        i, j = self.best()
+        ax.plot((self.departure[i] - t0) / KSP_DAY, (self.arrival[j] - t0) / KSP_DAY, 'r+', markersize=14)
+        ax.set_xlabel('Départ (jours)')
+        ax.set_ylabel('Arrivée (jours)')
+        ax.set_title(f"{self.origin} -> {self.target} : {total[i, j]:.0f} m/s")
+        if path:
+            fig.savefig(path, dpi=120)
+            plt.close(fig)
+        else:
+            plt.show()
+
+
+def transfer_grid(ephemerides, origin, target, start, size=200):
+    """Grille par défaut : départs sur une période synodique, arrivées entre 0.5 et 1.5 fois le Hohmann."""
+    a, b = ephemerides.orbit(origin), ephemerides.orbit(target)
+    synodic = abs(1 / (1 / a.period - 1 / b.period))
+    hohmann = math.pi * math.sqrt(((a.a + b.a) / 2) ** 3 / a.mu)
+    departure = start + np.linspace(0.0, min(synodic, 4 * max(a.period, b.period)), size)
+    arrival = start + np.linspace(0.5 * hohmann, departure[-1] - start + 1.5 * hohmann, size)
+    return departure, arrival
+
+
+def porkchop(ephemerides, origin, target, departure=None, arrival=None, start=None, size=200,
+             parking_altitude=100_000.0, capture_altitude=100_000.0):
+    """
+    Δv de transfert sur la grille départ x arrivée (UT, s).
+
+    Sans grille, transfer_grid(start, size). `capture_altitude=None` : survol, le Δv d'arrivée est l'excès
+    de vitesse hyperbolique. Les deux corps doivent orbiter autour du même parent.
+    """
+    if ephemerides[origin].parent != ephemerides[target].parent:
+        raise ValueError(f"{origin} et {target} n'orbitent pas autour du même corps")
+    t_start = time.perf_counter()
+    if departure is None or arrival is None:
+        start = ephemerides[origin].ut if start is None else start
+        departure, arrival = transfer_grid(ephemerides, origin, target, start, size)
+    departure, arrival = np.asarray(departure, dtype=float), np.asarray(arrival, dtype=float)
+    mu = ephemerides[ephemerides[origin].parent].mu
+    r1, v_origin = ephemerides.state(origin, departure)
+    r2, v_target = ephemerides.state(target, arrival)
+    v1, v2 = lambert(r1[:, None, :], r2[None, :, :], arrival[None, :] - departure[:, None], mu,
+                     ephemerides.orbit(origin).W)
+
+    v_inf = v1 - v_origin[:, None, :]
+    body = ephemerides[origin]
+    parking_radius = body.radius + parking_altitude
+    departure_dv = _escape_delta_v(_norm(v_inf), body.mu, parking_radius)
+    arrival_inf = _norm(v2 - v_target[None, :, :])
+    if capture_altitude is None:
+        arrival_dv = arrival_inf
+    else:
+        body = ephemerides[target]
+        arrival_dv = _escape_delta_v(arrival_inf, body.mu, body.radius + capture_altitude)
+    return Porkchop(origin, target, departure, arrival, v_inf, departure_dv, arrival_dv, parking_radius,
+                    ephemerides[origin].mu, time.perf_counter() - t_start)
+
+#-------------------------------------------------------------------------------------------------------------
+# Nœud d'éjection
+
+def departure_node(chart, orbit, index=None, samples=2000):
+    """
+    Nœud d'éjection (Maneuver) sur l'orbite de parking `orbit` (KeplerOrbit autour du corps de départ).
+
+    Candidats : `samples` instants sur la période qui précède le départ retenu (ou qui suit maintenant).
+    À chaque instant, le burn place le vaisseau au périgée d'une hyperbole d'excès v_inf dont l'asymptote
+    est celle du transfert ; on garde les instants où l'angle position / asymptote vaut arccos(-1/e), puis
+    le moins coûteux (le plan de parking peut différer de celui de l'asymptote : composante normale).
+    """
+    i, j = chart.best() if index is None else index
+    v_inf = chart.v_inf[i, j]
+    speed_inf = float(_norm(v_inf))
+    direction = v_inf / speed_inf
+    first = max(chart.departure[i] - orbit.period, orbit.ut + 60.0)
+    times = first + np.linspace(0.0, orbit.period, samples, endpoint=False)
+
+    position, velocity = orbit.state_at(times)
+    radius = _norm(position)
+    up = position / radius[:, None]
+    e = 1 + radius * speed_inf ** 2 / orbit.mu
+    alignment = up @ direction
+    error = np.abs(alignment + 1 / e)
+    horizontal = direction - alignment[:, None] * up
+    horizontal /= _norm(horizontal)[:, None]
+    periapsis_speed = np.sqrt(speed_inf ** 2 + 2 * orbit.mu / radius)
+    delta_v = periapsis_speed[:, None] * horizontal - velocity
+
+    maneuver = Maneuver(times, *node_components(position, velocity, delta_v))
+    cost = maneuver.delta_v
+    aligned = error <= 2 * np.pi / samples
+    k = int(np.argmin(np.where(aligned, cost, np.inf))) if aligned.any() else int(np.argmin(error))
+    return maneuver.at(k)
+
+#-------------------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    import krpc
+    from kRPC_NodeExecutor import planExec
+
+    conn = krpc.connect(name='Porkchop')
+    space_center = conn.space_center
+    vessel = space_center.active_vessel
+    args = [arg for arg in sys.argv[1:] if arg != 'node']
+    target = args[0] if args else (space_center.target_body.name if space_center.target_body else None)
+    if target is None:
+        print("Erreur : aucun corps ciblé (sélectionner une cible ou la passer en argument)")
+        sys.exit(1)
+
+    ephemerides = Ephemerides.load(conn)
+    origin = vessel.orbit.body.name
+    chart = porkchop(ephemerides, origin, target, start=space_center.ut)
+    print(chart.summary())
+    print(f"Grille {chart.total_dv.shape[0]}x{chart.total_dv.shape[1]} calculée en {chart.elapsed:.2f} s")
+    chart.plot(f"porkchop_{origin}_{target}.png")
+
+    if 'node' in sys.argv[1:]:
+        maneuver = departure_node(chart, KeplerOrbit.from_vessel(conn, vessel))
+        maneuver.add_node(vessel.control)
+        print(f"Nœud d'éjection : UT {maneuver.ut:.0f} s, Δv {maneuver.delta_v:.0f} m/s")
+        planExec(conn)
+    conn.close()
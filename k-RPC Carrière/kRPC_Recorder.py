@@ -0,0 +1,552 @@
+# This file is part of k-RPC Carrière.
+
+# Enregistreur de vol en colonnes typées (remplace les listes time_log, throttle_log, q_log...)
+#
+# Les échantillons sont écrits dans un tableau structuré NumPy préalloué, utilisé en anneau :
+# mémoire bornée, ajout en O(1) sans allocation (struct.pack_into direct dans le tableau : ~0.8 µs par
+# ligne de 9 colonnes, un peu plus lent que 9 list.append, pour 50 octets par ligne au lieu de ~290).
+# Avec un chemin de fichier, le tableau est un mmap : les données déjà écrites survivent à un plantage
+# du script et se relisent avec FlightRecorder.open(path).
+#
+# Utilisation :
+#     rec = FlightRecorder(capacity=20 * 3600 * 4, fields=[('t', 'f8'), ('q', 'f4'), ('throttle', 'f4')],
+#                          path=log_path('Throttle_PID'))
+#     rec.append(elapsed, current_q, throttle)
+#     ...
+#     plt.plot(rec['t'], rec['q'])
+#
+# Archivage longue durée (.klog) : colonnes compressées par blocs de chunk_rows lignes, avec un index
+# temporel par bloc. La lecture ne décompresse que les colonnes et les blocs demandés :
+#     rec = FlightRecorder(..., archive=log_path('Throttle_PID', ext='.klog'))
+#     ...
+#     rec.close()
+#     log = FlightLog('Logs/Throttle_PID_20250101_120000.klog')
+#     df = log.to_dataframe(columns=['t', 'q'], t_start=600, t_end=900)
+#
+# Mémoire partagée (lecture par d'autres processus, ex. kRPC_Dashboard.py) :
+#     bus = FlightRecorder.shared('krpc_Throttle_PID', fields=...)   # processus de vol
+#     view = FlightRecorder.attach('krpc_Throttle_PID')               # autre processus
+#     rows, seen = view.since(seen)
+
+# Librairies
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import json
+from multiprocessing import shared_memory
+import os
+import struct
+import sys
+import zlib
+import numpy as np
+
+MAGIC = b'KRPCREC1'
+HEADER_SIZE = 4096  # octets (magic, capacité, compteur, schéma JSON)
+LOG_MAGIC = b'KRPCLOG1'
+CHUNK_MAGIC = b'CHNK'
+INDEX_MAGIC = b'INDX'
+
+_created_segments = set()  # segments partagés créés par ce processus
+
+# Schéma par défaut : une ligne par tick de la boucle de contrôle
+DEFAULT_FIELDS = [
+    ('t',        'f8'),  # s (depuis le début de l'enregistrement)
+    ('ut',       'f8'),  # s (temps universel du jeu)
+    ('altitude', 'f8'),  # m
+    ('apoapsis', 'f8'),  # m
+    ('q',        'f4'),  # Pa
+    ('throttle', 'f4'),  # 0-1
+    ('pitch',    'f4'),  # °
+    ('mass',     'f4'),  # kg
+    ('stage',    'i2'),  # -
+]
+
+
+def log_path(name, directory='Logs', ext='.rec'):
+    """Chemin horodaté d'un fichier d'enregistrement (Logs/<nom>_AAAAMMJJ_HHMMSS.rec ou .klog)."""
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{name}_{datetime.now():%Y%m%d_%H%M%S}{ext}")
+
+
+_STRUCT_CODES = {('f', 2): 'e', ('f', 4): 'f', ('f', 8): 'd', ('i', 1): 'b', ('i', 2): 'h', ('i', 4): 'i', ('i', 8): 'q',
+                 ('u', 1): 'B', ('u', 2): 'H', ('u', 4): 'I', ('u', 8): 'Q', ('b', 1): '?'}
+
+
+def _row_struct(dtype):
+    """
+    struct.Struct équivalent à une ligne du schéma (champs scalaires contigus, petit-boutiste), sinon None.
+    struct.pack_into écrit une ligne environ 1.5x plus vite que l'affectation d'un tuple à une ligne NumPy.
+    """
+    codes, offset = [], 0
+    for name in dtype.names:
+        field, field_offset = dtype.fields[name][:2]
+        code = _STRUCT_CODES.get((field.kind, field.itemsize))
+        if code is None or field.shape or field_offset != offset or field.byteorder == '>' or \
+                (field.byteorder == '=' and sys.byteorder != 'little'):
+            return None
+        codes.append(code)
+        offset += field.itemsize
+    return struct.Struct('<' + ''.join(codes)) if offset == dtype.itemsize else None
+
+#-------------------------------------------------------------------------------------------------------------
+# Enregistreur
+
+class FlightRecorder:
+    def __init__(self, capacity=20 * 3600 * 4, fields=DEFAULT_FIELDS, path=None, archive=None, chunk_rows=4096):
+        """
+        Args:
+            capacity: nombre de lignes conservées (les plus anciennes sont écrasées ensuite) ;
+                      par défaut 4 h à 20 Hz
+            fields: schéma [(nom, type NumPy), ...]
+            path: fichier mmap (None = en mémoire seulement)
+            archive: fichier .klog recevant chaque bloc de chunk_rows lignes (None = pas d'archive)
+            chunk_rows: taille des blocs archivés (doit tenir dans la capacité)
+        """
+        self.dtype = np.dtype(fields)
+        self.capacity = int(capacity)
+        self.path = path
+        self._shm = None
+        if path is None:
+            self._raw = None
+            self._data = np.zeros(self.capacity, dtype=self.dtype)
+            self._counter = memoryview(bytearray(8)).cast('Q')
+            self._n = 0
+        else:
+            raw = np.memmap(path, dtype=np.uint8, mode='w+', shape=(self._size(),))
+            self._write_header(raw)
+            self._attach(raw)
+        self._columns = {name: self._data[name] for name in self.dtype.names}
+        self._blank = np.zeros((), dtype=self.dtype)
+        self._set_packer()
+        self._set_archive(archive, chunk_rows)
+
+    def _size(self):
+        return HEADER_SIZE + self.capacity * self.dtype.itemsize
+
+    def _write_header(self, raw):
+        schema = json.dumps(self.dtype.descr).encode()
+        if len(schema) > HEADER_SIZE - 28:
+            raise ValueError("Schéma trop long pour l'en-tête")
+        raw[:8] = np.frombuffer(MAGIC, dtype=np.uint8)
+        raw[8:16].view('<u8')[0] = self.capacity
+        raw[24:28].view('<u4')[0] = len(schema)
+        raw[28:28 + len(schema)] = np.frombuffer(schema, dtype=np.uint8)
+
+    def _set_archive(self, archive, chunk_rows=4096):
+        if archive is not None and chunk_rows > self.capacity:
+            raise ValueError("chunk_rows doit être inférieur à la capacité")
+        self.archive = None if archive is None else FlightLogWriter(archive, self.dtype.descr, chunk_rows)
+        self._archived = self._n  # lignes déjà confiées à l'archive
+        self._next_archive = self._n + chunk_rows if archive is not None else -1
+
+    def _set_packer(self):
+        """Écriture directe des lignes (struct.pack_into) dans le tampon du tableau, si le schéma le permet."""
+        row = _row_struct(self.dtype)
+        self._rows = None
+        if row is not None and self._data.flags.writeable:
+            self._rows = memoryview(self._data.view(np.uint8))
+            self._pack = row.pack_into
+            self._row_size = row.size
+
+    def _attach(self, raw):
+        self._raw = raw
+        self._counter = memoryview(raw[16:24]).cast('Q')  # nombre total de lignes écrites (en-tête)
+        self._n = self._counter[0]
+        self._data = raw[HEADER_SIZE:].view(self.dtype)
+
+    @classmethod
+    def _from_raw(cls, raw, path=None, shm=None):
+        if bytes(raw[:8]) != MAGIC:
+            raise ValueError(f"{path or shm.name} n'est pas un enregistrement de vol")
+        length = int(raw[24:28].view('<u4')[0])
+        descr = [tuple(field) for field in json.loads(bytes(raw[28:28 + length]).decode())]
+        self = cls.__new__(cls)
+        self.dtype = np.dtype(descr)
+        self.capacity = int(raw[8:16].view('<u8')[0])
+        self.path = path
+        self._shm = shm
+        self._owner = False
+        self._attach(raw[:self._size()])  # un segment partagé peut être arrondi à la page
+        self._columns = {name: self._data[name] for name in self.dtype.names}
+        self._blank = np.zeros((), dtype=self.dtype)
+        self._set_packer()
+        self._set_archive(None)
+        return self
+
+    @classmethod
+    def open(cls, path, mode='r+'):
+        """Rouvre un enregistrement existant (ex. après un plantage) ; mode 'r' pour la lecture seule."""
+        return cls._from_raw(np.memmap(path, dtype=np.uint8, mode=mode), path=path)
+
+    @classmethod
+    def shared(cls, name, capacity=20 * 60 * 30, fields=DEFAULT_FIELDS):
+        """
+        Enregistreur en mémoire partagée (multiprocessing.shared_memory), lisible par d'autres processus
+        avec attach(name) ; par défaut 30 min à 20 Hz. Un segment orphelin du même nom est remplacé.
+        """
+        dtype = np.dtype(fields)
+        size = HEADER_SIZE + int(capacity) * dtype.itemsize
+        try:
+            shm = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:  # script précédent tué avant close()
+            old = shared_memory.SharedMemory(name)
+            old.close()
+            old.unlink()
+            shm = shared_memory.SharedMemory(name, create=True, size=size)
+        raw = np.ndarray((size,), dtype=np.uint8, buffer=shm.buf)
+        raw[:HEADER_SIZE] = 0
+        header = cls.__new__(cls)
+        header.dtype, header.capacity = dtype, int(capacity)
+        header._write_header(raw)
+        self = cls._from_raw(raw, shm=shm)
+        self._owner = True
+        _created_segments.add(name)
+        return self
+
+    @classmethod
+    def attach(cls, name):
+        """Lecteur d'un enregistreur partagé créé par un autre processus (FlightRecorder.shared)."""
+        try:
+            shm = shared_memory.SharedMemory(name, track=False)  # Python >= 3.13
+        except TypeError:
+            shm = shared_memory.SharedMemory(name)
+            # Sinon le resource_tracker du lecteur détruirait le segment à la sortie du lecteur
+            if os.name == 'posix' and name not in _created_segments:
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(shm._name, 'shared_memory')
+        return cls._from_raw(np.ndarray((shm.size,), dtype=np.uint8, buffer=shm.buf), shm=shm)
+
+    # --- Écriture ---
+    def append(self, *values):
+        """Ajoute une ligne (valeurs dans l'ordre du schéma)."""
+        n = self._n
+        i = n % self.capacity
+        if self._rows is None:
+            self._data[i] = values
+        else:
+            try:
+                self._pack(self._rows, i * self._row_size, *values)
+            except (TypeError, struct.error, OverflowError):
+                # Valeur que struct refuse (float dans une colonne entière, f4 hors bornes...) : conversion NumPy
+                self._data[i] = values
+        self._n = self._counter[0] = n + 1  # le compteur n'avance qu'une fois la ligne écrite
+        if n + 1 == self._next_archive:
+            self._archive_rows()
+
+    def record(self, **values):
+        """Ajoute une ligne par noms de colonnes (colonnes absentes : 0)."""
+        n = self._n
+        i = n % self.capacity
+        data = self._data
+        data[i] = self._blank
+        row = data[i]
+        for name, value in values.items():
+            row[name] = value
+        self._n = self._counter[0] = n + 1
+        if n + 1 == self._next_archive:
+            self._archive_rows()
+
+    def _archive_rows(self):
+        """Confie à l'archive les lignes écrites depuis le dernier bloc (compression en arrière-plan)."""
+        start, stop = self._archived, self._n
+        if stop > start:
+            i, j = start % self.capacity, stop % self.capacity
+            if i < j:
+                rows = self._data[i:j].copy()
+            else:
+                rows = np.concatenate((self._data[i:], self._data[:j]))
+            self.archive.write_chunk(rows)
+        self._archived = stop
+        self._next_archive = stop + self.archive.chunk_rows
+
+    def flush(self):
+        """Force l'écriture sur disque (utile seulement contre une coupure de courant)."""
+        if isinstance(self._raw, np.memmap):
+            self._raw.flush()
+
+    def close(self):
+        if self.archive is not None:
+            self._archive_rows()
+            self.archive.close()
+            self._next_archive = -1
+        self.flush()
+        self._counter.release()
+        self._raw = None
+        if self._shm is not None:
+            if self._rows is not None:
+                self._rows.release()
+            self._data = self._columns = self._blank = self._rows = None  # libérer les vues avant de fermer le segment
+            self._shm.close()
+            if self._owner:
+                self._shm.unlink()
+                _created_segments.discard(self._shm.name)
+            self._shm = None
+
+    # --- Lecture (ordre chronologique) ---
+    @property
+    def total(self):
+        """Nombre total de lignes écrites depuis le début (y compris celles écrasées)."""
+        return self._n
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def _ordered(self, array):
+        n = self.total
+        if n <= self.capacity:
+            return array[:n].copy()
+        start = n % self.capacity
+        return np.concatenate((array[start:], array[:start]))
+
+    def __getitem__(self, name):
+        return self._ordered(self._columns[name])
+
+    def since(self, seen):
+        """
+        Lignes écrites après les `seen` premières (au plus capacity) et le nouveau total, sans verrou :
+        pour un lecteur d'un autre processus, qui ne voit le compteur que dans l'en-tête.
+
+        Returns:
+            (tableau structuré, total)
+        """
+        total = int(self._counter[0])
+        start = max(seen, total - self.capacity)
+        i, j = start % self.capacity, total % self.capacity
+        if start == total:
+            rows = self._data[:0].copy()
+        elif i < j:
+            rows = self._data[i:j].copy()
+        else:
+            rows = np.concatenate((self._data[i:], self._data[:j]))
+        # Écrasées pendant la copie, ligne en cours d'écriture comprise : l'écrivain de la ligne `compteur`
+        # réécrit l'emplacement de la ligne `compteur - capacity` avant d'incrémenter le compteur
+        overwritten = int(self._counter[0]) + 1 - self.capacity - start
+        if overwritten > 0:
+            rows = rows[overwritten:]
+        return rows, total
+
+    def to_array(self):
+        return self._ordered(self._data)
+
+    def last(self, n=1):
+        """Les n dernières lignes."""
+        return self.to_array()[-n:]
+
+    def to_dataframe(self):
+        import pandas as pd  # optionnel, comme dans krp_start.ipynb
+        return pd.DataFrame(self.to_array())
+
+#-------------------------------------------------------------------------------------------------------------
+# Archive compressée (.klog)
+#
+# Format (petit-boutiste) :
+#   en-tête : LOG_MAGIC | u32 longueur | JSON {fields, time_column, chunk_rows}
+#   bloc    : CHUNK_MAGIC | u32 longueur | JSON {n, t0, t1, columns: {nom: [décalage, taille]}} | colonnes zlib
+#   index   : INDEX_MAGIC | JSON [{offset, n, t0, t1, columns}, ...] | u64 position de l'index | LOG_MAGIC
+# Chaque colonne est « mélangée » par octets avant compression (octets de poids fort regroupés) :
+# les flottants d'une télémétrie régulière se compressent alors 2 à 4 fois mieux.
+# Sans index final (script tué), le lecteur reconstruit l'index en parcourant les blocs complets.
+
+def _shuffle(column):
+    itemsize = column.dtype.itemsize
+    return np.ascontiguousarray(column).view(np.uint8).reshape(-1, itemsize).T.tobytes()
+
+
+def _unshuffle(raw, dtype, n):
+    return np.frombuffer(raw, dtype=np.uint8).reshape(dtype.itemsize, n).T.copy().view(dtype).reshape(n)
+
+
+class FlightLogWriter:
+    def __init__(self, path, fields=DEFAULT_FIELDS, chunk_rows=4096, level=1, time_column='t'):
+        """
+        Args:
+            path: fichier .klog (écrasé)
+            fields: schéma [(nom, type NumPy), ...]
+            chunk_rows: lignes par bloc compressé
+            level: niveau zlib (1 = le plus rapide)
+            time_column: colonne servant à l'index temporel (croissante)
+        """
+        self.dtype = np.dtype([tuple(f) for f in fields])
+        if time_column not in self.dtype.names:
+            raise ValueError(f"Colonne de temps absente du schéma : {time_column}")
+        self.path = path
+        self.chunk_rows = int(chunk_rows)
+        self.level = level
+        self.time_column = time_column
+        self.index = []
+        self._buffer = np.zeros(self.chunk_rows, dtype=self.dtype)
+        self._n = 0
+        self._file = open(path, 'wb')
+        header = json.dumps({'fields': self.dtype.descr, 'time_column': time_column,
+                             'chunk_rows': self.chunk_rows}).encode()
+        self._file.write(LOG_MAGIC + struct.pack('<I', len(header)) + header)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='klog')  # zlib libère le GIL
+
+    def append(self, *values):
+        """Ajoute une ligne (valeurs dans l'ordre du schéma) ; un bloc plein part en compression."""
+        self._buffer[self._n] = values
+        self._n += 1
+        if self._n == self.chunk_rows:
+            self._executor.submit(self._write, self._buffer)
+            self._buffer = np.zeros(self.chunk_rows, dtype=self.dtype)
+            self._n = 0
+
+    def write_chunk(self, rows):
+        """Écrit un bloc de lignes déjà constitué (tableau structuré, non modifié ensuite)."""
+        if len(rows):
+            self._executor.submit(self._write, rows)
+
+    def _write(self, rows):
+        columns, blobs, offset = {}, [], 0
+        for name in self.dtype.names:
+            blob = zlib.compress(_shuffle(rows[name]), self.level)
+            columns[name] = [offset, len(blob)]
+            blobs.append(blob)
+            offset += len(blob)
+        t = rows[self.time_column]
+        entry = {'n': len(rows), 't0': float(t[0]), 't1': float(t[-1]), 'columns': columns}
+        header = json.dumps(entry).encode()
+        self._file.write(CHUNK_MAGIC + struct.pack('<I', len(header)) + header)
+        entry['offset'] = self._file.tell()
+        self._file.write(b''.join(blobs))
+        self.index.append(entry)
+
+    def close(self):
+        if self._file is None:
+            return
+        if self._n:
+            self._executor.submit(self._write, self._buffer[:self._n].copy())
+        self._executor.shutdown(wait=True)
+        position = self._file.tell()
+        self._file.write(INDEX_MAGIC + json.dumps(self.index).encode())
+        self._file.write(struct.pack('<Q', position) + LOG_MAGIC)
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def export_log(recorder, path, chunk_rows=4096, level=6, time_column='t'):
+    """Archive le contenu d'un FlightRecorder (ex. un .rec relu après un plantage) en .klog."""
+    rows = recorder.to_array()
+    with FlightLogWriter(path, recorder.dtype.descr, chunk_rows, level, time_column) as writer:
+        for start in range(0, len(rows), chunk_rows):
+            writer.write_chunk(rows[start:start + chunk_rows])
+    return path
+
+
+class FlightLog:
+    """Lecture d'un .klog : seuls les blocs recouvrant la fenêtre et les colonnes demandées sont lus."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(8) != LOG_MAGIC:
+                raise ValueError(f"{path} n'est pas une archive de vol")
+            length, = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(length))
+            self.dtype = np.dtype([tuple(field) for field in header['fields']])
+            self.time_column = header['time_column']
+            self.index = self._read_index(f) or self._scan(f, 12 + length)
+        self._t0 = np.array([c['t0'] for c in self.index])
+        self._t1 = np.array([c['t1'] for c in self.index])
+
+    @staticmethod
+    def _read_index(f):
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size < 28:
+            return None
+        f.seek(size - 16)
+        tail = f.read(16)
+        if tail[8:] != LOG_MAGIC:
+            return None
+        position, = struct.unpack('<Q', tail[:8])
+        f.seek(position)
+        if f.read(4) != INDEX_MAGIC:
+            return None
+        return json.loads(f.read(size - 16 - position - 4))
+
+    @staticmethod
+    def _scan(f, position):
+        """Reconstruit l'index d'une archive non fermée (les blocs incomplets sont ignorés)."""
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        index = []
+        while position + 8 <= size:
+            f.seek(position)
+            if f.read(4) != CHUNK_MAGIC:
+                break
+            length, = struct.unpack('<I', f.read(4))
+            try:
+                entry = json.loads(f.read(length))
+            except ValueError:
+                break
+            entry['offset'] = position + 8 + length
+            end = entry['offset'] + sum(size_ for _, size_ in entry['columns'].values())
+            if end > size:
+                break
+            index.append(entry)
+            position = end
+        return index
+
+    # --- Métadonnées ---
+    @property
+    def columns(self):
+        return list(self.dtype.names)
+
+    def __len__(self):
+        return sum(c['n'] for c in self.index)
+
+    @property
+    def time_range(self):
+        return (float(self._t0[0]), float(self._t1[-1])) if self.index else (None, None)
+
+    # --- Lecture ---
+    def _chunks(self, t_start, t_end):
+        keep = np.ones(len(self.index), dtype=bool)
+        if t_start is not None:
+            keep &= self._t1 >= t_start
+        if t_end is not None:
+            keep &= self._t0 <= t_end
+        return [self.index[i] for i in np.flatnonzero(keep)]
+
+    def read(self, columns=None, t_start=None, t_end=None):
+        """
+        Tableau structuré des colonnes demandées (toutes par défaut), restreint à [t_start, t_end].
+        """
+        names = list(columns) if columns is not None else self.columns
+        windowed = t_start is not None or t_end is not None
+        needed = names + [self.time_column] if windowed and self.time_column not in names else names
+        dtypes = {name: self.dtype.fields[name][0] for name in needed}
+        chunks = self._chunks(t_start, t_end)
+        parts = {name: [] for name in needed}
+        with open(self.path, 'rb') as f:
+            for chunk in chunks:
+                for name in needed:
+                    offset, size = chunk['columns'][name]
+                    f.seek(chunk['offset'] + offset)
+                    parts[name].append(_unshuffle(zlib.decompress(f.read(size)), dtypes[name], chunk['n']))
+        data = {name: np.concatenate(parts[name]) if chunks else np.zeros(0, dtypes[name]) for name in needed}
+        mask = slice(None)
+        if windowed:
+            t = data[self.time_column]
+            mask = np.ones(len(t), dtype=bool)
+            if t_start is not None:
+                mask &= t >= t_start
+            if t_end is not None:
+                mask &= t <= t_end
+        out = np.zeros(len(data[needed[0]][mask]) if needed else 0, dtype=[(name, dtypes[name]) for name in names])
+        for name in names:
+            out[name] = data[name][mask]
+        return out
+
+    def __getitem__(self, name):
+        return self.read([name])[name]
+
+    def to_dataframe(self, columns=None, t_start=None, t_end=None):
+        import pandas as pd  # optionnel, comme dans krp_start.ipynb
+        return pd.DataFrame(self.read(columns, t_start, t_end))
@@ -0,0 +1,290 @@
+# This file is part of k-RPC Carrière.
+
+# Rejeu d'un vol enregistré à travers le code de contrôle (banc de non-régression sans KSP)
+#
+# Chaque ligne d'un enregistrement (.rec ou .klog) contient les mesures vues par le script à ce tick
+# (altitude, apoapse, Q, TWR, poussée disponible...) et les commandes envoyées (gaz, tangage, étage).
+# Les contrôleurs rejoués (PID.update, linear_tangent, pitch_program, BoosterSeparation) recalculent
+# les commandes à partir des mêmes mesures et le rapport indique où elles s'écartent de l'enregistrement.
+#
+# Le rejeu est en boucle ouverte : les mesures enregistrées ne réagissent pas aux nouvelles commandes.
+# Il répond donc à « la nouvelle loi commande-t-elle la même chose dans les mêmes conditions ? » ;
+# pour l'effet sur la trajectoire, voir kRPC_MonteCarlo.py (simulateur).
+#
+# Utilisation :
+#     python kRPC_Replay.py Logs/Throttle_PID_20250101_120000.klog
+#
+#     report = replay('Logs/Throttle_PID_20250101_120000.klog',
+#                     [ThrottlePID(PID(kp=0.0024, ki=0.013, kd=0.0002, setpoint=20000))])
+#     report.report()
+
+# Librairies
+from dataclasses import dataclass, field
+import os
+import sys
+import time
+import numpy as np
+
+from kRPC_Tools import PID, BoosterSeparation, GuidanceProfile, linear_tangent, pitch_program
+from kRPC_Recorder import FlightLog, FlightRecorder
+
+DEFAULT_TOLERANCES = {
+    'throttle': 0.01,  # 0-1
+    'pitch':    0.5,   # °
+    'stage':    0,     # -
+}
+
+#-------------------------------------------------------------------------------------------------------------
+# Contrôleurs rejouables
+
+class ReplayController:
+    """
+    Loi de commande rejouée : lit les colonnes `inputs`, produit les colonnes `outputs`.
+
+    step(dt, *valeurs) est appelé une fois par ligne enregistrée et renvoie un tuple de commandes.
+    """
+    inputs = ()
+    outputs = ()
+
+    def start(self, data):
+        """Appelé avant la première ligne (initialisation à partir de l'enregistrement)."""
+        pass
+
+    def step(self, dt, *values):
+        raise NotImplementedError
+
+
+class ThrottlePID(ReplayController):
+    """Gaz = PID sur une mesure, borné à [0, 1] (kRPC_Throttle_PID.py, kRPC_Telemetry.py, kRPC_Orbiter2.py)."""
+    outputs = ('throttle',)
+
+    def __init__(self, pid, measure='q', dt=None):
+        self.pid = pid
+        self.inputs = (measure,)
+        self.dt = dt  # s (période fixe utilisée par le script ; None = écart entre les lignes)
+
+    def step(self, dt, value):
+        return (max(0.0, min(1.0, self.pid.update(value, self.dt or dt))),)
+
+
+class AscentThrottle(ReplayController):
+    """Gaz de l'ascension de krpc_Tests.py : PID sur le TWR (optionnel), réduit puis coupé près de l'apoapse visée."""
+    inputs = ('altitude', 'apoapsis', 'twr')
+    outputs = ('throttle',)
+
+    def __init__(self, target_apoapsis, pid=None, turn_altitude=250, reduce_at=0.95, reduced=0.25, dt=None):
+        self.target_apoapsis = target_apoapsis
+        self.pid = pid
+        self.turn_altitude = turn_altitude
+        self.reduce_at = reduce_at
+        self.reduced = reduced
+        self.dt = dt
+        self.throttle = 1.0
+
+    def start(self, data):
+        self.throttle = float(data['throttle'][0])
+
+    def step(self, dt, altitude, apoapsis, twr):
+        if altitude >= self.turn_altitude:
+            if self.pid is not None:
+                self.throttle = max(0.0, min(1.0, self.pid.update(twr, self.dt or dt)))
+            if apoapsis >= self.reduce_at * self.target_apoapsis:
+                self.throttle = self.reduced
+                if apoapsis >= self.target_apoapsis:
+                    self.throttle = 0.0
+        return (self.throttle,)
+
+
+class PitchLaw(ReplayController):
+    """Tangage (° au-dessus de l'horizon) = law(altitude ou apoapse) au-dessus de start_altitude, 90° avant."""
+    outputs = ('pitch',)
+
+    def __init__(self, law, variable='altitude', start_altitude=0.0, initial=90.0):
+        self.law = law
+        self.variable = variable
+        self.inputs = ('altitude',) if variable == 'altitude' else ('altitude', variable)
+        self.start_altitude = start_altitude
+        self.pitch = initial
+
+    def step(self, dt, altitude, x=None):
+        if altitude >= self.start_altitude:
+            self.pitch = self.law(altitude if x is None else x)
+        return (self.pitch,)
+
+    @classmethod
+    def linear_tangent(cls, orbit_height=100000, s=8, start_altitude=0.0):
+        """kRPC_Tools.linear_tangent() appelée à chaque ligne (référence de GuidanceProfile.linear_tangent)."""
+        return cls(lambda h: float(linear_tangent(h, orbit_height, s)), 'altitude', start_altitude)
+
+    @classmethod
+    def pitch_program(cls, atmosphere_depth, switch_alt=250, scale_factor=1):
+        """90 - kRPC_Tools.pitch_program(), fonction de l'apoapse au-dessus de switch_alt."""
+        return cls(lambda ap: 90 - pitch_program(switch_alt, ap, atmosphere_depth, switch_alt, scale_factor),
+                   'apoapsis', switch_alt)
+
+    @classmethod
+    def profile(cls, profile, start_altitude=0.0):
+        """Table GuidanceProfile (celle utilisée en vol par les scripts)."""
+        return cls(profile.lookup, profile.variable, start_altitude)
+
+
+class Staging(ReplayController):
+    """
+    Étage courant selon BoosterSeparation (krpc_Tests.staging), une activation par décision.
+
+    En vol, le staging tourne à 20 Hz et l'enregistrement à 10 Hz : un changement d'étage peut
+    apparaître une ligne plus tôt dans l'enregistrement que dans le rejeu.
+    """
+    inputs = ('available_thrust', 'booster_fuel')
+    outputs = ('stage',)
+
+    def __init__(self, separation):
+        self.separation = separation
+        self.stage = None
+
+    def start(self, data):
+        self.stage = int(data['stage'][0])
+        if self.separation.max_thrust is None:  # poussée boosters allumés : première ligne enregistrée
+            self.separation.max_thrust = float(data['available_thrust'][0])
+
+    def step(self, dt, available_thrust, booster_fuel):
+        if self.separation.update(available_thrust, booster_fuel) is not None:
+            self.stage -= 1
+        return (self.stage,)
+
+#-------------------------------------------------------------------------------------------------------------
+# Rejeu
+
+@dataclass
+class Divergence:
+    name:       str
+    max_error:  float
+    rms_error:  float
+    count:      int           # lignes hors tolérance
+    first_t:    float = None  # s (première ligne hors tolérance)
+    tolerance:  float = 0.0
+
+
+@dataclass
+class ReplayReport:
+    rows:        int
+    duration:    float  # s (durée de vol rejouée)
+    elapsed:     float  # s (temps de calcul)
+    divergences: dict = field(default_factory=dict)  # nom -> Divergence
+    recorded:    dict = field(default_factory=dict)  # nom -> tableau enregistré
+    replayed:    dict = field(default_factory=dict)  # nom -> tableau recalculé
+    t:           np.ndarray = None
+
+    @property
+    def ok(self):
+        return all(d.count == 0 for d in self.divergences.values())
+
+    def report(self):
+        speed = self.duration / self.elapsed if self.elapsed > 0 else float('inf')
+        print(f"{self.rows} lignes ({self.duration:.0f} s de vol) rejouées en {self.elapsed:.2f} s (x{speed:.0f})")
+        print(f"{'Commande':<12}{'Écart max':>12}{'RMS':>12}{'Tolérance':>12}{'Hors tol.':>11}{'Dès t (s)':>11}")
+        for d in self.divergences.values():
+            first = f"{d.first_t:>11.2f}" if d.first_t is not None else f"{'-':>11}"
+            print(f"{d.name:<12}{d.max_error:>12.4g}{d.rms_error:>12.4g}{d.tolerance:>12.4g}{d.count:>11}{first}")
+        print("✅ Commandes identiques à l'enregistrement" if self.ok else "⚠️ Divergence par rapport à l'enregistrement")
+
+
+def load(source):
+    """Tableau structuré d'un enregistrement : chemin .rec / .klog, FlightRecorder, FlightLog ou tableau."""
+    if isinstance(source, np.ndarray):
+        return source
+    if isinstance(source, FlightLog):
+        return source.read()
+    if isinstance(source, FlightRecorder):
+        return source.to_array()
+    if str(source).endswith('.klog'):
+        return FlightLog(source).read()
+    return FlightRecorder.open(source, mode='r').to_array()
+
+
+def replay(source, controllers, tolerances=None, time_column='t'):
+    """
+    Rejoue l'enregistrement à travers les contrôleurs, aussi vite que le CPU le permet.
+
+    Args:
+        source: voir load()
+        controllers: liste de ReplayController (sorties distinctes)
+        tolerances: écart admis par commande (défaut : DEFAULT_TOLERANCES)
+    Returns:
+        ReplayReport
+    """
+    data = load(source)
+    tolerances = {**DEFAULT_TOLERANCES, **(tolerances or {})}
+    t = data[time_column].astype(float)
+    n = len(t)
+    dts = np.diff(t, prepend=t[0] - (t[1] - t[0] if n > 1 else 0.0)).tolist()
+
+    report = ReplayReport(n, float(t[-1] - t[0]) if n else 0.0, 0.0, t=t)
+    start = time.perf_counter()
+    for controller in controllers:
+        controller.start(data)
+        step = controller.step
+        rows = zip(dts, *(data[name].tolist() for name in controller.inputs))  # floats Python : pas de scalaires NumPy
+        results = np.array([step(*row) for row in rows], dtype=float).reshape(n, len(controller.outputs))
+        for j, name in enumerate(controller.outputs):
+            report.replayed[name] = results[:, j]
+    report.elapsed = time.perf_counter() - start
+
+    for name, values in report.replayed.items():
+        recorded = data[name].astype(float)
+        error = np.abs(values - recorded)
+        tolerance = tolerances.get(name, 0.0)
+        outside = error > tolerance + 1e-6 * np.abs(recorded)  # stockage float32 de l'enregistrement
+        report.recorded[name] = recorded
+        report.divergences[name] = Divergence(
+            name,
+            float(error.max()) if n else 0.0,
+            float(np.sqrt(np.mean(error ** 2))) if n else 0.0,
+            int(outside.sum()),
+            float(t[np.argmax(outside)]) if outside.any() else None,
+            tolerance,
+        )
+    return report
+
+#-------------------------------------------------------------------------------------------------------------
+# Contrôleurs des scripts (mêmes réglages qu'en vol), choisis d'après le nom de l'enregistrement
+
+def throttle_pid_controllers():
+    return [ThrottlePID(PID(kp=0.002, ki=0, kd=0.0, setpoint=20000, min_output=0, max_output=1))]
+
+
+def orbiter2_controllers(target_altitude=100000, turn_start_altitude=500):
+    return [ThrottlePID(PID(kp=0.002, setpoint=20000), dt=0.05),
+            PitchLaw.profile(GuidanceProfile.linear_tangent(target_altitude, s=8), turn_start_altitude)]
+
+
+def krpc_tests_controllers(target_apoapsis=100_000, atmosphere_depth=70_000, booster_type='liquid'):
+    return [AscentThrottle(target_apoapsis, dt=0.1),
+            PitchLaw.profile(GuidanceProfile.pitch_program(atmosphere_depth, switch_alt=250, scale_factor=1), 250),
+            Staging(BoosterSeparation(booster_type))]
+
+
+SCRIPT_CONTROLLERS = {
+    'Throttle_PID': throttle_pid_controllers,
+    'Telemetry':    throttle_pid_controllers,
+    'Orbiter2':     orbiter2_controllers,
+    'krpc_Tests':   krpc_tests_controllers,
+}
+
+
+def script_name(path):
+    """Nom du script d'après log_path() : Logs/<nom>_AAAAMMJJ_HHMMSS.klog -> <nom>."""
+    return os.path.basename(path).rsplit('.', 1)[0].rsplit('_', 2)[0]
+
+#-------------------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(f"Utilisation : python {os.path.basename(__file__)} Logs/<script>_<date>.klog")
+        sys.exit(1)
+    path = sys.argv[1]
+    name = script_name(path)
+    if name not in SCRIPT_CONTROLLERS:
+        print(f"Pas de contrôleurs connus pour {name} ({', '.join(SCRIPT_CONTROLLERS)})")
+        sys.exit(1)
+    replay(path, SCRIPT_CONTROLLERS[name]()).report()
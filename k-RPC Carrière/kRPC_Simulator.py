@@ -0,0 +1,1357 @@
+# This file is part of k-RPC Carrière.
+
+# Simulateur hors-ligne qui imite la surface kRPC (conn / vessel) utilisée par les scripts.
+#
+# Utilisation :
+#     import kRPC_Simulator as sim
+#     conn = sim.connect(name='Orbiter1')       # à la place de krpc.connect(...)
+#     vessel = conn.space_center.active_vessel
+#     with conn.patch_sleep():                  # time.sleep(dt) fait avancer la simulation
+#         ...  # script de guidage inchangé
+#
+# Le temps simulé n'avance que par conn.advance(dt), time.sleep (si patch_sleep est actif),
+# warp_to, auto_pilot.wait et event.wait. Chaque accès à une propriété compte comme un
+# appel distant (conn.rpc_count) et peut coûter `rpc_latency` secondes de temps de jeu,
+# alors que la lecture d'un stream est gratuite, comme dans le vrai kRPC.
+#
+# Modèle physique : 2 corps plan (orbite équatoriale, cap Est), atmosphère exponentielle,
+# traînée Cd*A, étages en série (un étage allumé à la fois), Isp interpolé avec la pression.
+
+# Librairies
+from dataclasses import dataclass, field
+from enum import Enum
+import contextlib
+import functools
+import math
+import threading
+import time
+import numpy as np
+
+G0 = 9.80665  # m/s² (valeur utilisée par KSP)
+PHYSICS_FRAME = 0.02  # s (durée d'une frame physique de KSP)
+
+#-------------------------------------------------------------------------------------------------------------
+# Configuration du corps céleste et du vaisseau
+
+@dataclass
+class BodyConfig:
+    name:                    str   = "Kerbin"
+    gravitational_parameter: float = 3.5316e12       # m³/s²
+    equatorial_radius:       float = 600_000.0       # m
+    rotational_period:       float = 21_549.425      # s
+    atmosphere_depth:        float = 70_000.0        # m
+    surface_pressure:        float = 101_325.0       # Pa
+    surface_density:         float = 1.225           # kg/m³
+    scale_height:            float = 5_600.0         # m
+    sphere_of_influence:     float = 84_159_286.0    # m
+    launch_longitude:        float = -74.557         # ° (KSC)
+
+    @property
+    def rotational_speed(self):
+        return 2 * math.pi / self.rotational_period  # rad/s
+
+    @property
+    def surface_gravity(self):
+        return self.gravitational_parameter / self.equatorial_radius ** 2
+
+
+@dataclass
+class StageConfig:
+    name:            str
+    dry_mass:        float           # kg (réservoirs + moteurs + découpleur)
+    propellant_mass: float           # kg
+    thrust_vac:      float           # N (tous moteurs de l'étage)
+    isp_vac:         float           # s
+    isp_asl:         float           # s
+    fuel:            str   = 'liquid'  # 'liquid' ; 'solid'
+    engine_title:    str   = 'LV-T45 "Swivel" Liquid Fuel Engine'
+    engine_count:    int   = 1
+
+
+@dataclass
+class VesselConfig:
+    name:           str                = "Sim Vessel"
+    stages:         list               = field(default_factory=list)  # ordre d'allumage
+    payload_mass:   float              = 1_000.0  # kg (capsule, jamais découplée)
+    cd_area:        float              = 1.0      # m² (Cd * surface de référence)
+    max_slew_rate:  float              = 20.0     # °/s (rotation max de l'auto-pilote)
+    crew:           list               = field(default_factory=lambda: ["Jebediah Kerman"])
+
+
+KERBIN = BodyConfig()
+
+DEFAULT_VESSEL = VesselConfig(
+    name="Sim Orbiter",
+    stages=[
+        StageConfig("Lanceur", dry_mass=2_000.0, propellant_mass=16_000.0,
+                    thrust_vac=400_000.0, isp_vac=310.0, isp_asl=280.0,
+                    engine_title='LV-T45 "Swivel" Liquid Fuel Engine'),
+        StageConfig("Etage supérieur", dry_mass=800.0, propellant_mass=4_000.0,
+                    thrust_vac=60_000.0, isp_vac=345.0, isp_asl=85.0,
+                    engine_title='LV-909 "Terrier" Liquid Fuel Engine'),
+    ],
+)
+
+# Conversion masse d'ergols -> unités KSP (densité 5 kg/u pour LF/Ox, 7.5 kg/u pour SolidFuel)
+RESOURCE_SPLIT = {
+    'liquid': {'LiquidFuel': (0.45, 5.0), 'Oxidizer': (0.55, 5.0)},
+    'solid':  {'SolidFuel': (1.0, 7.5)},
+}
+
+BIOMES = [(-180.0, "Water"), (-80.0, "Shores"), (-74.7, "Grasslands"), (-60.0, "Highlands"),
+          (-30.0, "Mountains"), (0.0, "Deserts"), (40.0, "Badlands"), (90.0, "Water")]
+
+#-------------------------------------------------------------------------------------------------------------
+# Physique vectorisée (N vaisseaux à la fois, tableaux NumPy)
+
+def atmosphere(body, altitude):
+    """Pression (Pa) et densité (kg/m³) pour un tableau d'altitudes."""
+    h = np.maximum(altitude, 0.0)
+    ratio = np.where(h < body.atmosphere_depth, np.exp(-h / body.scale_height), 0.0)
+    return body.surface_pressure * ratio, body.surface_density * ratio
+
+
+def kepler_propagate(pos, vel, mu, dt, iterations=8):
+    """
+    Propage analytiquement des orbites elliptiques planes (fonctions f et g).
+
+    Args:
+        pos, vel: tableaux (N, 2) dans le repère inertiel du corps
+        mu: paramètre gravitationnel
+        dt: durée de propagation (s), scalaire ou tableau (N,)
+    """
+    r0 = np.hypot(pos[:, 0], pos[:, 1])
+    v2 = vel[:, 0] ** 2 + vel[:, 1] ** 2
+    rv = pos[:, 0] * vel[:, 0] + pos[:, 1] * vel[:, 1]
+    a = 1.0 / (2.0 / r0 - v2 / mu)
+    n = np.sqrt(mu / a ** 3)
+    e_cos = 1.0 - r0 / a
+    e_sin = rv / np.sqrt(mu * a)
+    e = np.hypot(e_cos, e_sin)
+    E0 = np.arctan2(e_sin, e_cos)
+    M = E0 - e_sin + n * dt
+    E = M + e * np.sin(M)
+    for _ in range(iterations):  # Newton sur E - e sin E = M
+        E = E - (E - e * np.sin(E) - M) / (1.0 - e * np.cos(E))
+    dE = E - E0
+    f = 1.0 - a / r0 * (1.0 - np.cos(dE))
+    g = dt - (dE - np.sin(dE)) / n
+    new_pos = f[:, None] * pos + g[:, None] * vel
+    r1 = np.hypot(new_pos[:, 0], new_pos[:, 1])
+    f_dot = -np.sqrt(mu * a) / (r0 * r1) * np.sin(dE)
+    g_dot = 1.0 - a / r1 * (1.0 - np.cos(dE))
+    new_vel = f_dot[:, None] * pos + g_dot[:, None] * vel
+    return new_pos, new_vel
+
+
+def orbital_elements(pos, vel, mu):
+    """Demi-grand axe, excentricité, rayon d'apoapse/périapse et temps jusqu'à l'apoapse."""
+    r = np.hypot(pos[:, 0], pos[:, 1])
+    v2 = vel[:, 0] ** 2 + vel[:, 1] ** 2
+    rv = pos[:, 0] * vel[:, 0] + pos[:, 1] * vel[:, 1]
+    a = 1.0 / (2.0 / r - v2 / mu)
+    e_cos = 1.0 - r / a
+    e_sin = rv / np.sqrt(np.abs(mu * a))
+    h = pos[:, 0] * vel[:, 1] - pos[:, 1] * vel[:, 0]
+    e = np.sqrt(np.maximum(1.0 + (v2 - 2 * mu / r) * h ** 2 / mu ** 2, 0.0))
+    apoapsis = np.where(e < 1.0, a * (1.0 + e), np.inf)
+    periapsis = a * (1.0 - e)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        n = np.sqrt(mu / np.abs(a) ** 3)
+        E = np.arctan2(e_sin, e_cos)
+        M = E - e_sin
+        period = np.where(e < 1.0, 2 * np.pi / n, np.inf)
+        time_to_apoapsis = np.where(e < 1.0, np.mod(np.pi - M, 2 * np.pi) / n, np.inf)
+        time_to_periapsis = np.where(e < 1.0, np.mod(-M, 2 * np.pi) / n, np.nan)
+    return {'semi_major_axis': a, 'eccentricity': e, 'apoapsis': apoapsis,
+            'periapsis': periapsis, 'period': period, 'time_to_apoapsis': time_to_apoapsis,
+            'time_to_periapsis': time_to_periapsis, 'radius': r, 'speed': np.sqrt(v2)}
+
+
+class SimState:
+    """
+    État vectorisé de N vaisseaux identiques au départ, posés au pas de tir.
+
+    Les tableaux par étage (S,) décrivent le vaisseau, les tableaux (N,) ou (N, 2)
+    l'état dynamique. `step` fait avancer les N vaisseaux d'un pas en une seule passe.
+    """
+
+    def __init__(self, config=DEFAULT_VESSEL, body=KERBIN, n=1):
+        self.config = config
+        self.body = body
+        self.n = n
+        stages = config.stages
+        self.n_stages = len(stages)
+        self.dry = np.array([s.dry_mass for s in stages], dtype=float)
+        self.prop_max = np.array([s.propellant_mass for s in stages], dtype=float)
+        self.thrust_vac = np.array([s.thrust_vac for s in stages], dtype=float)
+        self.isp_vac = np.array([s.isp_vac for s in stages], dtype=float)
+        self.isp_asl = np.array([s.isp_asl for s in stages], dtype=float)
+        self.solid = np.array([s.fuel == 'solid' for s in stages], dtype=bool)
+        self.stage_index = np.arange(self.n_stages)
+        self.rows = np.arange(n)
+
+        R = body.equatorial_radius
+        self.pos = np.tile([R, 0.0], (n, 1))
+        self.vel = np.tile([0.0, body.rotational_speed * R], (n, 1))
+        self.prop = np.tile(self.prop_max, (n, 1))
+        self.activations = np.zeros(n, dtype=int)
+        self.throttle = np.zeros(n)
+        self.attitude = np.zeros(n)        # angle inertiel de l'axe du vaisseau (rad)
+        self.landed = np.ones(n, dtype=bool)
+        self.dv_applied = np.zeros((n, 2))  # Δv propulsif cumulé (repère inertiel)
+        self.t = 0.0
+
+        # Bilans (pour l'évaluation des trajectoires)
+        self.dv_spent = np.zeros(n)
+        self.gravity_loss = np.zeros(n)
+        self.drag_loss = np.zeros(n)
+        self.max_q = np.zeros(n)
+
+        # Dernières valeurs calculées par step()
+        self.thrust = np.zeros(n)
+        self.q = np.zeros(n)
+        self.pressure = np.full(n, body.surface_pressure)
+
+    # --- Grandeurs dérivées ---
+    def engine_stage(self):
+        """Indice de l'étage allumé (-1 avant le décollage)."""
+        return self.activations - 1
+
+    def attached(self):
+        """Masque (N, S) des étages encore attachés."""
+        dropped = np.maximum(self.activations - 1, 0)
+        return self.stage_index[None, :] >= dropped[:, None]
+
+    def mass(self):
+        return self.config.payload_mass + ((self.dry + self.prop) * self.attached()).sum(axis=1)
+
+    def altitude(self):
+        return np.hypot(self.pos[:, 0], self.pos[:, 1]) - self.body.equatorial_radius
+
+    def surface_velocity(self):
+        omega = self.body.rotational_speed
+        return self.vel + omega * np.stack([self.pos[:, 1], -self.pos[:, 0]], axis=1)
+
+    def up_angle(self):
+        return np.arctan2(self.pos[:, 1], self.pos[:, 0])
+
+    def pitch_to_attitude(self, pitch_deg, heading_deg=90.0):
+        """Convertit un tangage (° au-dessus de l'horizon) et un cap en angle inertiel."""
+        p = np.radians(pitch_deg)
+        east = np.cos(p) * np.sin(np.radians(heading_deg))
+        return self.up_angle() + np.arctan2(east, np.sin(p))
+
+    def available_thrust(self, pressure=None):
+        """Poussée disponible à plein gaz (N) pour chaque vaisseau."""
+        pressure = self.pressure if pressure is None else pressure
+        stage = self.engine_stage()
+        idx = np.maximum(stage, 0)
+        ok = (stage >= 0) & (self.prop[self.rows, idx] > 0)
+        isp = self._isp(idx, pressure)
+        return np.where(ok, self.thrust_vac[idx] * isp / self.isp_vac[idx], 0.0)
+
+    def _isp(self, idx, pressure):
+        p_ratio = np.minimum(pressure / self.body.surface_pressure, 1.0)
+        return self.isp_vac[idx] + (self.isp_asl[idx] - self.isp_vac[idx]) * p_ratio
+
+    # --- Intégration ---
+    def step(self, dt, target_attitude=None, slew_rate=None):
+        """Fait avancer les N vaisseaux de dt secondes (Euler semi-implicite)."""
+        body = self.body
+        x, y = self.pos[:, 0], self.pos[:, 1]
+        vx, vy = self.vel[:, 0], self.vel[:, 1]
+        r = np.hypot(x, y)
+        pressure, density = atmosphere(body, r - body.equatorial_radius)
+
+        # Orientation : rotation limitée vers la cible
+        if target_attitude is not None:
+            rate = np.radians(self.config.max_slew_rate if slew_rate is None else slew_rate) * dt
+            diff = (target_attitude - self.attitude + np.pi) % (2 * np.pi) - np.pi
+            self.attitude = self.attitude + np.minimum(np.maximum(diff, -rate), rate)
+
+        # Propulsion
+        stage = self.activations - 1
+        idx = np.maximum(stage, 0)
+        prop_left = self.prop[self.rows, idx]
+        burning = (stage >= 0) & (prop_left > 0)
+        throttle = np.where(self.solid[idx], 1.0, np.minimum(np.maximum(self.throttle, 0.0), 1.0)) * burning
+        isp = self._isp(idx, pressure)
+        mdot = np.minimum(self.thrust_vac[idx] / (self.isp_vac[idx] * G0) * throttle, prop_left / dt)
+        thrust = mdot * isp * G0
+        mass = self.mass()
+        a_thrust = thrust / mass
+        self.prop[self.rows, idx] = prop_left - mdot * dt
+
+        # Traînée (vitesse par rapport à l'atmosphère en rotation)
+        omega = body.rotational_speed
+        vsx, vsy = vx + omega * y, vy - omega * x
+        speed_srf = np.hypot(vsx, vsy)
+        q = 0.5 * density * speed_srf ** 2
+        a_drag = q * self.config.cd_area / mass
+        k_drag = a_drag / np.maximum(speed_srf, 1e-9)
+
+        # Accélérations
+        g = body.gravitational_parameter / r ** 2
+        atx, aty = a_thrust * np.cos(self.attitude), a_thrust * np.sin(self.attitude)
+        vx = vx + (atx - g * x / r - k_drag * vsx) * dt
+        vy = vy + (aty - g * y / r - k_drag * vsy) * dt
+        x = x + vx * dt
+        y = y + vy * dt
+        self.dv_applied[:, 0] += atx * dt
+        self.dv_applied[:, 1] += aty * dt
+
+        # Sol : le vaisseau reste posé tant que la poussée ne compense pas son poids
+        r_new = np.hypot(x, y)
+        grounded = r_new < body.equatorial_radius
+        if grounded.any():
+            scale = np.where(grounded, body.equatorial_radius / r_new, 1.0)
+            x, y = x * scale, y * scale
+            vx = np.where(grounded, -omega * y, vx)
+            vy = np.where(grounded, omega * x, vy)
+            r_new = np.where(grounded, body.equatorial_radius, r_new)
+        self.pos[:, 0], self.pos[:, 1] = x, y
+        self.vel[:, 0], self.vel[:, 1] = vx, vy
+        self.landed = grounded
+
+        # Bilans
+        sin_gamma = (x * vx + y * vy) / (r_new * np.maximum(np.hypot(vx, vy), 1e-9))
+        self.dv_spent += a_thrust * dt
+        self.gravity_loss += np.where(grounded, 0.0, g * sin_gamma * dt)
+        self.drag_loss += a_drag * dt
+        self.max_q = np.maximum(self.max_q, q)
+        self.thrust, self.q, self.pressure = thrust, q, pressure
+        self.t += dt
+
+    def coast(self, dt):
+        """Propagation képlérienne (hors atmosphère, moteurs coupés)."""
+        self.pos, self.vel = kepler_propagate(self.pos, self.vel, self.body.gravitational_parameter, dt)
+        self.thrust = np.zeros(self.n)
+        self.q = np.zeros(self.n)
+        self.pressure = np.zeros(self.n)
+        self.t += dt
+
+#-------------------------------------------------------------------------------------------------------------
+# Outils de la couche "RPC" simulée
+
+class _rpc(property):
+    """Propriété simulée : chaque accès compte comme un appel distant."""
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        obj._sim.rpc()
+        return self.fget(obj)
+
+    def __set__(self, obj, value):
+        obj._sim.rpc()
+        super().__set__(obj, value)
+
+
+def _rpc_method(fn):
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        self._sim.rpc()
+        return fn(self, *args, **kwargs)
+    return wrapper
+
+
+def _raw_call(func, args):
+    """Renvoie un appelable sans coût RPC (utilisé par les streams et les expressions)."""
+    if func is getattr and len(args) == 2:
+        obj, name = args
+        attr = getattr(type(obj), name, None)
+        if isinstance(attr, _rpc):
+            return lambda: attr.fget(obj)
+    raw = getattr(func, '__wrapped__', None)
+    owner = getattr(func, '__self__', None)
+    if raw is not None and owner is not None:
+        return lambda: raw(owner, *args)
+    return lambda: func(*args)
+
+
+def _unit(v):
+    n = math.hypot(v[0], v[1])
+    return (v[0] / n, v[1] / n) if n > 0 else (0.0, 0.0)
+
+
+def _rot90(v):
+    return (-v[1], v[0])
+
+
+class VesselType(Enum):
+    ship = 0
+    probe = 1
+
+
+class VesselSituation(Enum):
+    pre_launch = 0
+    landed = 1
+    flying = 2
+    sub_orbital = 3
+    orbiting = 4
+    escaping = 5
+
+
+class SASMode(Enum):
+    stability_assist = 0
+    prograde = 1
+    retrograde = 2
+    maneuver = 3
+
+
+class ReferenceFrame:
+    """Repère simulé : renvoie ses axes (X, Y, Z) projetés dans le plan orbital."""
+
+    def __init__(self, sim, kind, node=None):
+        self._sim = sim
+        self.kind = kind
+        self.node = node
+
+    def axes(self):
+        s = self._sim.state
+        up = _unit((s.pos[0, 0], s.pos[0, 1]))
+        if self.kind == 'surface':  # x = haut, y = nord (hors plan), z = est
+            return up, (0.0, 0.0), _rot90(up)
+        if self.kind == 'node':
+            y = self.node._burn_direction()
+        elif self.kind == 'surface_velocity':
+            y = _unit(s.surface_velocity()[0])
+        else:  # 'orbital' et repères vaisseau
+            y = _unit(s.vel[0])
+        return _rot90(y), y, (0.0, 0.0)
+
+    def direction_angle(self, direction):
+        X, Y, Z = self.axes()
+        dx = direction[0] * X[0] + direction[1] * Y[0] + direction[2] * Z[0]
+        dy = direction[0] * X[1] + direction[1] * Y[1] + direction[2] * Z[1]
+        return math.atan2(dy, dx)
+
+#-------------------------------------------------------------------------------------------------------------
+# Streams, appels et événements
+
+class SimStream:
+    def __init__(self, sim, raw):
+        self._sim = sim
+        self._raw = raw
+        self._callbacks = []
+        self._last = None
+        self.rate = 0.0  # Hz (0 = aussi vite que possible)
+        self.started = True
+        self.condition = threading.Condition()
+
+    def __call__(self):
+        return self._raw()
+
+    def start(self, wait=True):
+        self.started = True
+
+    def wait(self, timeout=None):
+        previous = self._raw()
+        self._sim.run_until(lambda: self._raw() != previous, timeout)
+
+    def add_callback(self, callback):
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        self._callbacks.remove(callback)
+
+    def remove(self):
+        self._sim.streams.discard(self)
+
+    def _notify(self):
+        if not self._callbacks:
+            return
+        value = self._raw()
+        if value != self._last:
+            self._last = value
+            for callback in list(self._callbacks):
+                callback(value)
+
+
+class _Call:
+    def __init__(self, raw):
+        self.raw = raw
+
+
+class Expression:
+    """Sous-ensemble de krpc.Expression évalué localement."""
+
+    def __init__(self, evaluate):
+        self.evaluate = evaluate
+
+    @classmethod
+    def constant_double(cls, value):
+        return cls(lambda: float(value))
+    constant_float = constant_double
+
+    @classmethod
+    def constant_int(cls, value):
+        return cls(lambda: int(value))
+
+    @classmethod
+    def constant_bool(cls, value):
+        return cls(lambda: bool(value))
+
+    @classmethod
+    def constant_string(cls, value):
+        return cls(lambda: str(value))
+
+    @classmethod
+    def call(cls, call):
+        return cls(call.raw)
+
+    @classmethod
+    def _binary(cls, op):
+        return lambda a, b: cls(lambda: op(a.evaluate(), b.evaluate()))
+
+
+for _name, _op in {
+        'equal': lambda a, b: a == b, 'not_equal': lambda a, b: a != b,
+        'greater_than': lambda a, b: a > b, 'greater_than_or_equal': lambda a, b: a >= b,
+        'less_than': lambda a, b: a < b, 'less_than_or_equal': lambda a, b: a <= b,
+        'and_': lambda a, b: a and b, 'or_': lambda a, b: a or b,
+        'add': lambda a, b: a + b, 'subtract': lambda a, b: a - b,
+        'multiply': lambda a, b: a * b, 'divide': lambda a, b: a / b}.items():
+    setattr(Expression, _name, staticmethod(Expression._binary(_op)))
+Expression.not_ = staticmethod(lambda a: Expression(lambda: not a.evaluate()))
+
+
+class SimEvent:
+    def __init__(self, sim, expression):
+        self._sim = sim
+        self.expression = expression
+        self.condition = threading.Condition()
+        self._callbacks = []
+        self._fired = False
+
+    def start(self):
+        pass
+
+    def wait(self, timeout=None):
+        self._sim.run_until(self.expression.evaluate, timeout)
+
+    def add_callback(self, callback):
+        self._callbacks.append(callback)
+
+    def remove(self):
+        self._sim.events.discard(self)
+
+    def _notify(self):
+        value = bool(self.expression.evaluate())
+        if value and not self._fired:
+            for callback in list(self._callbacks):
+                callback()
+        self._fired = value
+
+#-------------------------------------------------------------------------------------------------------------
+# Objets kRPC simulés
+
+class SimBody:
+    def __init__(self, sim, config):
+        self._sim = sim
+        self.config = config
+        self.reference_frame = ReferenceFrame(sim, 'body')
+        self.non_rotating_reference_frame = ReferenceFrame(sim, 'body_inertial')
+        self.orbital_reference_frame = self.non_rotating_reference_frame
+
+    name = _rpc(lambda self: self.config.name)
+    gravitational_parameter = _rpc(lambda self: self.config.gravitational_parameter)
+    equatorial_radius = _rpc(lambda self: self.config.equatorial_radius)
+    atmosphere_depth = _rpc(lambda self: self.config.atmosphere_depth)
+    has_atmosphere = _rpc(lambda self: self.config.atmosphere_depth > 0)
+    surface_gravity = _rpc(lambda self: self.config.surface_gravity)
+    rotational_period = _rpc(lambda self: self.config.rotational_period)
+    rotational_speed = _rpc(lambda self: self.config.rotational_speed)
+    sphere_of_influence = _rpc(lambda self: self.config.sphere_of_influence)
+
+    @_rpc_method
+    def pressure_at(self, altitude):
+        return float(atmosphere(self.config, np.array([altitude]))[0][0])
+
+    @_rpc_method
+    def density_at(self, altitude):
+        return float(atmosphere(self.config, np.array([altitude]))[1][0])
+
+
+class SimOrbit:
+    def __init__(self, sim):
+        self._sim = sim
+
+    def _el(self, key):
+        s = self._sim.state
+        return float(orbital_elements(s.pos, s.vel, s.body.gravitational_parameter)[key][0])
+
+    body = _rpc(lambda self: self._sim.body)
+    apoapsis = _rpc(lambda self: self._el('apoapsis'))
+    periapsis = _rpc(lambda self: self._el('periapsis'))
+    apoapsis_altitude = _rpc(lambda self: self._el('apoapsis') - self._sim.body.config.equatorial_radius)
+    periapsis_altitude = _rpc(lambda self: self._el('periapsis') - self._sim.body.config.equatorial_radius)
+    semi_major_axis = _rpc(lambda self: self._el('semi_major_axis'))
+    eccentricity = _rpc(lambda self: self._el('eccentricity'))
+    period = _rpc(lambda self: self._el('period'))
+    radius = _rpc(lambda self: self._el('radius'))
+    speed = _rpc(lambda self: self._el('speed'))
+    orbital_speed = speed
+    time_to_apoapsis = _rpc(lambda self: self._el('time_to_apoapsis'))
+    time_to_periapsis = _rpc(lambda self: self._el('time_to_periapsis'))
+    inclination = _rpc(lambda self: 0.0)
+
+
+class SimFlight:
+    def __init__(self, sim, reference_frame=None):
+        self._sim = sim
+        self._inertial = reference_frame is not None and reference_frame.kind in ('body_inertial', 'orbital')
+
+    def _velocity(self):
+        s = self._sim.state
+        return s.vel[0] if self._inertial else s.surface_velocity()[0]
+
+    def _vertical_speed(self):
+        s = self._sim.state
+        v = self._velocity()
+        up = _unit(s.pos[0])
+        return v[0] * up[0] + v[1] * up[1]
+
+    def _pitch(self):
+        s = self._sim.state
+        return math.degrees(math.asin(max(-1.0, min(1.0, math.cos(s.attitude[0] - s.up_angle()[0])))))
+
+    def _longitude(self):
+        s = self._sim.state
+        b = s.body
+        lon = math.degrees(s.up_angle()[0] - b.rotational_speed * s.t) + b.launch_longitude
+        return (lon + 180.0) % 360.0 - 180.0
+
+    mean_altitude = _rpc(lambda self: float(self._sim.state.altitude()[0]))
+    surface_altitude = mean_altitude
+    bedrock_altitude = mean_altitude
+    elevation = _rpc(lambda self: 0.0)
+    dynamic_pressure = _rpc(lambda self: float(self._sim.state.q[0]))
+    static_pressure = _rpc(lambda self: float(atmosphere(self._sim.body.config, self._sim.state.altitude())[0][0]))
+    static_pressure_at_msl = _rpc(lambda self: self._sim.body.config.surface_pressure)
+    atmosphere_density = _rpc(lambda self: float(atmosphere(self._sim.body.config, self._sim.state.altitude())[1][0]))
+    velocity = _rpc(lambda self: (float(self._velocity()[0]), float(self._velocity()[1]), 0.0))
+    speed = _rpc(lambda self: float(math.hypot(*self._velocity())))
+    vertical_speed = _rpc(lambda self: float(self._vertical_speed()))
+    horizontal_speed = _rpc(lambda self: float(math.sqrt(max(0.0, math.hypot(*self._velocity()) ** 2 - self._vertical_speed() ** 2))))
+    g_force = _rpc(lambda self: float((self._sim.state.thrust[0] + self._sim.state.q[0] * self._sim.vessel_config.cd_area) / self._sim.state.mass()[0] / G0))
+    pitch = _rpc(lambda self: self._pitch())
+    heading = _rpc(lambda self: 90.0)
+    roll = _rpc(lambda self: 0.0)
+    latitude = _rpc(lambda self: 0.0)
+    longitude = _rpc(lambda self: self._longitude())
+
+
+class SimResources:
+    def __init__(self, sim, stages=None):
+        self._sim = sim
+        self._stages = stages  # None = tous les étages attachés
+        self._mask = None if stages is None else np.isin(sim.state.stage_index, stages)
+
+    def _selected(self):
+        mask = self._sim.state.attached()[0]
+        return mask if self._mask is None else mask & self._mask
+
+    def _total(self, name, values):
+        total = 0.0
+        selected = self._selected()
+        for i, stage in enumerate(self._sim.vessel_config.stages):
+            split = RESOURCE_SPLIT[stage.fuel].get(name)
+            if split and selected[i]:
+                total += values[i] * split[0] / split[1]
+        return float(total)
+
+    names = _rpc(lambda self: sorted({n for i, st in enumerate(self._sim.vessel_config.stages)
+                                      if self._selected()[i] for n in RESOURCE_SPLIT[st.fuel]}))
+
+    @_rpc_method
+    def amount(self, name):
+        return self._total(name, self._sim.state.prop[0])
+
+    @_rpc_method
+    def max(self, name):
+        return self._total(name, self._sim.state.prop_max)
+
+    @_rpc_method
+    def has_resource(self, name):
+        return self._total(name, self._sim.state.prop_max) > 0
+
+
+class SimPart:
+    def __init__(self, sim, stage_index, title, kind):
+        self._sim = sim
+        self._stage_index = stage_index
+        self._title = title
+        self.kind = kind
+        n = len(sim.vessel_config.stages)
+        self._stage = n - 1 - stage_index if kind == 'engine' else -1
+        self._decouple_stage = n - 2 - stage_index if stage_index < n - 1 else -1
+        self.engine = None
+        self.decoupler = None
+
+    def _attached(self):
+        return bool(self._sim.state.attached()[0, self._stage_index])
+
+    title = _rpc(lambda self: self._title)
+    name = title
+    stage = _rpc(lambda self: self._stage)
+    decouple_stage = _rpc(lambda self: self._decouple_stage)
+    resources = _rpc(lambda self: SimResources(self._sim, [self._stage_index]))
+    experiment = _rpc(lambda self: None)
+    mass = _rpc(lambda self: float(self._sim.state.dry[self._stage_index] + self._sim.state.prop[0, self._stage_index]) if self.kind == 'tank' else 0.0)
+    dry_mass = _rpc(lambda self: float(self._sim.state.dry[self._stage_index]) if self.kind == 'tank' else 0.0)
+
+
+class SimEngine:
+    def __init__(self, sim, part, stage_index, count):
+        self._sim = sim
+        self._part = part
+        self._i = stage_index
+        self._count = count
+
+    def _ignited(self):
+        return int(self._sim.state.engine_stage()[0]) == self._i
+
+    def _has_fuel(self):
+        return self._sim.state.prop[0, self._i] > 0
+
+    def _thrust_at(self, pressure_atm):
+        s = self._sim.state
+        isp = s._isp(self._i, pressure_atm * s.body.surface_pressure)
+        return float(s.thrust_vac[self._i] * isp / s.isp_vac[self._i]) / self._count
+
+    part = _rpc(lambda self: self._part)
+    active = _rpc(lambda self: self._ignited())
+    has_fuel = _rpc(lambda self: self._has_fuel())
+    throttle = _rpc(lambda self: float(self._sim.state.throttle[0]) if self._ignited() else 0.0)
+    thrust = _rpc(lambda self: float(self._sim.state.thrust[0]) / self._count if self._ignited() else 0.0)
+    max_thrust = _rpc(lambda self: self._thrust_at(self._sim.state.pressure[0] / self._sim.body.config.surface_pressure))
+    available_thrust = _rpc(lambda self: self._thrust_at(self._sim.state.pressure[0] / self._sim.body.config.surface_pressure) if self._ignited() and self._has_fuel() else 0.0)
+    max_vacuum_thrust = _rpc(lambda self: float(self._sim.state.thrust_vac[self._i]) / self._count)
+    specific_impulse = _rpc(lambda self: float(self._sim.state._isp(self._i, self._sim.state.pressure[0])))
+    vacuum_specific_impulse = _rpc(lambda self: float(self._sim.state.isp_vac[self._i]))
+    kerbin_sea_level_specific_impulse = _rpc(lambda self: float(self._sim.state.isp_asl[self._i]))
+    propellant_names = _rpc(lambda self: list(RESOURCE_SPLIT[self._sim.vessel_config.stages[self._i].fuel]))
+
+    @_rpc_method
+    def max_thrust_at(self, pressure):
+        return self._thrust_at(pressure)
+
+    @_rpc_method
+    def available_thrust_at(self, pressure):
+        return self._thrust_at(pressure) if self._ignited() and self._has_fuel() else 0.0
+
+    @_rpc_method
+    def specific_impulse_at(self, pressure):
+        s = self._sim.state
+        return float(s._isp(self._i, pressure * s.body.surface_pressure))
+
+
+class SimDecoupler:
+    def __init__(self, sim, part):
+        self._sim = sim
+        self._part = part
+
+    part = _rpc(lambda self: self._part)
+    decoupled = _rpc(lambda self: not self._part._attached())
+
+
+class SimParts:
+    def __init__(self, sim):
+        self._sim = sim
+        self._parts = []
+        self._engines = []
+        self._decouplers = []
+        stages = sim.vessel_config.stages
+        for i, stage in enumerate(stages):
+            self._parts.append(SimPart(sim, i, f"{stage.name} Fuel Tank", 'tank'))
+            for _ in range(stage.engine_count):
+                part = SimPart(sim, i, stage.engine_title, 'engine')
+                part.engine = SimEngine(sim, part, i, stage.engine_count)
+                self._parts.append(part)
+                self._engines.append(part.engine)
+            if i < len(stages) - 1:
+                part = SimPart(sim, i, "TD-12 Decoupler", 'decoupler')
+                part.decoupler = SimDecoupler(sim, part)
+                self._parts.append(part)
+                self._decouplers.append(part.decoupler)
+
+    all = _rpc(lambda self: [p for p in self._parts if p._attached()])
+    engines = _rpc(lambda self: [e for e in self._engines if e._part._attached()])
+    decouplers = _rpc(lambda self: [d for d in self._decouplers if d._part._attached()])
+    experiments = _rpc(lambda self: [])
+
+    @_rpc_method
+    def in_stage(self, stage):
+        return [p for p in self._parts if p._attached() and p._stage == stage]
+
+    @_rpc_method
+    def in_decouple_stage(self, stage):
+        return [p for p in self._parts if p._attached() and p._decouple_stage == stage]
+
+
+class SimNode:
+    def __init__(self, sim, ut, prograde=0.0, normal=0.0, radial=0.0):
+        self._sim = sim
+        self._ut = ut
+        self._prograde, self._normal, self._radial = prograde, normal, radial
+        self.reference_frame = ReferenceFrame(sim, 'node', self)
+        self.orbital_reference_frame = self.reference_frame
+        self._dv0 = sim.state.dv_applied[0].copy()
+        self._update_burn()
+
+    def _update_burn(self):
+        """Vecteur de burn inertiel, calculé sur l'orbite propagée jusqu'à l'instant du nœud."""
+        s = self._sim.state
+        pos, vel = kepler_propagate(s.pos[:1], s.vel[:1], s.body.gravitational_parameter, max(0.0, self._ut - s.t))
+        prograde = _unit(vel[0])
+        up = _unit(pos[0])
+        dot = up[0] * prograde[0] + up[1] * prograde[1]
+        radial = _unit((up[0] - dot * prograde[0], up[1] - dot * prograde[1]))
+        self._burn = np.array([self._prograde * prograde[0] + self._radial * radial[0],
+                               self._prograde * prograde[1] + self._radial * radial[1]])
+
+    def _remaining(self):
+        applied = self._sim.state.dv_applied[0] - self._dv0
+        return self._burn - applied
+
+    def _burn_direction(self):
+        return _unit(self._burn)
+
+    def _set(attr):
+        def setter(self, value):
+            setattr(self, attr, value)
+            self._update_burn()
+        return setter
+
+    ut = _rpc(lambda self: self._ut, _set('_ut'))
+    prograde = _rpc(lambda self: self._prograde, _set('_prograde'))
+    normal = _rpc(lambda self: self._normal, _set('_normal'))
+    radial = _rpc(lambda self: self._radial, _set('_radial'))
+    del _set
+
+    delta_v = _rpc(lambda self: float(math.hypot(math.hypot(*self._burn), self._normal)))
+    remaining_delta_v = _rpc(lambda self: float(math.hypot(math.hypot(*self._remaining()), self._normal)))
+    time_to = _rpc(lambda self: self._ut - self._sim.state.t)
+
+    @_rpc_method
+    def burn_vector(self, reference_frame=None):
+        return self._in_frame(self._burn, reference_frame)
+
+    @_rpc_method
+    def remaining_burn_vector(self, reference_frame=None):
+        return self._in_frame(self._remaining(), reference_frame)
+
+    def _in_frame(self, v, reference_frame):
+        X, Y, Z = (reference_frame or self.reference_frame).axes()
+        return (float(v[0] * X[0] + v[1] * X[1]), float(v[0] * Y[0] + v[1] * Y[1]), float(self._normal))
+
+    @_rpc_method
+    def remove(self):
+        if self in self._sim.nodes:
+            first = self._sim.nodes[0] is self
+            self._sim.nodes.remove(self)
+            if first and self._sim.nodes:
+                self._sim.nodes[0]._rebase()
+
+    def _rebase(self):
+        """Comme dans KSP, le nœud suivant est replacé sur l'orbite issue du burn précédent."""
+        self._dv0 = self._sim.state.dv_applied[0].copy()
+        self._update_burn()
+
+
+class SimControl:
+    def __init__(self, sim):
+        self._sim = sim
+        self._sas = False
+        self._sas_mode = SASMode.stability_assist
+        self._rcs = False
+        self._inputs = {'pitch': 0.0, 'yaw': 0.0, 'roll': 0.0, 'gear': False, 'brakes': False, 'legs': False}
+
+    def _set_throttle(self, value):
+        self._sim.state.throttle[0] = max(0.0, min(1.0, value))
+
+    def _set_sas(self, value):
+        self._sas = bool(value)
+        self._sim.hold_attitude = float(self._sim.state.attitude[0])
+
+    throttle = _rpc(lambda self: float(self._sim.state.throttle[0]), _set_throttle)
+    sas = _rpc(lambda self: self._sas, _set_sas)
+    sas_mode = _rpc(lambda self: self._sas_mode, lambda self, v: setattr(self, '_sas_mode', v))
+    rcs = _rpc(lambda self: self._rcs, lambda self, v: setattr(self, '_rcs', v))
+    current_stage = _rpc(lambda self: self._sim.state.n_stages - int(self._sim.state.activations[0]))
+    nodes = _rpc(lambda self: list(self._sim.nodes))
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name not in self._inputs:
+            raise AttributeError(name)
+        self._sim.rpc()
+        return self._inputs[name]
+
+    def __setattr__(self, name, value):
+        if not name.startswith('_') and name in self._inputs:
+            self._sim.rpc()
+            self._inputs[name] = value
+        else:
+            super().__setattr__(name, value)
+
+    @_rpc_method
+    def activate_next_stage(self):
+        s = self._sim.state
+        if s.activations[0] < s.n_stages:
+            s.activations[0] += 1
+        return []
+
+    @_rpc_method
+    def add_node(self, ut, prograde=0.0, normal=0.0, radial=0.0):
+        node = SimNode(self._sim, ut, prograde, normal, radial)
+        self._sim.nodes.append(node)
+        return node
+
+    @_rpc_method
+    def remove_nodes(self):
+        self._sim.nodes.clear()
+
+
+class SimAutoPilot:
+    def __init__(self, sim):
+        self._sim = sim
+        self._engaged = False
+        self._mode = 'pitch_heading'
+        self._pitch = 90.0
+        self._heading = 90.0
+        self._roll = float('nan')
+        self._reference_frame = None
+        self._direction = (0.0, 1.0, 0.0)
+        self._settings = {}
+
+    def target_attitude(self):
+        """Angle inertiel visé (None = pas de commande, le vaisseau garde son attitude)."""
+        s = self._sim.state
+        if self._engaged:
+            if self._mode == 'direction' and self._reference_frame is not None:
+                return self._reference_frame.direction_angle(self._direction)
+            return float(s.pitch_to_attitude(self._pitch, self._heading)[0])
+        control = self._sim.control
+        if control._sas:
+            if control._sas_mode in (SASMode.prograde, SASMode.retrograde):
+                angle = math.atan2(s.vel[0, 1], s.vel[0, 0])
+                return angle if control._sas_mode == SASMode.prograde else angle + math.pi
+            if control._sas_mode == SASMode.maneuver and self._sim.nodes:
+                return math.atan2(*reversed(self._sim.nodes[0]._burn_direction()))
+            return self._sim.hold_attitude
+        return None
+
+    def _error(self):
+        target = self.target_attitude()
+        if target is None:
+            return 0.0
+        diff = (target - self._sim.state.attitude[0] + math.pi) % (2 * math.pi) - math.pi
+        return abs(math.degrees(diff))
+
+    @_rpc_method
+    def engage(self):
+        self._engaged = True
+
+    @_rpc_method
+    def disengage(self):
+        self._engaged = False
+        self._sim.hold_attitude = float(self._sim.state.attitude[0])
+
+    @_rpc_method
+    def target_pitch_and_heading(self, pitch, heading):
+        self._mode = 'pitch_heading'
+        self._pitch, self._heading = float(pitch), float(heading)
+
+    @_rpc_method
+    def wait(self):
+        self._sim.run_until(lambda: self._error() < 0.5, timeout=120.0, step=0.1)
+
+    def _set_direction(self, value):
+        self._mode = 'direction'
+        self._direction = tuple(value)
+
+    def _set_pitch(self, value):
+        self._mode = 'pitch_heading'
+        self._pitch = float(value)
+
+    def _set_heading(self, value):
+        self._mode = 'pitch_heading'
+        self._heading = float(value)
+
+    target_pitch = _rpc(lambda self: self._pitch, _set_pitch)
+    target_heading = _rpc(lambda self: self._heading, _set_heading)
+    target_roll = _rpc(lambda self: self._roll, lambda self, v: setattr(self, '_roll', v))
+    target_direction = _rpc(lambda self: self._direction, _set_direction)
+    reference_frame = _rpc(lambda self: self._reference_frame, lambda self, v: setattr(self, '_reference_frame', v))
+    error = _rpc(lambda self: self._error())
+    pitch_error = error
+    heading_error = _rpc(lambda self: 0.0)
+    roll_error = _rpc(lambda self: 0.0)
+
+    def __getattr__(self, name):
+        # Réglages sans effet sur le modèle (auto_tune, *_pid_gains, stopping_time...)
+        if name.startswith('_'):
+            raise AttributeError(name)
+        self._sim.rpc()
+        return self._settings.get(name)
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            super().__setattr__(name, value)
+        elif isinstance(getattr(type(self), name, None), property):
+            super().__setattr__(name, value)
+        else:
+            self._sim.rpc()
+            self._settings[name] = value
+
+
+class SimVessel:
+    def __init__(self, sim):
+        self._sim = sim
+        self.reference_frame = ReferenceFrame(sim, 'vessel')
+        self.orbital_reference_frame = ReferenceFrame(sim, 'orbital')
+        self.surface_reference_frame = ReferenceFrame(sim, 'surface')
+        self.surface_velocity_reference_frame = ReferenceFrame(sim, 'surface_velocity')
+        self._flight = SimFlight(sim)
+        self._crew = [type('Kerbal', (), {'name': name})() for name in sim.vessel_config.crew]
+
+    def _situation(self):
+        s = self._sim.state
+        if s.landed[0]:
+            return VesselSituation.pre_launch if s.activations[0] == 0 else VesselSituation.landed
+        if s.altitude()[0] < s.body.atmosphere_depth:
+            return VesselSituation.flying
+        el = orbital_elements(s.pos, s.vel, s.body.gravitational_parameter)
+        if el['eccentricity'][0] >= 1.0:
+            return VesselSituation.escaping
+        if el['periapsis'][0] - s.body.equatorial_radius > s.body.atmosphere_depth:
+            return VesselSituation.orbiting
+        return VesselSituation.sub_orbital
+
+    def _biome(self):
+        lon = SimFlight._longitude(self._flight)
+        name = BIOMES[0][1]
+        for start, biome in BIOMES:
+            if lon >= start:
+                name = biome
+        return name
+
+    def _isp(self):
+        s = self._sim.state
+        i = int(s.engine_stage()[0])
+        return float(s._isp(i, s.pressure[0])) if i >= 0 else 0.0
+
+    def _max_thrust(self):
+        s = self._sim.state
+        i = int(s.engine_stage()[0])
+        return float(s.thrust_vac[i] * s._isp(i, s.pressure[0]) / s.isp_vac[i]) if i >= 0 else 0.0
+
+    name = _rpc(lambda self: self._sim.vessel_config.name)
+    type = _rpc(lambda self: VesselType.ship)
+    situation = _rpc(lambda self: self._situation())
+    biome = _rpc(lambda self: self._biome())
+    met = _rpc(lambda self: self._sim.state.t)
+    crew = _rpc(lambda self: list(self._crew))
+    mass = _rpc(lambda self: float(self._sim.state.mass()[0]))
+    dry_mass = _rpc(lambda self: float(self._sim.state.mass()[0] - (self._sim.state.prop[0] * self._sim.state.attached()[0]).sum()))
+    thrust = _rpc(lambda self: float(self._sim.state.thrust[0]))
+    available_thrust = _rpc(lambda self: float(self._sim.state.available_thrust()[0]))
+    max_thrust = _rpc(lambda self: self._max_thrust())
+    max_vacuum_thrust = _rpc(lambda self: float(self._sim.state.thrust_vac[max(int(self._sim.state.engine_stage()[0]), 0)]) if self._sim.state.engine_stage()[0] >= 0 else 0.0)
+    specific_impulse = _rpc(lambda self: self._isp())
+    vacuum_specific_impulse = _rpc(lambda self: float(self._sim.state.isp_vac[int(self._sim.state.engine_stage()[0])]) if self._sim.state.engine_stage()[0] >= 0 else 0.0)
+    kerbin_sea_level_specific_impulse = _rpc(lambda self: float(self._sim.state.isp_asl[int(self._sim.state.engine_stage()[0])]) if self._sim.state.engine_stage()[0] >= 0 else 0.0)
+    parts = _rpc(lambda self: self._sim.parts)
+    resources = _rpc(lambda self: SimResources(self._sim))
+    control = _rpc(lambda self: self._sim.control)
+    auto_pilot = _rpc(lambda self: self._sim.auto_pilot)
+    orbit = _rpc(lambda self: self._sim.orbit)
+
+    @_rpc_method
+    def position(self, reference_frame):
+        """Position (m) : le plan simulé est le plan équatorial (x, z) du repère du corps."""
+        pos = self._sim.state.pos[0]
+        return (float(pos[0]), 0.0, float(pos[1]))
+
+    @_rpc_method
+    def velocity(self, reference_frame):
+        s = self._sim.state
+        vel = s.vel[0] if reference_frame.kind in ('body_inertial', 'orbital') else s.surface_velocity()[0]
+        return (float(vel[0]), 0.0, float(vel[1]))
+
+    @_rpc_method
+    def flight(self, reference_frame=None):
+        return self._flight if reference_frame is None else SimFlight(self._sim, reference_frame)
+
+    @_rpc_method
+    def resources_in_decouple_stage(self, stage, cumulative=True):
+        n = self._sim.state.n_stages
+        decouple = [n - 2 - i if i < n - 1 else -1 for i in range(n)]
+        if cumulative:
+            selected = [i for i, d in enumerate(decouple) if d >= stage]
+        else:
+            selected = [i for i, d in enumerate(decouple) if d == stage]
+        return SimResources(self._sim, selected)
+
+    @_rpc_method
+    def max_thrust_at(self, pressure):
+        s = self._sim.state
+        i = int(s.engine_stage()[0])
+        return float(s.thrust_vac[i] * s._isp(i, pressure * s.body.surface_pressure) / s.isp_vac[i]) if i >= 0 else 0.0
+
+    @_rpc_method
+    def available_thrust_at(self, pressure):
+        return float(self._sim.state.available_thrust(pressure * self._sim.body.config.surface_pressure)[0])
+
+
+class SimSpaceCenter:
+    def __init__(self, sim):
+        self._sim = sim
+        self._target_body = None
+
+    active_vessel = _rpc(lambda self: self._sim.vessel)
+    ut = _rpc(lambda self: self._sim.state.t)
+    bodies = _rpc(lambda self: {self._sim.body.config.name: self._sim.body})
+    target_body = _rpc(lambda self: self._target_body, lambda self, v: setattr(self, '_target_body', v))
+    g = _rpc(lambda self: 6.67408e-11)
+
+    @_rpc_method
+    def warp_to(self, ut, max_rails_rate=100000.0, max_physics_rate=2.0):
+        self._sim.advance(ut - self._sim.state.t)
+
+
+class _RectTransform:
+    def __init__(self, sim, size=(0.0, 0.0)):
+        self._sim = sim
+        self._size = size
+        self._position = (0.0, 0.0)
+
+    size = _rpc(lambda self: self._size, lambda self, v: setattr(self, '_size', tuple(v)))
+    position = _rpc(lambda self: self._position, lambda self, v: setattr(self, '_position', tuple(v)))
+
+
+class SimText:
+    def __init__(self, sim, content):
+        self._sim = sim
+        self._content = content
+        self._color = (1.0, 1.0, 1.0)
+        self._size = 12
+        self._rect_transform = _RectTransform(sim)
+
+    content = _rpc(lambda self: self._content, lambda self, v: setattr(self, '_content', v))
+    color = _rpc(lambda self: self._color, lambda self, v: setattr(self, '_color', v))
+    size = _rpc(lambda self: self._size, lambda self, v: setattr(self, '_size', v))
+    rect_transform = _rpc(lambda self: self._rect_transform)
+
+    @_rpc_method
+    def remove(self):
+        pass
+
+
+class SimPanel:
+    def __init__(self, sim, size=(100.0, 100.0)):
+        self._sim = sim
+        self._rect_transform = _RectTransform(sim, size)
+        self.texts = []
+
+    rect_transform = _rpc(lambda self: self._rect_transform)
+
+    @_rpc_method
+    def add_text(self, content, visible=True):
+        text = SimText(self._sim, content)
+        self.texts.append(text)
+        return text
+
+    @_rpc_method
+    def add_panel(self, visible=True):
+        return SimPanel(self._sim)
+
+    @_rpc_method
+    def remove(self):
+        pass
+
+
+class SimUI:
+    def __init__(self, sim):
+        self._sim = sim
+        self._canvas = SimPanel(sim, (1920.0, 1080.0))
+        self.messages = []
+
+    stock_canvas = _rpc(lambda self: self._canvas)
+
+    @_rpc_method
+    def message(self, content, duration=1.0, position=None, color=(1.0, 0.92, 0.016), size=20):
+        self.messages.append((self._sim.state.t, content))
+
+
+class _Status:
+    version = "sim"
+
+
+class SimKRPC:
+    Expression = Expression
+
+    def __init__(self, sim):
+        self._sim = sim
+
+    paused = _rpc(lambda self: False)
+
+    @_rpc_method
+    def get_status(self):
+        return _Status()
+
+    @_rpc_method
+    def add_event(self, expression):
+        event = SimEvent(self._sim, expression)
+        self._sim.events.add(event)
+        return event
+
+#-------------------------------------------------------------------------------------------------------------
+# Connexion simulée
+
+class SimConnection:
+    """Remplace l'objet `conn` de krpc.connect() pour un vol entièrement simulé."""
+
+    def __init__(self, name=None, vessel=DEFAULT_VESSEL, body=KERBIN, dt_phys=0.05, rpc_latency=0.0):
+        self.name = name
+        self.vessel_config = vessel
+        self.dt_phys = dt_phys
+        self.rpc_latency = rpc_latency
+        self.rpc_count = 0
+        self._latency_debt = 0.0
+        self.state = SimState(vessel, body, n=1)
+        self.hold_attitude = 0.0
+        self.nodes = []
+        self.streams = set()
+        self.events = set()
+        self._lock = threading.RLock()
+        self._sim = self
+
+        self.body = SimBody(self, body)
+        self.orbit = SimOrbit(self)
+        self.parts = SimParts(self)
+        self.control = SimControl(self)
+        self.auto_pilot = SimAutoPilot(self)
+        self.vessel = SimVessel(self)
+        self.space_center = SimSpaceCenter(self)
+        self.ui = SimUI(self)
+        self.krpc = SimKRPC(self)
+
+    # --- API de connexion kRPC ---
+    def add_stream(self, func, *args):
+        stream = SimStream(self, _raw_call(func, args))
+        self.streams.add(stream)
+        return stream
+
+    def get_call(self, func, *args):
+        return _Call(_raw_call(func, args))
+
+    def close(self):
+        self.streams.clear()
+        self.events.clear()
+
+    # --- Horloge simulée ---
+    def rpc(self):
+        # Comme dans KSP, l'état n'évolue qu'une fois par frame physique (0.02 s) :
+        # la latence des appels s'accumule et n'est appliquée que par frames entières.
+        self.rpc_count += 1
+        if self.rpc_latency > 0:
+            self._latency_debt += self.rpc_latency
+            if self._latency_debt >= PHYSICS_FRAME:
+                debt, self._latency_debt = self._latency_debt, 0.0
+                self.advance(debt)
+
+    def advance(self, dt):
+        """Fait avancer la simulation de dt secondes de temps de jeu."""
+        if dt <= 0:
+            return
+        with self._lock:
+            s = self.state
+            body = s.body
+            remaining = dt
+            while remaining > 1e-9:
+                coasting = (s.altitude()[0] > body.atmosphere_depth and
+                            s.available_thrust()[0] * s.throttle[0] <= 0)
+                h = min(remaining, 10.0 if coasting else self.dt_phys)
+                target = self.auto_pilot.target_attitude()
+                if coasting and orbital_elements(s.pos, s.vel, body.gravitational_parameter)['eccentricity'][0] < 1.0:
+                    s.coast(h)
+                    if target is not None:
+                        rate = math.radians(self.vessel_config.max_slew_rate) * h
+                        diff = (target - s.attitude[0] + math.pi) % (2 * math.pi) - math.pi
+                        s.attitude[0] += max(-rate, min(rate, diff))
+                else:
+                    s.step(h, None if target is None else np.array([target]))
+                remaining -= h
+            self._notify()
+
+    def run_until(self, predicate, timeout=None, step=0.05):
+        """Avance par pas de `step` jusqu'à ce que predicate() soit vrai (ou timeout)."""
+        start = self.state.t
+        while not predicate():
+            if timeout is not None and self.state.t - start >= timeout:
+                return False
+            self.advance(step)
+        return True
+
+    @contextlib.contextmanager
+    def patch_sleep(self):
+        """Dans ce bloc, time.sleep(dt) fait avancer la simulation au lieu d'attendre."""
+        original = time.sleep
+        time.sleep = self.advance
+        try:
+            yield self
+        finally:
+            time.sleep = original
+
+    def _notify(self):
+        for stream in list(self.streams):
+            stream._notify()
+        for event in list(self.events):
+            event._notify()
+
+
+def connect(name=None, address=None, rpc_port=None, stream_port=None, **kwargs):
+    """Équivalent simulé de krpc.connect(); les arguments réseau sont ignorés."""
+    return SimConnection(name=name, **kwargs)
+
+#-------------------------------------------------------------------------------------------------------------
+# Démonstration : insertion en orbite de 100 km sans KSP
+
+if __name__ == '__main__':
+    from kRPC_Tools import linear_tangent
+    from kRPC_NodeExecutor import nodeExec
+    from kRPC_Orbit import KeplerOrbit, circularize
+
+    target_altitude = 100_000  # m
+    wall_start = time.perf_counter()
+
+    conn = connect(name='Orbiter1', rpc_latency=0.005)
+    vessel = conn.space_center.active_vessel
+    altitude = conn.add_stream(getattr, vessel.flight(), 'mean_altitude')
+    apoapsis = conn.add_stream(getattr, vessel.orbit, 'apoapsis_altitude')
+    ut = conn.add_stream(getattr, conn.space_center, 'ut')
+
+    with conn.patch_sleep():
+        vessel.control.throttle = 1.0
+        vessel.control.activate_next_stage()
+        vessel.auto_pilot.engage()
+        vessel.auto_pilot.target_pitch_and_heading(90, 90)
+        while apoapsis() < target_altitude:
+            if altitude() >= 500:
+                vessel.auto_pilot.target_pitch_and_heading(linear_tangent(altitude(), target_altitude), 90)
+            if vessel.available_thrust <= 0.1:
+                vessel.control.activate_next_stage()
+            time.sleep(0.1)
+        vessel.control.throttle = 0.0
+        while altitude() < 70_500:
+            time.sleep(1.0)
+
+        circularize(KeplerOrbit.from_vessel(conn, vessel)).add_node(vessel.control)
+        nodeExec(conn)
+
+    print(f"Apoapse  : {vessel.orbit.apoapsis_altitude / 1000:.1f} km")
+    print(f"Périapse : {vessel.orbit.periapsis_altitude / 1000:.1f} km")
+    print(f"Temps de jeu simulé : {ut():.0f} s ; temps réel : {time.perf_counter() - wall_start:.2f} s ; RPC : {conn.rpc_count}")
@@ -1,8 +1,12 @@
 import krpc
 import time
 import math
+import sys
 from collections import defaultdict
 import kRPC_Tools as tools
+from kRPC_DeltaV import DeltaVBudget
+from kRPC_Orbit import KeplerOrbit, circularize
+from kRPC_Phases import PhaseEngine, above, below, when
 import os
 
 # Connexion au serveur kRPC
@@ -19,13 +23,14 @@ target_altitude = 150000
 
 conn = krpc.connect(name='Launch into orbit')
 vessel = conn.space_center.active_vessel
+streams = tools.stream_registry(conn)
 
 # Set up streams for telemetry
-ut = conn.add_stream(getattr, conn.space_center, 'ut')
-altitude = conn.add_stream(getattr, vessel.flight(), 'mean_altitude')
-apoapsis = conn.add_stream(getattr, vessel.orbit, 'apoapsis_altitude')
+ut = streams.get(conn.space_center, 'ut')
+altitude = streams.get(vessel, 'flight.mean_altitude')
+apoapsis = streams.get(vessel, 'orbit.apoapsis_altitude')
 stage_2_resources = vessel.resources_in_decouple_stage(stage=2, cumulative=False)
-srb_fuel = conn.add_stream(stage_2_resources.amount, 'SolidFuel')
+srb_fuel = streams.get(stage_2_resources, 'amount', 'SolidFuel')
 
 # Pre-launch setup
 vessel.control.sas = False
@@ -76,35 +81,32 @@ while True:
 
 # Disable engines when target apoapsis is reached
 vessel.control.throttle = 0.25
-while apoapsis() < target_altitude:
-    pass
+phases = PhaseEngine(conn, verbose=False)
+phases.wait('Apoapse visée', above(conn, target_altitude, getattr, vessel.orbit, 'apoapsis_altitude'))
 print('Target apoapsis reached')
 vessel.control.throttle = 0.0
 
 # Wait until out of atmosphere
 print('Coasting out of atmosphere')
-while altitude() < 70500:
-    pass
+phases.wait('Sortie de l\'atmosphère', above(conn, 70500, getattr, vessel.flight(), 'mean_altitude'))
 
-# Plan circularization burn (using vis-viva equation)
+# Plan circularization burn (local Kepler orbit)
 print('Planning circularization burn')
-mu = vessel.orbit.body.gravitational_parameter
-r = vessel.orbit.apoapsis
-a1 = vessel.orbit.semi_major_axis
-a2 = r
-v1 = math.sqrt(mu*((2./r)-(1./a1)))
-v2 = math.sqrt(mu*((2./r)-(1./a2)))
-delta_v = v2 - v1
-node = vessel.control.add_node(
-    ut() + vessel.orbit.time_to_apoapsis, prograde=delta_v)
-
-# Calculate burn time (using rocket equation)
-F = vessel.available_thrust
-Isp = vessel.specific_impulse * 9.82
-m0 = vessel.mass
-m1 = m0 / math.exp(delta_v/Isp)
-flow_rate = F / Isp
-burn_time = (m0 - m1) / flow_rate
+orbit = KeplerOrbit.from_vessel(conn, vessel)
+maneuver = circularize(orbit)  # à la prochaine apoapse
+delta_v = maneuver.delta_v
+node = maneuver.add_node(vessel.control)
+
+# Calculate burn time (rocket equation, stage by stage)
+budget = DeltaVBudget(conn, vessel)
+burn_time = budget.burn_time(delta_v)
+if not math.isfinite(burn_time):
+    available = budget.delta_v()
+    budget.release()
+    node.remove()
+    print(f"Δv insuffisant pour circulariser : {delta_v:.0f} m/s requis, {available:.0f} m/s disponibles. Abandon")
+    sys.exit(1)
+budget.release()
 
 # Orientate ship
 print('Orientating ship for circularization burn')
@@ -114,24 +116,23 @@ vessel.auto_pilot.wait()
 
 # Wait until burn
 print('Waiting until circularization burn')
-burn_ut = ut() + vessel.orbit.time_to_apoapsis - (burn_time/2.)
+burn_ut = maneuver.ut - (burn_time/2.)
 lead_time = 5
 conn.space_center.warp_to(burn_ut - lead_time)
 
 # Execute burn
 print('Ready to execute burn')
-time_to_apoapsis = conn.add_stream(getattr, vessel.orbit, 'time_to_apoapsis')
-while time_to_apoapsis() - (burn_time/2.) > 0:
-    pass
+phases.wait('Attente du burn', below(conn, burn_time/2., getattr, vessel.orbit, 'time_to_apoapsis'))
 print('Executing burn')
 vessel.control.throttle = 1.0
 time.sleep(burn_time - 0.1)
 print('Fine tuning')
 vessel.control.throttle = 0.05
-remaining_burn = conn.add_stream(node.remaining_burn_vector, node.reference_frame)
-while remaining_burn()[1] > 0:
-    pass
+remaining_burn = streams.get(node, 'remaining_burn_vector', frame=node.reference_frame)
+phases.wait('Ajustement fin', when(remaining_burn, lambda burn: burn[1] <= 0))
 vessel.control.throttle = 0.0
+remaining_burn.release()
 node.remove()
 
-print('Launch complete')
\ No newline at end of file
+print('Launch complete')
+phases.report()
\ No newline at end of file
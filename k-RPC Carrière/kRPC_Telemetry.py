@@ -1,38 +1,14 @@
 import krpc
 import kRPC_Tools as tools
+from kRPC_Recorder import FlightRecorder, log_path
 import time
 import os
 import matplotlib.pyplot as plt
-import sys
 
-def center_colored_text(text, color_code, total_width):
-    raw_len = len(text)
-    padding = max(0, total_width - raw_len)
-    left = padding // 2
-    right = padding - left
-    return " " * left + f"{color_code}{text}{RESET}" + " " * right
-
-# ANSI styles
-BOLD = "\033[1m"
-RESET = "\033[0m"
-BLUE = "\033[94m"
-
-inside_width = 36
-title_text = "Système de régulation PID"
-
-def pad(content, width):
-    return content.ljust(width)
-
-def afficher_lignes(q, throttle):
-    print("\033[H", end='')  # Curseur en haut
-
-    print( "┌────────────────────────────────────┐")
-    print(f"│{center_colored_text(title_text, BOLD + BLUE, inside_width)}│")
-    print( "├────────────────────────────────────┤")
-    print(f"│ {pad(f'Q dynamique : {q:>10.0f} Pa', 35)}│")
-    print(f"│ {pad(f'Gaz         : {throttle*100:>10.0f} %', 35)}│")
-    print( "└────────────────────────────────────┘")
-    sys.stdout.flush()
+screen = tools.TerminalRenderer("Système de régulation PID", [
+    ('Q dynamique', '{:>10.0f} Pa'),
+    ('Gaz',         '{:>10.0f} %'),
+], max_rate=10)
 
 
 # === Initialisation ===
@@ -43,14 +19,14 @@ print("\033[H", end='')     # Curseur en haut
 
 conn = krpc.connect(name='SubOrbiter3')
 vessel = conn.space_center.active_vessel
-dynamic_pressure = conn.add_stream(getattr, vessel.flight(), 'dynamic_pressure')
+streams = tools.stream_registry(conn)
+dynamic_pressure = streams.get(vessel, 'flight.dynamic_pressure')
 
 thrust_pid = tools.PID(kp=0.002, ki=0, kd=0.0, setpoint=20000, min_output=0, max_output=1)
 
-# Logs
-time_log = []
-throttle_log = []
-q_log = []
+# Logs (mmap : relisible après un plantage ; archive compressée .klog)
+rec = FlightRecorder(fields=[('t', 'f8'), ('q', 'f4'), ('throttle', 'f4')], path=log_path('Telemetry'),
+                     archive=log_path('Telemetry', ext='.klog'))
 start_time = time.time()
 
 # === Affichage initial ===
@@ -64,18 +40,20 @@ try:
 
         # PID
         throttle_output = thrust_pid.update(current_q, dt)
-        vessel.control.throttle = max(0.0, min(1.0, throttle_output))
+        throttle = max(0.0, min(1.0, throttle_output))
+        vessel.control.throttle = throttle
 
         # Logs
-        time_log.append(elapsed)
-        throttle_log.append(vessel.control.throttle)
-        q_log.append(current_q)
+        rec.append(elapsed, current_q, throttle)
 
         error = thrust_pid.setpoint - current_q
-        afficher_lignes(current_q, vessel.control.throttle)
+        screen.render(current_q, throttle*100)
 
         time.sleep(dt)
 
 except KeyboardInterrupt:
     print('\033[?25h', end='')  # Réaffiche le curseur
-    print("\nArrêt du PID.\n")
\ No newline at end of file
+    print("\nArrêt du PID.\n")
+    screen.report()
+    rec.close()
+    print(f"Archive : {rec.archive.path}")
\ No newline at end of file
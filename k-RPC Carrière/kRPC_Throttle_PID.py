@@ -1,23 +1,17 @@
 import krpc
 import kRPC_Tools as tools
+from kRPC_Recorder import FlightLog, FlightRecorder, log_path
+import kRPC_Dashboard as dashboard
+import kRPC_AutoTune as autotune
 import time
 import os
 import matplotlib.pyplot as plt
 
-    # print( "╔══════════════════════════════════════════")
-    # print( "║     Système de régulation PID            ")
-    # print( "╠══════════════════════════════════════════")
-
-def afficher_tableau_ligne(q, throttle, integral):
-    print("\033[H", end='')  # Replace curseur en haut
-    print( "-------------------------------------------")
-    print( "|     Système de régulation PID            ")
-    print( "-------------------------------------------")
-    print(f"| Q dynamique   : {q:>10.0f} Pa            ")
-    print(f"| Gaz           : {throttle*100:>10.1f} %  ")
-    print(f"| Integral      : {integral:>10.0f}        ")
-
-
+screen = tools.TerminalRenderer("Système de régulation PID", [
+    ('Q dynamique', '{:>10.0f} Pa'),
+    ('Gaz',         '{:>10.1f} %'),
+    ('Integral',    '{:>10.0f}'),
+], max_rate=10)
 
 
 # === Nettoyage du terminal et préparation de l'affichage ===
@@ -28,6 +22,7 @@ print('\033[?25l', end='', flush=True)  # Cacher le curseur
 print("Connexion à KSP via kRPC...")
 conn = krpc.connect(name='SubOrbiter3')
 vessel = conn.space_center.active_vessel
+streams = tools.stream_registry(conn)
 print("Connecté à KSP :", conn.krpc.get_status().version, "\n")
 
 # === Affichage des infos ===
@@ -36,7 +31,14 @@ print(f"Kerbals à bord : {[kerbal.name for kerbal in vessel.crew]}")
 print("\nPréparation au lancement...\n")
 
 # === Préparation du vol ===
-dynamic_pressure = conn.add_stream(getattr, vessel.flight(), 'dynamic_pressure')
+dynamic_pressure = streams.get(vessel, 'flight.dynamic_pressure')
+altitude = streams.get(vessel, 'flight.mean_altitude')
+apoapsis = streams.get(vessel, 'orbit.apoapsis_altitude')
+pitch = streams.get(vessel, 'flight.pitch')
+thrust = streams.get(vessel, 'thrust')
+mass = streams.get(vessel, 'mass')
+radius = streams.get(vessel, 'orbit.radius')
+mu = vessel.orbit.body.gravitational_parameter
 vessel.control.throttle = 1.0
 vessel.auto_pilot.disengage()
 vessel.control.sas = True
@@ -49,52 +51,70 @@ tools.countdown(1)
 vessel.control.activate_next_stage()
 
 # === PID pour régulation de la pression dynamique ===
-# 20 kPa kcrit = 0.004 ; Pcrit = 22.74 - 22.37 = 0.37 s
+# 20 kPa kcrit = 0.004 ; Pcrit = 22.74 - 22.37 = 0.37 s (mesure manuelle ; AUTOTUNE = True la refait à chaque vol)
+AUTOTUNE = False
 thrust_pid = tools.PID(kp=0.002, ki=0, kd=0.0, setpoint=20000, min_output=0, max_output=1)
 # thrust_pid = tools.PID(kp=0.0024, ki=0.013, kd=0.0002, setpoint=20000)
+# Mode production : sortie bornée, anti-windup sur les deux bornes, dérivée filtrée sur la mesure
+# thrust_pid = tools.PID.production(kp=0.0024, ki=0.013, kd=0.0002, setpoint=20000)
+if AUTOTUNE:
+    # Approche avec le PID ci-dessus, essai en relais près de 20 kPa, puis PID réglé (Ziegler-Nichols PI)
+    thrust_pid = autotune.AutoTuner(thrust_pid)
+
+# === Enregistrement pour le graphique (mmap : relisible après un plantage ; archive compressée .klog) ===
+rec = FlightRecorder(fields=[('t', 'f8'), ('q', 'f4'), ('throttle', 'f4')], path=log_path('Throttle_PID'),
+                     archive=log_path('Throttle_PID', ext='.klog'))
 
-# === Logs pour le graphique ===
-time_log = []
-throttle_log = []
-q_log = []
-start_time = time.time()
+# === Tableau de bord en direct (processus séparé, mémoire partagée : le tracé ne ralentit jamais la boucle) ===
+bus = dashboard.publish('Throttle_PID')
+dashboard.launch('Throttle_PID')
+
+# === Boucle à 20 Hz (dt réel, mesuré sur le temps de jeu) ===
+ut = streams.get(conn.space_center, 'ut')
+loop = tools.FixedRateLoop(20, clock=ut)
 
 # === Boucle principale ===
 print("\033[2J\033[H", end='')  # Nettoie tout au départ + replace curseur en haut
 
 try:
-    while True:
+    for dt in loop:
         current_q = dynamic_pressure()
-        dt = 0.05
-        elapsed = time.time() - start_time
+        elapsed = loop.t
 
         # PID
         throttle_output = thrust_pid.update(current_q, dt)
-        vessel.control.throttle = max(0.0, min(1.0, throttle_output))
+        throttle = max(0.0, min(1.0, throttle_output))
+        vessel.control.throttle = throttle
 
         # Log pour le graphique
-        time_log.append(elapsed)
-        throttle_log.append(vessel.control.throttle)
-        q_log.append(current_q)
+        rec.append(elapsed, current_q, throttle)
+        twr = thrust() / (mass() * mu / radius() ** 2)
+        bus.append(elapsed, altitude(), apoapsis(), current_q, throttle, pitch(), twr)
 
         # Affichage propre en ligne
         error = thrust_pid.setpoint - current_q
-        afficher_tableau_ligne(current_q, vessel.control.throttle, thrust_pid.integral)
+        screen.render(current_q, throttle*100, thrust_pid.integral)
 
 
         # print(f"Q: {current_q:>7.1f} Pa | Gaz: {vessel.control.throttle:.2f}    ", end='\r', flush=True)
 
-        time.sleep(dt)
-
 except KeyboardInterrupt:
     # Réafficher le curseur proprement
     print('\033[?25h', end='', flush=True)
     print("\nArrêt du PID. Affichage du graphique...\n")
-
-    # === Affichage du graphique ===
+    loop.stats.report()
+    screen.report()
+    bus.close()
+    if AUTOTUNE:
+        thrust_pid.report()
+
+    # === Affichage du graphique (relu depuis l'archive, comme le ferait un outil d'analyse) ===
+    rec.close()
+    print(f"Archive : {rec.archive.path}")
+    log = FlightLog(rec.archive.path)
     plt.figure(figsize=(10, 5))
-    plt.plot(time_log, throttle_log, label='Poussée (Throttle)', color='orange')
-    plt.plot(time_log, [q / 1000 for q in q_log], label='Pression dynamique (kPa)', color='blue', linestyle='--')
+    plt.plot(log['t'], log['throttle'], label='Poussée (Throttle)', color='orange')
+    plt.plot(log['t'], log['q'] / 1000, label='Pression dynamique (kPa)', color='blue', linestyle='--')
     plt.axhline(20, color='blue', linestyle=':', label='Cible q̇ = 20 kPa')
 
     plt.xlabel("Temps (s)")
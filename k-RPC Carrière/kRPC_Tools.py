@@ -1,11 +1,20 @@
 # This file is part of k-RPC Carrière.
 
 # Librairies
+from array import array
+import asyncio
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import functools
+import json
 import numpy as np
+import math
 import time
 import threading
 import os
+import sys
+import weakref
 
 #-------------------------------------------------------------------------------------------------------------
 # Permet de faire les expériences disponibles sur le vaisseau
@@ -89,43 +98,119 @@ def surveiller_biome(conn, vessel, check_interval=0.5):
         check_interval: intervalle en secondes entre chaque vérification
     """
     print("📡 Surveillance des biomes activée...")
+    check = verifier_biome(conn, vessel)
+    while not check():
+        time.sleep(check_interval)
+
+def verifier_biome(conn, vessel):
+    """
+    Version pas à pas de surveiller_biome (pour FlightRuntime.every).
+
+    Returns:
+        fonction sans argument qui renvoie True au premier changement de biome
+    """
     previous_biome = vessel.biome
 
-    while True:
+    def check():
         biome = vessel.biome
         if biome != previous_biome:
-            previous_biome = biome
             msg = f"🌍 Nouveau biome détecté : {biome}"
             msg_KSP = f"Nouveau biome détecté : {biome}"
             print(msg)
             conn.ui.message(msg_KSP, duration=10, color=(0, 1, 0))
-            break
-        time.sleep(check_interval)
+            return True
+        return False
+    return check
 #-------------------------------------------------------------------------------------------------------------
 
 def surveiller_et_decoupler(vessel, seuil=0.01):
-    while True:
-        total_fuel = vessel.resources.amount('LiquidFuel') + vessel.resources.amount('SolidFuel')
-        max_fuel = vessel.resources.max('LiquidFuel') + vessel.resources.max('SolidFuel')
+    check = verifier_carburant(vessel, seuil, verbose=True)
+    while not check():
+        time.sleep(0.5)
+
+def verifier_carburant(vessel, seuil=0.01, verbose=False):
+    """
+    Version pas à pas de surveiller_et_decoupler (pour FlightRuntime.every).
+
+    Returns:
+        fonction sans argument qui découple et renvoie True quand le carburant passe sous `seuil`
+    """
+    resources = vessel.resources
+
+    def check():
+        total_fuel = resources.amount('LiquidFuel') + resources.amount('SolidFuel')
+        max_fuel = resources.max('LiquidFuel') + resources.max('SolidFuel')
 
         if max_fuel == 0:
             print("⚠️ Aucun carburant détecté.")
-            return
+            return True
 
         proportion = total_fuel / max_fuel
-        print(f"⛽ Carburant restant : {proportion*100:.2f}%")
+        if verbose:
+            print(f"⛽ Carburant restant : {proportion*100:.2f}%")
 
         if proportion < seuil:
             print("🚀 Carburant bas, découplage de l'étage !")
             vessel.control.activate_next_stage()
-            return
+            return True
+        return False
+    return check
 
-        time.sleep(0.5)
+class BoosterSeparation:
+    """
+    Décision de staging de l'ascension : séparation des boosters, puis étage suivant à poussée nulle.
+
+    Aucune lecture kRPC : les mesures sont passées à update(), ce qui permet de rejouer
+    exactement la même logique sur un vol enregistré (kRPC_Replay.py).
+    """
+
+    def __init__(self, booster_type='liquid', max_thrust=None, fuel_threshold=0.1, empty_thrust=0.1):
+        self.booster_type = booster_type  # 'liquid' ; 'solid' ; None (pas de boosters)
+        self.max_thrust = max_thrust  # N (poussée disponible boosters allumés, pour 'liquid')
+        self.fuel_threshold = fuel_threshold  # unités de carburant des boosters (pour 'solid')
+        self.empty_thrust = empty_thrust  # N
+        self.separated = booster_type is None
+
+    def update(self, available_thrust, booster_fuel=0.0):
+        """
+        Returns:
+            'boosters' ou 'empty' s'il faut activer l'étage suivant, sinon None
+        """
+        if not self.separated:
+            if self.booster_type == 'solid':
+                burnt_out = booster_fuel < self.fuel_threshold
+            else:
+                burnt_out = available_thrust < self.max_thrust
+            if burnt_out:
+                self.separated = True
+                return 'boosters'
+        if available_thrust <= self.empty_thrust:
+            return 'empty'
+        return None
 #-------------------------------------------------------------------------------------------------------------
 # Réguléateur PID
 
 class PID:
-    def __init__(self, kp, ki=0.0, kd=0.0, setpoint=0.0, min_output=0.0, max_output=1.0, anti_integral_windup=True):
+    """
+    Régulateur PID.
+
+    Par défaut, loi historique des scripts (rejouable à l'identique sur les vols enregistrés) :
+    dérivée sur l'erreur, intégrale remise à zéro quand la sortie atteint max_output, sortie non bornée.
+
+    Mode production (PID.production) :
+        clamp : sortie bornée à [min_output, max_output]
+        windup : 'conditional' (pas d'intégration quand la sortie est saturée et que l'erreur l'y pousse)
+                 ou 'back_calculation' (l'intégrale est ramenée vers la sortie saturée, constante tracking_time)
+                 sur les deux bornes ; 'reset' = loi historique
+        derivative_on_measurement : pas de coup de dérivée aux changements de consigne
+        derivative_filter : constante de temps (s) du filtre passe-bas de la dérivée (bruit des streams)
+        setpoint_weight : b, terme proportionnel sur b·consigne - mesure (b < 1 : moins de dépassement)
+    set_gains() change les gains sans à-coup sur la sortie.
+    """
+
+    def __init__(self, kp, ki=0.0, kd=0.0, setpoint=0.0, min_output=0.0, max_output=1.0, anti_integral_windup=True,
+                 clamp=False, windup='reset', derivative_on_measurement=False, derivative_filter=0.0,
+                 setpoint_weight=1.0, tracking_time=None):
         self.kp = kp  # Coefficient proportionnel
         self.ki = ki  # Coefficient intégral
         self.kd = kd  # Coefficient dérivé
@@ -133,11 +218,75 @@ class PID:
         self.min_output = min_output
         self.max_output = max_output
         self.anti_integral_windup = anti_integral_windup
+        self.clamp = clamp
+        self.windup = windup
+        self.derivative_on_measurement = derivative_on_measurement
+        self.derivative_filter = derivative_filter  # s
+        self.setpoint_weight = setpoint_weight
+        self.tracking_time = tracking_time  # s (None : √(Ti·Td), ou Ti sans dérivée)
 
         self.integral = 0.0
         self.previous_error = 0.0
+        self.previous_value = None
+        self.derivative = 0.0  # dérivée filtrée
+        self.output = 0.0      # dernière sortie (bornée si clamp)
+
+    @classmethod
+    def production(cls, kp, ki=0.0, kd=0.0, setpoint=0.0, min_output=0.0, max_output=1.0,
+                   windup='back_calculation', derivative_filter=None, setpoint_weight=1.0, tracking_time=None):
+        """PID en mode production ; derivative_filter=None : Td/10 (Td = kd/kp), au moins 0.1 s (2 ticks à 20 Hz)."""
+        if derivative_filter is None:
+            derivative_filter = max(kd / kp / 10, 0.1) if kp and kd else 0.0
+        return cls(kp, ki, kd, setpoint, min_output, max_output, clamp=True, windup=windup,
+                   derivative_on_measurement=True, derivative_filter=derivative_filter,
+                   setpoint_weight=setpoint_weight, tracking_time=tracking_time)
+
+    @property
+    def legacy(self):
+        """True si la loi est celle d'origine (PIDBank, rejeu des vols enregistrés)."""
+        return (not self.clamp and self.windup == 'reset' and not self.derivative_on_measurement
+                and not self.derivative_filter and self.setpoint_weight == 1.0)
 
     def update(self, current_value, dt):
+        if self.legacy:
+            return self._update_legacy(current_value, dt)
+
+        error = self.setpoint - current_value
+
+        # Dérivée (sur la mesure ou sur l'erreur), filtrée passe-bas
+        if self.derivative_on_measurement:
+            raw = -(current_value - self.previous_value) / dt if dt > 0 and self.previous_value is not None else 0.0
+        else:
+            raw = (error - self.previous_error) / dt if dt > 0 else 0.0
+        if self.derivative_filter > 0 and dt > 0:
+            self.derivative += dt / (self.derivative_filter + dt) * (raw - self.derivative)
+        else:
+            self.derivative = raw
+
+        # Intégrale provisoire, puis sortie
+        proportional = self.kp * (self.setpoint_weight * self.setpoint - current_value)
+        integral = self.integral + error * dt
+        output = proportional + self.ki * integral + self.kd * self.derivative
+        saturated = min(max(output, self.min_output), self.max_output)
+
+        # Anti-windup sur les deux bornes
+        if self.anti_integral_windup and saturated != output:
+            if self.windup == 'conditional':
+                if self.ki * error * (output - saturated) > 0:  # l'erreur pousse plus loin dans la saturation
+                    integral = self.integral
+            elif self.windup == 'back_calculation' and self.ki:
+                integral += (saturated - output) / (self.ki * self._tracking_time()) * dt
+            elif self.windup == 'reset' and output >= self.max_output:
+                integral = 0.0
+        self.integral = integral
+
+        # Mise à jour pour le prochain cycle
+        self.previous_error = error
+        self.previous_value = current_value
+        self.output = saturated if self.clamp else output
+        return self.output
+
+    def _update_legacy(self, current_value, dt):
         # Calcul de l'erreur
         error = self.setpoint - current_value
 
@@ -157,8 +306,128 @@ class PID:
 
         # Mise à jour pour le prochain cycle
         self.previous_error = error
+        self.previous_value = current_value
+        self.derivative = derivative
+        self.output = output
+
+        return output
+
+    def _tracking_time(self):
+        if self.tracking_time:
+            return self.tracking_time
+        ti = self.kp / self.ki if self.kp else 1.0 / self.ki
+        td = self.kd / self.kp if self.kp else 0.0
+        return math.sqrt(ti * td) if td > 0 else ti
+
+    def set_gains(self, kp=None, ki=None, kd=None):
+        """
+        Nouveaux gains sans à-coup : l'intégrale est recalculée pour que la sortie au dernier point
+        de mesure reste la même (transfert « bumpless », ex. changement de gains en cours de vol).
+        """
+        kp = self.kp if kp is None else kp
+        ki = self.ki if ki is None else ki
+        kd = self.kd if kd is None else kd
+        if self.previous_value is not None and ki:
+            y = self.previous_value
+            weight = 1.0 if self.legacy else self.setpoint_weight
+            before = self.kp * (weight * self.setpoint - y) + self.ki * self.integral + self.kd * self.derivative
+            after_without_integral = kp * (weight * self.setpoint - y) + kd * self.derivative
+            self.integral = (before - after_without_integral) / ki
+        self.kp, self.ki, self.kd = kp, ki, kd
 
+
+class PIDBank:
+    """
+    N régulateurs PID évalués d'un bloc sur des tableaux NumPy : même loi que PID, mais chaque
+    paramètre (gains, consigne, limites, anti-windup) peut être un scalaire ou un tableau (N,).
+
+    En vol : un régulateur par axe,
+        bank = PIDBank(kp=[0.5, 0.5, 0.5, 0.002], ki=[...], setpoint=[...], names=('pitch', 'yaw', 'roll', 'throttle'))
+        pitch, yaw, roll, throttle = bank.update([p, y, r, q], dt)
+    Hors-ligne : des milliers de jeux de gains (PIDBank.grid) face à N vaisseaux simulés (kRPC_Simulator.SimState).
+    Le coût fixe d'un appel NumPy (~3 µs) ne devient rentable qu'au-delà de quelques dizaines de régulateurs
+    (voir kRPC_Benchmarks.benchmark_pid_bank) ; en vol, l'intérêt est surtout un état unique pour tous les axes.
+    """
+
+    PARAMETERS = ('kp', 'ki', 'kd', 'setpoint', 'min_output', 'max_output', 'anti_integral_windup')
+
+    def __init__(self, kp, ki=0.0, kd=0.0, setpoint=0.0, min_output=0.0, max_output=1.0, anti_integral_windup=True,
+                 n=None, clamp=False, names=None):
+        """
+        Args:
+            kp, ki, kd, setpoint, min_output, max_output, anti_integral_windup: scalaires ou tableaux (N,)
+            n: nombre de régulateurs (déduit des tableaux sinon)
+            clamp: borne les sorties à [min_output, max_output] (PID ne le fait pas : l'appelant borne)
+            names: noms des régulateurs (optionnel, pour as_dict)
+        """
+        values = dict(kp=kp, ki=ki, kd=kd, setpoint=setpoint, min_output=min_output, max_output=max_output,
+                      anti_integral_windup=anti_integral_windup)
+        if n is None:
+            n = len(names) if names is not None else max(np.size(v) for v in values.values())
+        self.n = n
+        for name, value in values.items():
+            dtype = bool if name == 'anti_integral_windup' else float
+            setattr(self, name, np.broadcast_to(np.asarray(value, dtype=dtype), (n,)).copy())
+        self.clamp = clamp
+        self.names = tuple(names) if names is not None else None
+        self.integral = np.zeros(n)
+        self.previous_error = np.zeros(n)
+
+    @classmethod
+    def from_pids(cls, pids, clamp=False, names=None):
+        """Regroupe des PID existants (gains et état) dans un seul banc (loi d'origine uniquement)."""
+        if not all(pid.legacy for pid in pids):
+            raise ValueError("PIDBank ne reproduit que la loi d'origine de PID (pas le mode production)")
+        bank = cls(**{p: [getattr(pid, p) for pid in pids] for p in cls.PARAMETERS}, clamp=clamp, names=names)
+        bank.integral[:] = [pid.integral for pid in pids]
+        bank.previous_error[:] = [pid.previous_error for pid in pids]
+        return bank
+
+    @classmethod
+    def grid(cls, clamp=False, **axes):
+        """
+        Produit cartésien des valeurs données (ex. kp=[...], ki=[...], kd=[...]) ; les autres
+        paramètres (setpoint=20000...) sont partagés. bank.params[i] : paramètres du régulateur i.
+        """
+        varying = {name: np.atleast_1d(values) for name, values in axes.items() if np.ndim(values) > 0}
+        fixed = {name: value for name, value in axes.items() if np.ndim(value) == 0}
+        mesh = np.meshgrid(*varying.values(), indexing='ij') if varying else []
+        columns = {name: m.ravel() for name, m in zip(varying, mesh)}
+        bank = cls(**columns, **fixed, n=int(np.prod([len(v) for v in varying.values()])), clamp=clamp)
+        bank.params = [{name: float(c[i]) for name, c in columns.items()} for i in range(bank.n)]
+        return bank
+
+    def update(self, current_value, dt):
+        """Sorties des N régulateurs (dt : scalaire ou tableau (N,), s)."""
+        error = self.setpoint - np.asarray(current_value, dtype=float)
+        dt = np.asarray(dt, dtype=float)
+        self.integral += error * dt
+        derivative = np.divide(error - self.previous_error, dt, out=np.zeros(self.n), where=dt > 0)
+        output = self.kp * error + self.ki * self.integral + self.kd * derivative
+        self.integral[self.anti_integral_windup & (output >= self.max_output)] = 0.0
+        self.previous_error = error
+        if self.clamp:
+            np.clip(output, self.min_output, self.max_output, out=output)
         return output
+
+    def reset(self, mask=None):
+        """Remet à zéro l'intégrale et l'erreur précédente (de tous les régulateurs, ou de ceux de `mask`)."""
+        index = slice(None) if mask is None else mask
+        self.integral[index] = 0.0
+        self.previous_error[index] = 0.0
+
+    def pid(self, i):
+        """PID scalaire équivalent au régulateur i (gains et état), ex. pour voler le meilleur réglage."""
+        pid = PID(**{p: getattr(self, p)[i].item() for p in self.PARAMETERS})
+        pid.integral = float(self.integral[i])
+        pid.previous_error = float(self.previous_error[i])
+        return pid
+
+    def as_dict(self, output):
+        return dict(zip(self.names, output.tolist()))
+
+    def __len__(self):
+        return self.n
 #-------------------------------------------------------------------------------------------------------------
 # ANSI styles
 BOLD = "\033[1m"
@@ -175,9 +444,898 @@ def center_colored_text(text, color_code, total_width):
 def pad(content, width):
     return content.ljust(width)
 
+# -------------------------------------------------------------------------------------------------------------
+# Affichage terminal : boîte de télémétrie partagée, mise à jour différentielle et budget d'affichage
+class TerminalRenderer:
+    """
+    Boîte de télémétrie dessinée en une seule écriture par image : seules les cellules modifiées depuis
+    l'image précédente sont réécrites (déplacements de curseur ANSI), et le rafraîchissement est plafonné.
+
+    Le temps passé à écrire est mesuré : sur une session SSH lente, print() bloque la boucle de vol.
+    Si l'affichage dépasse `budget` (fraction du temps), la fréquence est divisée par 2 jusqu'à repasser
+    sous le budget.
+
+    Utilisation :
+        screen = TerminalRenderer("Télémetrie", [('Altitude', '{:>10.3f} km'), ('Q dynamique', '{:>10.0f} Pa')])
+        screen.render(altitude() / 1000, dynamic_pressure())   # ignoré si appelé trop tôt
+        screen.report()
+    """
+
+    def __init__(self, title, fields, width=36, max_rate=10.0, budget=0.05, full_every=5.0, row=1, column=1,
+                 stream=None, clock=time.perf_counter):
+        """
+        Args:
+            title: titre centré (gras bleu)
+            fields: [(libellé, format), ...], une ligne par champ ; format appliqué à la valeur (ex. '{:>10.1f} °')
+            width: largeur intérieure de la boîte
+            max_rate: images par seconde au maximum
+            budget: fraction du temps que l'affichage peut occuper avant de ralentir
+            full_every: s entre deux images complètes (répare l'écran après un print() extérieur)
+            row, column: coin supérieur gauche de la boîte dans le terminal (1 = haut / gauche)
+        """
+        self.width = width
+        self.labels = [label for label, _ in fields]
+        self.formats = [fmt for _, fmt in fields]
+        self.label_width = max(len(label) for label in self.labels)
+        self.max_rate = max_rate
+        self.budget = budget
+        self.full_every = full_every
+        self.row = row
+        self.column = column
+        self.stream = stream or sys.stdout
+        self.clock = clock
+        border = "─" * width
+        self._top = [f"┌{border}┐", f"│{center_colored_text(title, BOLD + BLUE, width)}│", f"├{border}┤"]
+        self._bottom = f"└{border}┘"
+        self._previous = []
+        self._interval = 1.0 / max_rate
+        self._next = 0.0
+        self._next_full = 0.0
+        # Mesures (fenêtre glissante d'une seconde pour le budget, cumul pour report())
+        self.frames = 0
+        self.skipped = 0
+        self.write_time = 0.0  # s
+        self.bytes = 0
+        self._start = clock()
+        self._window_start = self._start
+        self._window_time = 0.0
+
+    def frame(self, *values):
+        """Lignes de la boîte pour ces valeurs (sans rien écrire)."""
+        lines = list(self._top)
+        inner = self.width - 1
+        for label, fmt, value in zip(self.labels, self.formats, values):
+            lines.append(f"│ {pad(f'{label:<{self.label_width}} : {fmt.format(value)}', inner)[:inner]}│")
+        lines.append(self._bottom)
+        return lines
+
+    def invalidate(self):
+        """Force une image complète au prochain render() (ex. après un print() qui a décalé l'écran)."""
+        self._previous = []
+
+    def _diff(self, lines):
+        out = []
+        previous = self._previous
+        for i, line in enumerate(lines):
+            old = previous[i] if i < len(previous) else None
+            if line == old:
+                continue
+            start = 0
+            if old is not None and len(old) == len(line) and '\033' not in line:
+                while line[start] == old[start]:
+                    start += 1
+                end = len(line)
+                while line[end - 1] == old[end - 1]:
+                    end -= 1
+                line = line[start:end]
+            out.append(f"\033[{self.row + i};{self.column + start}H{line}")
+        return ''.join(out)
+
+    def render(self, *values, force=False):
+        """
+        Dessine une image si la fréquence maximale le permet.
+
+        Returns:
+            True si l'image a été écrite
+        """
+        now = self.clock()
+        if not force and now < self._next - 0.1 * self._interval:  # tolérance pour la gigue d'un appelant à max_rate
+            self.skipped += 1
+            return False
+        if now >= self._next_full:
+            self.invalidate()
+            self._next_full = now + self.full_every
+        lines = self.frame(*values)
+        text = self._diff(lines)
+        if text:
+            start = self.clock()
+            self.stream.write(text)
+            self.stream.flush()
+            elapsed = self.clock() - start
+            self.write_time += elapsed
+            self._window_time += elapsed
+            self.bytes += len(text.encode())
+        self._previous = lines
+        self.frames += 1
+        self._next = now + self._interval
+        self._adapt(now)
+        return True
+
+    def _adapt(self, now):
+        """Une fois par seconde : ralentit si l'affichage dépasse le budget, revient vers max_rate sinon."""
+        window = now - self._window_start
+        if window < 1.0:
+            return
+        load = self._window_time / window
+        if load > self.budget:
+            self._interval = min(self._interval * 2, 2.0)
+        elif load < self.budget / 4:
+            self._interval = max(self._interval / 2, 1.0 / self.max_rate)
+        self._window_start = now
+        self._window_time = 0.0
+
+    @property
+    def rate(self):
+        """Fréquence d'affichage actuelle (images/s)."""
+        return 1.0 / self._interval
+
+    @property
+    def load(self):
+        """Fraction du temps passée à écrire à l'écran depuis le début."""
+        elapsed = self.clock() - self._start
+        return self.write_time / elapsed if elapsed > 0 else 0.0
+
+    def report(self):
+        elapsed = max(self.clock() - self._start, 1e-9)
+        print(f"Affichage : {self.frames} images ({self.skipped} ignorées), {1e3 * self.write_time / elapsed:.1f} ms/s "
+              f"({100 * self.load:.1f} % du temps), {self.bytes / elapsed / 1e3:.1f} ko/s, {self.rate:.1f} images/s")
+
 # -------------------------------------------------------------------------------------------------------------
 # Tangente linéaire
 def linear_tangent(altitude, orbit_height=100000, s=8):
     return 90 - np.degrees(np.arctan(altitude * s / (orbit_height - altitude))) # picth en °
 
 # -------------------------------------------------------------------------------------------------------------
+# Programme de tangage en racine carrée de l'apoapse (angle par rapport à la verticale)
+def pitch_program(altitude, apoapsis, atmosphere_depth, switch_alt=250, scale_factor=1):
+    pitch_ang = 0 # °
+    alt_diff = scale_factor * atmosphere_depth - switch_alt # m
+    if altitude >= switch_alt:
+        pitch_ang = max(0, min(90, 90 * math.sqrt(max(0, apoapsis - switch_alt) / alt_diff)))
+    return pitch_ang
+
+# -------------------------------------------------------------------------------------------------------------
+# Profil de guidage précalculé (table dense + interpolation linéaire en O(1))
+class GuidanceProfile:
+    """
+    Tangage (° au-dessus de l'horizon) tabulé sur une grille uniforme de l'altitude ou de l'apoapse.
+
+    La table est calculée une seule fois au démarrage ; profile.lookup(x) ne fait ensuite que
+    quelques opérations sur des floats Python (pas de NumPy ni de RPC dans la boucle de guidage).
+    Dans une boucle chaude, récupérer `lookup` une fois : pitch_at = profile.lookup
+    """
+
+    def __init__(self, pitch, x0=0.0, dx=1.0, variable='altitude'):
+        self.variable = variable  # 'altitude' ; 'apoapsis'
+        self.x0 = float(x0)
+        self.dx = float(dx)
+        self.table = array('d', pitch)
+        self.lookup = self._make_lookup(self.table, self.x0, 1.0 / self.dx)
+
+    @staticmethod
+    def _make_lookup(table, x0, inv_dx):
+        # Fermeture : toutes les constantes sont des variables locales (pas d'accès d'attributs)
+        last_index = len(table) - 1
+        first = table[0]
+        last = table[last_index]
+
+        def lookup(x):
+            f = (x - x0) * inv_dx
+            if f <= 0.0:
+                return first
+            i = int(f)
+            if i >= last_index:
+                return last
+            a = table[i]
+            return a + (table[i + 1] - a) * (f - i)
+        return lookup
+
+    def __call__(self, x):
+        return self.lookup(x)
+
+    def __len__(self):
+        return len(self.table)
+
+    @classmethod
+    def from_function(cls, func, x_max, n_points=2048, x0=0.0, variable='altitude'):
+        dx = (x_max - x0) / (n_points - 1)
+        return cls([func(x0 + i * dx) for i in range(n_points)], x0, dx, variable)
+
+    @classmethod
+    def linear_tangent(cls, orbit_height=100000, s=8, n_points=2048):
+        """Même loi que linear_tangent(), tabulée en fonction de l'altitude."""
+        return cls.from_function(lambda h: float(linear_tangent(h, orbit_height, s)), 0.999 * orbit_height, n_points)
+
+    @classmethod
+    def pitch_program(cls, atmosphere_depth, switch_alt=250, scale_factor=1, n_points=8192):
+        """
+        90 - pitch_program(), tabulé en fonction de l'apoapse de switch_alt à scale_factor * atmosphere_depth.
+        La racine carrée est raide au départ : table plus fine (écart max ~0.25° sur la première case).
+        """
+        return cls.from_function(lambda ap: 90 - pitch_program(switch_alt, ap, atmosphere_depth, switch_alt, scale_factor),
+                                 scale_factor * atmosphere_depth, n_points, x0=switch_alt, variable='apoapsis')
+
+    @classmethod
+    def knots(cls, knot_altitudes, knots, n_points=7001):
+        """
+        Profil par nœuds de Ascent_Trajectory.py (interpolation linéaire), tabulé en fonction de l'altitude.
+        Pas de 10 m sur 0-70 km : les nœuds tombent sur la grille, la table reproduit exactement le profil.
+        """
+        return cls.from_function(lambda h: float(np.interp(h, knot_altitudes, knots)), knot_altitudes[-1], n_points,
+                                 x0=knot_altitudes[0])
+
+# -------------------------------------------------------------------------------------------------------------
+# Loi de tangage d'ascension : profil optimisé hors ligne (KSP_OffLine_Maths/Ascent_Trajectory.py) ou défaut
+PITCH_PROFILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'KSP_OffLine_Maths', 'pitch_profile.json')
+
+def ascent_pitch(atmosphere_depth, target_altitude, path=PITCH_PROFILE, default=None):
+    """
+    Loi de tangage pitch(altitude, apoapse) -> ° au-dessus de l'horizon, et sa description.
+
+    Le profil exporté par Ascent_Trajectory.py (`path`, None pour l'ignorer) est utilisé s'il existe et vise
+    la même altitude ; sinon `default` (loi de même signature), par défaut pitch_program(switch_alt=250, scale_factor=1).
+    Les lois renvoyées lisent une table GuidanceProfile calculée ici une fois.
+    """
+    profile = None
+    if path is not None and os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            profile = json.load(f)
+        if abs(profile['target_altitude'] - target_altitude) > 1.0:
+            print(f"Profil optimisé pour {profile['target_altitude'] / 1000:.0f} km, visée {target_altitude / 1000:.0f} km : "
+                  f"loi par défaut")
+            profile = None
+    if profile is None:
+        if default is not None:
+            return default, 'défaut'
+        profile = {'profile': 'pitch_program', 'parameters': {'switch_alt': 250, 'scale_factor': 1}}
+        description = 'pitch_program (défaut)'
+    else:
+        description = f"{profile['profile']} optimisé ({profile['delta_v']:.0f} m/s)"
+
+    kind, p = profile['profile'], profile['parameters']
+    if kind == 'linear_tangent':
+        turn_start = p['turn_start_altitude']
+        lookup = GuidanceProfile.linear_tangent(target_altitude, p['s']).lookup
+        return (lambda altitude, apoapsis: 90.0 if altitude < turn_start else lookup(altitude)), description
+    if kind == 'pitch_program':
+        switch_alt = p['switch_alt']
+        lookup = GuidanceProfile.pitch_program(atmosphere_depth, switch_alt, p['scale_factor']).lookup
+        return (lambda altitude, apoapsis: 90.0 if altitude < switch_alt else lookup(apoapsis)), description
+    if kind == 'knots':
+        lookup = GuidanceProfile.knots(profile['knot_altitudes'], profile['knots']).lookup
+        return (lambda altitude, apoapsis: lookup(altitude)), description
+    raise ValueError(f"Profil inconnu : {kind}")
+
+# -------------------------------------------------------------------------------------------------------------
+# Runtime asyncio : guidage, staging, biome et affichage en tâches indépendantes
+class FlightRuntime:
+    """
+    Exécute plusieurs boucles de vol concurrentes, chacune à sa propre fréquence.
+
+    Les fonctions synchrones (appels kRPC bloquants) tournent dans un pool de threads borné :
+    chaque tâche attend son propre appel, donc un affichage lent ne retarde jamais le staging.
+    Une fonction qui renvoie True termine sa tâche ; runtime.stop() termine toutes les tâches.
+
+    Utilisation :
+        runtime = FlightRuntime(conn)
+        runtime.every(10, guidage, name='guidage')
+        runtime.every(2, verifier_carburant(vessel), name='staging')
+        runtime.every(2, verifier_biome(conn, vessel), name='biome')
+        runtime.every(5, afficher, name='affichage', critical=False)
+        runtime.run()
+    """
+
+    def __init__(self, conn, max_workers=None):
+        self.conn = conn
+        self.max_workers = max_workers
+        self.tasks = []  # (nom, période, fonction, critique)
+        self.stats = {}  # nom -> [nombre de cycles, durée cumulée, durée max]
+        self._stop = None
+        self._executor = None
+
+    def every(self, rate, func, name=None, critical=True):
+        """
+        Ajoute une tâche périodique (chaînable).
+
+        Args:
+            rate: fréquence en Hz
+            func: fonction sans argument (synchrone ou coroutine), True pour terminer la tâche
+            critical: si False, la tâche est abandonnée à l'arrêt au lieu d'être attendue
+        """
+        self.tasks.append((name or func.__name__, 1.0 / rate, func, critical))
+        return self
+
+    async def call(self, func, *args, **kwargs):
+        """Exécute un appel bloquant dans le pool de threads."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def stop(self):
+        """Demande l'arrêt de toutes les tâches (utilisable depuis n'importe quel thread)."""
+        if self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    async def _periodic(self, name, period, func, is_coroutine):
+        stats = self.stats.setdefault(name, [0, 0.0, 0.0])
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            start = time.monotonic()
+            done = await func() if is_coroutine else await self.call(func)
+            elapsed = time.monotonic() - start
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+            if done:
+                return
+            next_tick = max(next_tick + period, time.monotonic())
+            try:
+                await asyncio.wait_for(self._stop.wait(), next_tick - time.monotonic())
+            except asyncio.TimeoutError:
+                pass
+
+    async def _sim_clock(self, period=0.02):
+        # kRPC_Simulator : le temps de jeu n'avance que sur demande, on le fait suivre le temps réel
+        last = time.monotonic()
+        while not self._stop.is_set():
+            await asyncio.sleep(period)
+            now = time.monotonic()
+            self.conn.advance(now - last)
+            last = now
+
+    async def main(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers or len(self.tasks) + 1,
+                                            thread_name_prefix='kRPC')
+        try:
+            critical, background = [], []
+            for name, period, func, is_critical in self.tasks:
+                task = asyncio.create_task(self._periodic(name, period, func, asyncio.iscoroutinefunction(func)), name=name)
+                (critical if is_critical else background).append(task)
+            if hasattr(self.conn, 'advance'):
+                background.append(asyncio.create_task(self._sim_clock()))
+            stop_wait = asyncio.create_task(self._stop.wait())
+            # Fin dès que runtime.stop() est appelé ou que toutes les tâches critiques sont terminées
+            waiters = [stop_wait, asyncio.gather(*critical)] if critical else [stop_wait]
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+            self._stop.set()
+            for task in background:
+                task.cancel()
+            await asyncio.gather(*background, return_exceptions=True)
+            await asyncio.gather(*critical, stop_wait)
+        finally:
+            self._executor.shutdown(wait=True)
+            self._stop = None
+
+    def run(self):
+        asyncio.run(self.main())
+        return self.stats
+
+    def report(self):
+        print(f"{'Tâche':<20}{'Cycles':>8}{'Moy. (ms)':>11}{'Max (ms)':>10}")
+        for name, (count, total, worst) in self.stats.items():
+            print(f"{name[:19]:<20}{count:>8}{1000 * total / max(count, 1):>11.2f}{1000 * worst:>10.2f}")
+
+# -------------------------------------------------------------------------------------------------------------
+# Boucle de contrôle à fréquence fixe
+class LoopStats:
+    """Histogrammes (ms) de latence de réveil, de gigue de période et de temps de calcul d'une boucle."""
+
+    BINS = (0.1, 0.5, 1, 2, 5, 10, 20, 50, 100, float('inf'))  # bornes hautes (ms)
+
+    def __init__(self, period):
+        self.period = period
+        self.ticks = 0
+        self.overruns = 0       # calcul plus long que la période
+        self.missed = 0         # ticks sautés pour rattraper le retard
+        self.max_latency = 0.0  # s
+        self.max_jitter = 0.0   # s
+        self.latency = [0] * len(self.BINS)
+        self.jitter = [0] * len(self.BINS)
+        self.work = [0] * len(self.BINS)
+
+    def _add(self, histogram, value):
+        ms = value * 1000
+        for i, edge in enumerate(self.BINS):
+            if ms <= edge:
+                histogram[i] += 1
+                return
+
+    def record(self, latency, period, work):
+        self.ticks += 1
+        jitter = abs(period - self.period)
+        self.max_latency = max(self.max_latency, latency)
+        self.max_jitter = max(self.max_jitter, jitter)
+        self._add(self.latency, latency)
+        self._add(self.jitter, jitter)
+        self._add(self.work, work)
+        if work > self.period:
+            self.overruns += 1
+
+    def report(self):
+        print(f"Boucle {1 / self.period:.0f} Hz : {self.ticks} ticks, {self.overruns} dépassements, "
+              f"{self.missed} ticks sautés, latence max {self.max_latency * 1000:.2f} ms, "
+              f"gigue max {self.max_jitter * 1000:.2f} ms")
+        print(f"{'≤ ms':>8}{'Latence':>10}{'Gigue':>10}{'Calcul':>10}")
+        for i, edge in enumerate(self.BINS):
+            if self.latency[i] or self.jitter[i] or self.work[i]:
+                print(f"{edge:>8g}{self.latency[i]:>10}{self.jitter[i]:>10}{self.work[i]:>10}")
+
+
+class FixedRateLoop:
+    """
+    Cadence une boucle de contrôle à fréquence fixe sur des échéances absolues.
+
+    Le temps de calcul de chaque tour est compensé, et dt est l'intervalle réellement écoulé.
+    Échéances et dt sont mesurés sur `clock` : time.monotonic par défaut, ou le stream `ut` du jeu
+    pour suivre le temps de jeu (pause, ralentissements physiques, kRPC_Simulator).
+    Un tour trop long ne provoque pas de rafale : les échéances manquées sont sautées et comptées.
+
+    Avec une horloge de jeu, l'attente jusqu'à l'échéance (un écart de temps de jeu) est dormie en
+    secondes réelles : exact à vitesse 1 et dans le simulateur (time.sleep y fait avancer le jeu),
+    approché sinon. ut n'avance que par frames physiques de 0.02 s et plus vite en accélération du
+    temps (échéances sautées) ; en pause il est figé, la boucle tourne alors à la période en temps
+    réel avec dt = 0.
+
+    Utilisation :
+        loop = FixedRateLoop(20)
+        for dt in loop:
+            throttle = pid.update(dynamic_pressure(), dt)
+        loop.stats.report()
+    """
+
+    def __init__(self, rate, clock=None, duration=None):
+        self.period = 1.0 / rate
+        self.clock = clock or time.monotonic
+        self.duration = duration  # s (None = sans fin)
+        self.stats = LoopStats(self.period)
+        self.t = 0.0  # temps écoulé depuis le premier tick
+        self._running = False
+
+    def stop(self):
+        self._running = False
+
+    def __iter__(self):
+        clock = self.clock
+        period = self.period
+        stats = self.stats
+        self._running = True
+        t0 = deadline = tick_start = clock()
+        first = True
+        while self._running:
+            if not first:
+                now = clock()
+                work = now - tick_start
+                deadline += period
+                if now - deadline > period:  # retard de plus d'une période : ticks sautés, pas de rafale
+                    stats.missed += int((now - deadline) / period)
+                    deadline = now
+                deadline = min(deadline, now + period)  # horloge figée (pause) : l'avance ne se cumule pas
+                time.sleep(max(0.0, deadline - now))
+            previous_start, tick_start = tick_start, clock()
+
+            dt = tick_start - previous_start
+            self.t = tick_start - t0
+            if not first:
+                stats.record(max(0.0, tick_start - deadline), dt, work)
+            if self.duration is not None and self.t >= self.duration:
+                return
+            yield period if first else dt
+            first = False
+
+# -------------------------------------------------------------------------------------------------------------
+# Registre de streams partagés (un seul stream kRPC par donnée, quel que soit le nombre de consommateurs)
+class StreamHandle:
+    """Poignée sur un stream partagé : s'appelle comme le stream, release() rend la référence."""
+
+    def __init__(self, registry, key, stream):
+        self._registry = registry
+        self._key = key
+        self.stream = stream
+
+    def __call__(self):
+        return self.stream()
+
+    def __getattr__(self, name):  # rate, add_callback, start, wait...
+        return getattr(self.stream, name)
+
+    def release(self):
+        if self._registry is not None:
+            self._registry._release(self._key)
+            self._registry = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class StreamRegistry:
+    """
+    Streams kRPC identifiés par (objet, attribut, arguments) et comptés par référence.
+
+    Le premier get() crée le stream, les suivants le partagent ; le dernier release() le supprime.
+    `attr` peut être un chemin relatif à l'objet, résolu une seule fois à la création :
+        'flight.mean_altitude' -> vessel.flight(frame).mean_altitude
+        'orbit.apoapsis_altitude' -> vessel.orbit.apoapsis_altitude
+    Le repère `frame` est passé à flight() dans un chemin, ou à la méthode finale (ex.
+    node.remaining_burn_vector(frame)).
+
+    Utilisation :
+        streams = stream_registry(conn)
+        altitude = streams.get(vessel, 'flight.mean_altitude')
+        amount = streams.get(resources, 'amount', 'SolidFuel')
+        ...
+        altitude.release()
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.entries = {}  # clé -> [stream, nombre de références]
+        self.created = 0
+        self.shared = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _is_property(obj, name):
+        return isinstance(getattr(type(obj), name, None), property)
+
+    def _open(self, obj, attr, args, frame):
+        *path, name = attr.split('.')
+        for part in path:
+            if self._is_property(obj, part):
+                obj = getattr(obj, part)
+            else:  # méthode : flight(frame), ...
+                obj = getattr(obj, part)() if frame is None else getattr(obj, part)(frame)
+                frame = None
+        if self._is_property(obj, name):
+            return self.conn.add_stream(getattr, obj, name)
+        call_args = args if frame is None else (*args, frame)
+        return self.conn.add_stream(getattr(obj, name), *call_args)
+
+    def get(self, obj, attr, *args, frame=None):
+        """Poignée sur le stream de obj.attr (ou obj.attr(*args, frame) pour une méthode)."""
+        key = (obj, attr, args, frame)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = [self._open(obj, attr, args, frame), 0]
+                self.created += 1
+            else:
+                self.shared += 1
+            entry[1] += 1
+        return StreamHandle(self, key, entry[0])
+
+    def _release(self, key):
+        with self._lock:
+            entry = self.entries[key]
+            entry[1] -= 1
+            if entry[1] > 0:
+                return
+            del self.entries[key]
+        entry[0].remove()
+
+    def close(self):
+        """Supprime tous les streams encore ouverts (fin de script)."""
+        with self._lock:
+            entries, self.entries = self.entries, {}
+        for stream, _ in entries.values():
+            stream.remove()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+_registries = weakref.WeakKeyDictionary()
+_registries_lock = threading.Lock()
+
+def stream_registry(conn):
+    """Registre de streams partagé par tous les modules utilisant la même connexion."""
+    with _registries_lock:
+        registry = _registries.get(conn)
+        if registry is None:
+            registry = _registries[conn] = StreamRegistry(conn)
+        return registry
+
+# -------------------------------------------------------------------------------------------------------------
+# Fréquences de streams adaptatives (phase de vol + variation observée)
+@dataclass
+class RateRule:
+    rate:       float         # Hz par défaut (0 = aussi vite que possible)
+    min_rate:   float = None  # Hz, borne basse de l'adaptation
+    max_rate:   float = None  # Hz, borne haute de l'adaptation
+    resolution: float = None  # variation significative (unité du signal) ; None = fréquence fixe
+    phases:     dict  = field(default_factory=dict)  # phase -> fréquence (Hz) imposée
+
+
+# Règles par chemin d'attribut (voir StreamRegistry) ; les streams sans règle gardent la fréquence du serveur
+DEFAULT_RATE_RULES = {
+    'flight.dynamic_pressure':  RateRule(5, min_rate=1, max_rate=20, resolution=50, phases={'ascent': 20}),
+    'flight.mean_altitude':     RateRule(5, min_rate=1, max_rate=20, resolution=25, phases={'ascent': 20}),
+    'flight.g_force':           RateRule(5, min_rate=1, max_rate=10, resolution=0.05),
+    'flight.static_pressure':   RateRule(2, min_rate=0.5, max_rate=10, resolution=100),
+    'orbit.apoapsis_altitude':  RateRule(5, min_rate=0.5, max_rate=20, resolution=50, phases={'ascent': 20}),
+    'orbit.periapsis_altitude': RateRule(2, min_rate=0.5, max_rate=20, resolution=50),
+    'thrust':                   RateRule(5, min_rate=1, max_rate=20, resolution=1000),
+    'mass':                     RateRule(2, min_rate=0.5, max_rate=10, resolution=10),
+    'situation':                RateRule(1),
+    'biome':                    RateRule(1),
+    'orbit.body.name':          RateRule(0.2),
+    'orbit.body.surface_gravity': RateRule(0.2),
+    'target_body':              RateRule(0.2),
+}
+
+
+class StreamRatePolicy:
+    """
+    Règle la fréquence (stream.rate) de chaque stream d'un StreamRegistry.
+
+    - set_phase(phase) applique les fréquences imposées par la phase ('prelaunch', 'ascent', 'coast',
+      'orbit', 'burn'...) ;
+    - update(), appelé dans la boucle principale, mesure la variation de chaque signal et choisit
+      une fréquence entre min_rate et max_rate : environ une mise à jour par `resolution` de variation.
+    Une fréquence n'est renvoyée au serveur que si elle change de plus de 20 % (c'est un RPC).
+    """
+
+    def __init__(self, registry, rules=None, phase=None, interval=1.0):
+        self.registry = registry
+        self.rules = DEFAULT_RATE_RULES if rules is None else rules
+        self.phase = phase
+        self.interval = interval  # s entre deux adaptations
+        self.rates = {}           # clé de stream -> fréquence appliquée (Hz)
+        self.changes = 0          # nombre de RPC de changement de fréquence
+        self._samples = {}        # clé de stream -> (t, valeur)
+        self._last_update = None
+
+    def set_phase(self, phase):
+        self.phase = phase
+        self._samples.clear()
+        self.update(force=True)
+
+    def _target_rate(self, rule, key, stream, now):
+        if self.phase in rule.phases:
+            return rule.phases[self.phase]
+        if rule.resolution is None:
+            return rule.rate
+        value = stream()
+        previous = self._samples.get(key)
+        self._samples[key] = (now, value)
+        if previous is None or now <= previous[0]:
+            return self.rates.get(key, rule.rate)
+        if isinstance(value, (tuple, list)):
+            change = max(abs(a - b) for a, b in zip(value, previous[1]))
+        else:
+            change = abs(value - previous[1])
+        rate = change / (now - previous[0]) / rule.resolution
+        return max(rule.min_rate or 0.0, min(rule.max_rate or rate, rate))
+
+    def update(self, force=False):
+        now = time.monotonic()
+        if not force and self._last_update is not None and now - self._last_update < self.interval:
+            return
+        self._last_update = now
+        entries = dict(self.registry.entries)
+        for key in [key for key in self.rates if key not in entries]:  # streams libérés entre-temps
+            del self.rates[key]
+            self._samples.pop(key, None)
+        for key, (stream, _) in entries.items():
+            rule = self.rules.get(key[1])
+            if rule is None:
+                continue
+            rate = self._target_rate(rule, key, stream, now)
+            current = self.rates.get(key)
+            if current is None or abs(rate - current) > 0.2 * max(current, 1e-9):
+                stream.rate = rate
+                self.rates[key] = rate
+                self.changes += 1
+
+# -------------------------------------------------------------------------------------------------------------
+# Comptage des appels distants (allers-retours avec le serveur)
+_rpc_totals = weakref.WeakKeyDictionary()  # connexion kRPC -> [total de RPC]
+
+
+def _rpc_total(conn):
+    """Total de RPC de la connexion ; Client._invoke n'est enveloppé qu'une fois par connexion."""
+    with _registries_lock:
+        total = _rpc_totals.get(conn)
+        if total is None:
+            total = _rpc_totals[conn] = [0]
+            invoke = conn._invoke
+
+            def counting_invoke(*args, **kwargs):
+                total[0] += 1
+                return invoke(*args, **kwargs)
+            conn._invoke = counting_invoke
+        return total
+
+
+class RpcCounter:
+    """
+    Compte les RPC d'une connexion : kRPC (Client._invoke, par lequel passent tous les appels)
+    ou kRPC_Simulator (conn.rpc_count). Les lectures de streams ne sont pas des RPC.
+    Autant d'instances que voulu par connexion : le compteur sous-jacent est partagé.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._total = None if hasattr(conn, 'rpc_count') else _rpc_total(conn)
+        self._mark = self.count
+
+    @property
+    def count(self):
+        return self.conn.rpc_count if self._total is None else self._total[0]
+
+    def delta(self):
+        """Nombre de RPC depuis le dernier appel à delta() (ou la création)."""
+        count = self.count
+        n, self._mark = count - self._mark, count
+        return n
+
+# -------------------------------------------------------------------------------------------------------------
+# Structure du vaisseau (moteurs, découpleurs, réservoirs, expériences) mise en cache par étage
+G0 = 9.80665  # m/s² (accélération standard utilisée par KSP pour convertir l'Isp)
+
+
+@dataclass
+class EngineInfo:
+    engine:            object
+    part:              object
+    title:             str
+    stage:             int    # étage d'allumage
+    decouple_stage:    int    # étage de largage (-1 = jamais)
+    max_vacuum_thrust: float  # N
+    isp_vac:           float  # s
+    isp_asl:           float  # s (niveau de la mer de Kerbin)
+    propellants:       list
+
+    def isp_at(self, pressure):
+        """Isp (s) à la pression donnée (atm), interpolée entre le vide et le niveau de la mer."""
+        return max(0.0, self.isp_vac + (self.isp_asl - self.isp_vac) * pressure)
+
+    def thrust_at(self, pressure):
+        """Poussée max (N) à la pression donnée (atm) : à débit constant, la poussée suit l'Isp."""
+        return self.max_vacuum_thrust * self.isp_at(pressure) / self.isp_vac if self.isp_vac > 0 else 0.0
+
+
+@dataclass
+class DecouplerInfo:
+    decoupler: object
+    part:      object
+    stage:     int  # étage d'activation
+
+
+class VesselStructureCache:
+    """
+    Instantané de la structure du vaisseau, relu seulement quand control.current_stage change
+    (un seul stream scalaire, pas de polling). Une perte de pièces sans staging (casse, largage
+    par groupe d'actions) n'est pas détectée : appeler refresh(force=True).
+
+    Une relecture coûte des RPC proportionnels au vaisseau : 2 par pièce (masse, étage de
+    largage), 7 par moteur, 2 par découpleur, puis 2 par étage de largage et 1 par ressource.
+    Toutes les valeurs dérivées (poussée, Isp, TWR, ressources par étage) sont ensuite calculées
+    localement ; seule la poussée disponible (carburant, allumage) reste un stream.
+
+    Utilisation :
+        structure = VesselStructureCache(conn, vessel)
+        twr = structure.twr(mass(), gravity, pressure=0.0)
+        if structure.available_thrust() <= 0.1:
+            structure.activate_next_stage()
+    """
+
+    def __init__(self, conn, vessel):
+        self.conn = conn
+        self.vessel = vessel
+        streams = stream_registry(conn)
+        self._current_stage = streams.get(vessel, 'control.current_stage')
+        self.available_thrust = streams.get(vessel, 'available_thrust')
+        self.snapshots = 0  # nombre de relectures complètes (génération de l'instantané)
+        self.stage = None   # étage courant lors de la dernière relecture
+        self._key = None
+
+    # --- Invalidation ---
+    def _state(self):
+        return self._current_stage(),
+
+    def refresh(self, force=False):
+        """Relit la structure si l'étage a changé (ou si force)."""
+        state = self._state()
+        if not force and state == self._key:
+            return False
+        self._key = state
+        self.stage = state[0]
+        self.snapshots += 1
+        vessel = self.vessel
+        parts = vessel.parts
+
+        # Masse des pièces larguées à chaque étage ; l'étage de largage sert aussi aux moteurs
+        self.stage_mass = defaultdict(float)
+        decouple_stages = {}
+        for part in parts.all:
+            stage = decouple_stages[part] = part.decouple_stage
+            self.stage_mass[stage] += part.mass
+
+        self.engines = []
+        for engine in parts.engines:
+            part = engine.part
+            self.engines.append(EngineInfo(engine, part, part.title, part.stage, decouple_stages[part],
+                                           engine.max_vacuum_thrust, engine.vacuum_specific_impulse,
+                                           engine.kerbin_sea_level_specific_impulse, engine.propellant_names))
+        self.decouplers = [DecouplerInfo(d, d.part, d.part.stage) for d in parts.decouplers]
+        self.experiments = list(parts.experiments)
+
+        # Réservoirs : capacité de chaque ressource par étage de largage
+        self.tanks = {}
+        for stage in sorted(self.stage_mass):
+            resources = vessel.resources_in_decouple_stage(stage, cumulative=False)
+            self.tanks[stage] = {name: resources.max(name) for name in resources.names}
+
+        self.stages = defaultdict(list)  # étage d'allumage -> moteurs
+        for info in self.engines:
+            self.stages[info.stage].append(info)
+        return True
+
+    def release(self):
+        for handle in (self._current_stage, self.available_thrust):
+            handle.release()
+
+    def activate_next_stage(self, timeout=1.0):
+        """
+        Active l'étage suivant et attend que le stream d'étage le reflète : un stream n'est rafraîchi qu'à
+        la frame serveur suivante, une lecture faite juste après le staging (poussée, étage) serait périmée.
+        """
+        stage = self._current_stage()
+        self.vessel.control.activate_next_stage()
+        with self._current_stage.condition:
+            if self._current_stage() == stage:
+                self._current_stage.wait(timeout)
+        return self._current_stage()
+
+    # --- Lecture (relit la structure au besoin) ---
+    @property
+    def current_stage(self):
+        return self._current_stage()
+
+    def engines_in_stage(self, stage):
+        self.refresh()
+        return self.stages.get(stage, [])
+
+    def active_engines(self):
+        """Moteurs déjà allumés (étage d'allumage >= étage courant)."""
+        self.refresh()
+        stage = self.stage
+        return [e for e in self.engines if e.stage >= stage]
+
+    def next_stage_engines(self):
+        self.refresh()
+        return self.stages.get(self.stage - 1, [])
+
+    def max_thrust(self, pressure=0.0, engines=None):
+        """Poussée max (N) des moteurs donnés (défaut : actifs) à la pression donnée (atm)."""
+        engines = self.active_engines() if engines is None else engines
+        return sum(e.thrust_at(pressure) for e in engines)
+
+    def specific_impulse(self, pressure=0.0, engines=None):
+        """Isp combinée (s) : somme des poussées / somme des débits."""
+        engines = self.active_engines() if engines is None else engines
+        thrust = sum(e.thrust_at(pressure) for e in engines)
+        flow = sum(e.thrust_at(pressure) / e.isp_at(pressure) for e in engines if e.isp_at(pressure) > 0)
+        return thrust / flow if flow > 0 else 0.0
+
+    def twr(self, mass, gravity, pressure=0.0, engines=None):
+        return self.max_thrust(pressure, engines) / (mass * gravity)
+
+    def stage_resources(self, decouple_stage):
+        """Capacité (unités) de chaque ressource des réservoirs largués à `decouple_stage`."""
+        self.refresh()
+        return self.tanks.get(decouple_stage, {})
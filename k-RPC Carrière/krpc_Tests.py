@@ -5,6 +5,8 @@ import math
 import sys
 from kRPC_Tools import *
 from kRPC_NodeExecutor import nodeExec
+from kRPC_Orbit import KeplerOrbit, circularize
+from kRPC_Recorder import FlightRecorder, log_path
 
 # === Télémétrie ===
 from dataclasses import dataclass
@@ -20,35 +22,27 @@ class Telemetry:
     running:       bool  = True   # -
 
 telemetry = Telemetry()
-stop_event = threading.Event()
-dt = 0.1 # s
+dt = 0.1 # s (période du guidage)
 
-inside_width = 36
-title_text = "Télémetrie"
+screen = TerminalRenderer("Télémetrie", [
+    ('Altitude',    '{:>10.3f} km'),
+    ('Q dynamique', '{:>10.0f} Pa'),
+    ('Pitch',       '{:>10.1f} °'),
+    ('TWR',         '{:>10.2f}'),
+    ('Gaz',         '{:>10.1f} %'),
+    ('Phase mode',  '{}'),
+], max_rate=1 / dt)
 
 def show_telemetry():
-    print("\033[2J\033[?25l", end='')  # Efface écran + cache curseur
-    while not stop_event.is_set():
-        telemetry.altitude = altitude() / 1000  # Convertir en km
-        telemetry.q = dynamic_pressure() # Pa
-        telemetry.phase_mode = phase_mode
-        telemetry.pitch_ang = pitch_ang # °
-        telemetry.throttle = vessel.control.throttle * 100 # 0-1
-        telemetry.TWR = get_TWR() # -
-
-        print("\033[H", end='')  # Curseur en haut
-        print( "┌────────────────────────────────────┐")
-        print(f"│{center_colored_text(title_text, BOLD + BLUE, inside_width)}│")
-        print( "├────────────────────────────────────┤")
-        print(f"│ {pad(f'Altitude        : {telemetry.altitude:>10.3f} km', 35)}│")
-        print(f"│ {pad(f'Q dynamique     : {telemetry.q:>10.0f} Pa', 35)}│")
-        print(f"│ {pad(f'Pitch           : {telemetry.pitch_ang:>10.1f} °', 35)}│")
-        print(f"│ {pad(f'TWR             : {telemetry.TWR:>10.2f}  ', 35)}│")
-        print(f"│ {pad(f'Gaz             : {telemetry.throttle:>10.1f} %', 35)}│")
-        print(f"│ {pad(f'Phase mode      : {telemetry.phase_mode}', 35)}│")
-        print( "└────────────────────────────────────┘")
-        sys.stdout.flush()
-        time.sleep(dt)
+    """Une image de l'affichage (tâche 'affichage' du FlightRuntime)."""
+    telemetry.altitude = altitude() / 1000  # Convertir en km
+    telemetry.q = dynamic_pressure() # Pa
+    telemetry.phase_mode = phase_mode
+    telemetry.pitch_ang = pitch_ang # °
+    telemetry.throttle = throttle * 100 # % (dernière commande, sans RPC)
+    telemetry.TWR = get_TWR() # -
+    screen.render(telemetry.altitude, telemetry.q, telemetry.pitch_ang, telemetry.TWR,
+                  telemetry.throttle, telemetry.phase_mode)
 
 # === Initialisation ===
 os.system('cls')
@@ -59,6 +53,7 @@ print("\033[H", end='')     # Curseur en haut
 # Connexion à KSP
 conn = krpc.connect(name='Orbiter4')
 vessel = conn.space_center.active_vessel
+streams = stream_registry(conn)
 srf_ref = vessel.surface_velocity_reference_frame
 obt_ref = vessel.orbital_reference_frame
 vel_ref = vessel.orbit.body.reference_frame
@@ -70,34 +65,37 @@ vessel.control.throttle = 1.0
 
 booster_type = 'liquid' # 'liquid' ; 'solid'
 
-booster_stage = vessel.control.current_stage - 1
+# Structure du vaisseau (moteurs, étages, réservoirs) : relue seulement au changement d'étage
+structure = VesselStructureCache(conn, vessel)
+booster_stage = structure.current_stage - 1
 
-ut = conn.add_stream(getattr, conn.space_center, 'ut')
-altitude = conn.add_stream(getattr, vessel.flight(), 'mean_altitude')
-apoapsis = conn.add_stream(getattr, vessel.orbit, 'apoapsis_altitude')
+ut = streams.get(conn.space_center, 'ut')
+altitude = streams.get(vessel, 'flight.mean_altitude')
+apoapsis = streams.get(vessel, 'orbit.apoapsis_altitude')
 booster_stage_ressources = vessel.resources_in_decouple_stage(stage=booster_stage, cumulative=False)
 
 if booster_type == 'solid':
-    booster_fuel = conn.add_stream(booster_stage_ressources.amount, 'SolidFuel')
+    booster_fuel = streams.get(booster_stage_ressources, 'amount', 'SolidFuel')
 elif booster_type == 'liquid':
-    booster_fuel = conn.add_stream(booster_stage_ressources.amount, 'LiquidFuel')
+    booster_fuel = streams.get(booster_stage_ressources, 'amount', 'LiquidFuel')
 else:
     booster_fuel = -1
 
-dynamic_pressure = conn.add_stream(getattr, vessel.flight(), 'dynamic_pressure')
+dynamic_pressure = streams.get(vessel, 'flight.dynamic_pressure')
 # velocity = conn.add_stream(getattr, vessel.flight(vel_ref), 'velocity')
-mass = conn.add_stream(getattr, vessel, 'mass')
-thrust = conn.add_stream(getattr, vessel, 'thrust')
+mass = streams.get(vessel, 'mass')
+thrust = streams.get(vessel, 'thrust')
+radius = streams.get(vessel, 'orbit.radius')
+mu = vessel.orbit.body.gravitational_parameter
+rates = StreamRatePolicy(streams, phase='prelaunch')
 
 def get_TWR():
-    mu = vessel.orbit.body.gravitational_parameter
-    r = vessel.orbit.radius
-    g_local = mu / (r ** 2)
+    g_local = mu / (radius() ** 2)
     return thrust() / (mass() * g_local)
 
 countdown()
 vessel.control.activate_next_stage()
-current_available_max_thrust = vessel.available_thrust
+current_available_max_thrust = vessel.available_thrust  # RPC : le stream n'est à jour qu'à la frame suivante
 
 ap = vessel.auto_pilot
 ap.target_pitch_and_heading(90, 90)
@@ -114,25 +112,13 @@ if booster_fuel == -1:
     booster_present = False
 else:
     booster_present = True
-boosters_separated = False
+separation = BoosterSeparation(booster_type if booster_present else None, current_available_max_thrust)
 active_pid = False
 phase_mode = "launch"
 pitch_ang = 90 # °
+throttle = 1.0 # 0-1 (dernière commande envoyée)
 os.system('cls')
 
-# === Lancement du thread d'affichage ===
-thread_show_telemetry = threading.Thread(target=show_telemetry)
-thread_show_telemetry.start()
-
-def pitch_program():
-    switch_alt = 250 # m
-    pitch_ang = 0 # °
-    scale_factor = 1 # - 
-    alt_diff = scale_factor * vessel.orbit.body.atmosphere_depth - switch_alt # m
-    if altitude() >= switch_alt:
-        pitch_ang = max(0, min(90, 90 * math.sqrt((apoapsis() - switch_alt) / alt_diff)))
-    return pitch_ang
-
 # Création du PID pour l'accélération
 thrust_pid = PID(kp=1, ki=0.05, setpoint=2, anti_integral_windup=False)
 
@@ -140,95 +126,116 @@ thrust_pid = PID(kp=1, ki=0.05, setpoint=2, anti_integral_windup=False)
 target_apoapsis = 100_000 # m
 target_heading = 90 # ° | 0 ° : Nord ; 90 ° : Est
 
-try:
-    while True:
-        if phase_mode == 'launch' and altitude() >= 150:
-            ap.target_pitch_and_heading(90, target_heading)
-            current_max = vessel.max_thrust
-            phase_mode = 'roll'
-        
-        elif phase_mode == 'roll':
-            ap.target_roll = 0
-            phase_mode = 'pitch_program'
-
-        elif phase_mode == 'pitch_program' and altitude() >= 250:
-            pitch_ang = 90 - pitch_program()
-            ap.target_pitch_and_heading(pitch_ang, target_heading)
-            
-            # PID
-            # Régulation des gaz    
-            current_TWR = get_TWR()
-            if active_pid:
-                throttle_output = thrust_pid.update(current_TWR, dt)
-                vessel.control.throttle = max(0.0, min(1.0, throttle_output))
-                error = thrust_pid.setpoint - current_TWR
-
-            # Séparation des boosters
-            if booster_present:
-                if not boosters_separated:
-                    if booster_type == 'solid':
-                        if booster_fuel < 0.1:
-                            vessel.control.activate_next_stage()
-                            boosters_separated = True
-                            print("Séparation des boosters (solides)")
-                    elif booster_type == 'liquid':
-                        if vessel.available_thrust < current_available_max_thrust:
-                            vessel.control.activate_next_stage()
-                            boosters_separated = True
-                            print("Séparation des boosters (liquides)")
-            
-            if vessel.available_thrust <= 0.1:
-                vessel.control.activate_next_stage()
-
-            if apoapsis() >= 0.95 * target_apoapsis:
-                vessel.control.throttle = 0.25
-
-                if apoapsis() >= target_apoapsis:
-                    vessel.control.throttle = 0
-                    phase_mode = 'circularization'
-
-        elif phase_mode == 'circularization':
-            # Equation de Vis-viva
-            target_apoapsis = apoapsis()
-            mu = vessel.orbit.body.gravitational_parameter
-            r = vessel.orbit.apoapsis
-            a = vessel.orbit.semi_major_axis
-            body_radius = vessel.orbit.body.equatorial_radius
-            vc = math.sqrt(mu * ((2/r) - (1/a)))
-            v = math.sqrt(mu/(body_radius+target_apoapsis))
-            delta_v = vc - v
-            # print(f"Δv requis: {delta_v:.1f} m/s")
-
-            # Création d'un noeud de manoeuvre
-            node = vessel.control.add_node(
-                ut = ut()+ vessel.orbit.time_to_apoapsis,
-                prograde = -delta_v)
-            
-            while altitude() <= vessel.orbit.body.atmosphere_depth - 1000:
-                time.sleep(0.1)
-            vessel.auto_pilot.reference_frame = node.reference_frame
-            vessel.auto_pilot.target_direction = (0, 1, 0)  # Vecteur du nœud de manœuvre
-            vessel.auto_pilot.wait()
-
-            ap.disengage()
-            vessel.control.sas = True
-            
-            while altitude() <= vessel.orbit.body.atmosphere_depth:
-                time.sleep(0.1)
-            
-            # Execution du noeud de manoeuvre de circularisation
-            nodeExec(conn)
-            break
+# Programme de tangage : profil optimisé hors ligne s'il existe, sinon pitch_program (hauteur d'atmosphère lue une fois)
+pitch_law, pitch_source = ascent_pitch(vessel.orbit.body.atmosphere_depth, target_apoapsis)
+
+# --- Enregistrement (mesures vues par le guidage + commandes, rejouable avec kRPC_Replay.py) ---
+rec = FlightRecorder(fields=[('t', 'f8'), ('altitude', 'f8'), ('apoapsis', 'f8'), ('q', 'f4'), ('twr', 'f4'),
+                             ('available_thrust', 'f4'), ('booster_fuel', 'f4'), ('throttle', 'f4'),
+                             ('pitch', 'f4'), ('stage', 'i2')],
+                     path=log_path('krpc_Tests'), archive=log_path('krpc_Tests', ext='.klog'))
+launch_ut = ut()
+
+def set_throttle(value):
+    """Envoie la commande de gaz seulement si elle change (un RPC de moins par tick sinon)."""
+    global throttle
+    if value != throttle:
+        vessel.control.throttle = value
+        throttle = value
+
+def record():
+    rec.append(ut() - launch_ut, altitude(), apoapsis(), dynamic_pressure(), get_TWR(),
+               structure.available_thrust(), booster_fuel() if booster_present else 0.0,
+               throttle, pitch_ang, structure.current_stage)
+
+# === Tâches du runtime ===
+def guidage():
+    """Programme de tangage et régulation des gaz ; True quand l'apoapse visée est atteinte."""
+    global phase_mode, pitch_ang
+    rates.update()
+    if phase_mode == 'launch' and altitude() >= 150:
+        ap.target_pitch_and_heading(90, target_heading)
+        rates.set_phase('ascent')
+        phase_mode = 'roll'
+
+    elif phase_mode == 'roll':
+        ap.target_roll = 0
+        phase_mode = 'pitch_program'
+
+    elif phase_mode == 'pitch_program' and altitude() >= 250:
+        pitch_ang = pitch_law(altitude(), apoapsis())
+        ap.target_pitch_and_heading(pitch_ang, target_heading)
+
+        # PID
+        # Régulation des gaz
+        if active_pid:
+            throttle_output = thrust_pid.update(get_TWR(), dt)
+            set_throttle(max(0.0, min(1.0, throttle_output)))
+
+        if apoapsis() >= 0.95 * target_apoapsis:
+            set_throttle(0.25)
+
+            if apoapsis() >= target_apoapsis:
+                set_throttle(0)
+                phase_mode = 'circularization'
+                record()
+                runtime.stop()
+                return True
+    record()
+    return False
+
+def staging():
+    """Séparation des boosters et staging à poussée nulle (indépendant du guidage et de l'affichage)."""
+    if phase_mode != 'pitch_program':
+        return False
+    reason = separation.update(structure.available_thrust(), booster_fuel() if booster_present else 0.0)
+    if reason is not None:
+        vessel.control.activate_next_stage()
+        if reason == 'boosters':
+            print(f"Séparation des boosters ({'solides' if booster_type == 'solid' else 'liquides'})")
+    return False
+
+runtime = FlightRuntime(conn)
+runtime.every(1 / dt, guidage, name='guidage')
+runtime.every(20, staging, name='staging')
+runtime.every(1, verifier_biome(conn, vessel), name='biome', critical=False)
+runtime.every(1 / dt, show_telemetry, name='affichage', critical=False)
 
+try:
+    print("\033[2J\033[?25l", end='')  # Efface écran + cache curseur
+    runtime.run()
+
+    # === Circularisation ===
+    rates.set_phase('coast')
+    # Orbite képlérienne locale : un vecteur d'état, puis nœud de circularisation à la prochaine apoapse
+    maneuver = circularize(KeplerOrbit.from_vessel(conn, vessel))
+    # print(f"Δv requis: {maneuver.delta_v:.1f} m/s")
+
+    # Création d'un noeud de manoeuvre
+    node = maneuver.add_node(vessel.control)
+    
+    while altitude() <= vessel.orbit.body.atmosphere_depth - 1000:
+        time.sleep(0.1)
+    vessel.auto_pilot.reference_frame = node.reference_frame
+    vessel.auto_pilot.target_direction = (0, 1, 0)  # Vecteur du nœud de manœuvre
+    vessel.auto_pilot.wait()
+
+    ap.disengage()
+    vessel.control.sas = True
+    
+    while altitude() <= vessel.orbit.body.atmosphere_depth:
         time.sleep(0.1)
+    
+    # Execution du noeud de manoeuvre de circularisation
+    nodeExec(conn)
 
 except KeyboardInterrupt:
     print("Interruption manuelle                  ")
-    stop_event.set()
-    thread_show_telemetry.join()
+    runtime.stop()
 
 finally:
     print("Fin du script                          ")
-    stop_event.set()
-    thread_show_telemetry.join()
-    conn.close()
\ No newline at end of file
+    print(f"Loi de tangage : {pitch_source}")
+    screen.report()
+    rec.close()
+    conn.close()
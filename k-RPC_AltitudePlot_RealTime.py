@@ -1,7 +1,10 @@
 import krpc
-import time
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'k-RPC Carrière'))
+from kRPC_LivePlot import LivePlot
+from kRPC_Tools import stream_registry
 
 # Connexion au serveur kRPC
 print("Connexion à KSP via kRPC...")
@@ -9,12 +12,13 @@ conn = krpc.connect(name="Altitude Tracker")
 vessel = conn.space_center.active_vessel
 print("Connexion établie ! Suivi de l'altitude du vaisseau en cours...\n")
 
-# Variables pour stocker les données
-time_data = []  # Temps écoulé
-altitude_data = []  # Altitude par rapport au niveau de la mer
+# Streams (aucun RPC par image)
+streams = stream_registry(conn)
+ut = streams.get(conn.space_center, 'ut')
+altitude = streams.get(vessel, 'flight.mean_altitude')  # Altitude par rapport au niveau de la mer
 
-# Initialiser le temps de référence
-start_time = time.time()
+# Initialiser le temps de référence (temps de jeu)
+start_ut = ut()
 
 vessel.control.throttle = 1
 vessel.control.sas = True
@@ -29,40 +33,14 @@ vessel.control.activate_next_stage()
 # plt.style.use('fivethirtyeight') # Style du site 538
 # plt.style.use('dark_background') # Fond noir avec courbes lumineuses
 
-fig, ax = plt.subplots()
-line, = ax.plot([], [], label="Altitude (m)", color='tab:red')
-ax.set_title("Évolution de l'altitude en temps réel")
-ax.set_xlabel("Temps (s)")
-ax.set_ylabel("Altitude (m)")
-ax.legend()
-plt.grid(axis='y')
-
-# Fonction pour initialiser le graphique
-def init():
-    line.set_data([], [])
-    return line,
-
-# Fonction qui met à jour les données du graphique
-def update(frame):
-    # Récupérer le temps et l'altitude
-    current_time = time.time() - start_time
-    altitude = vessel.flight().mean_altitude  # Altitude par rapport au niveau de la mer
-
-    # Ajouter les données
-    time_data.append(current_time)
-    altitude_data.append(altitude)
-
-    # Mettre à jour les données de la ligne
-    line.set_data(time_data, altitude_data)
-
-    # Ajuster dynamiquement les limites des axes
-    ax.set_xlim(0, max(10, current_time + 1))  # Étend l'axe X
-    ax.set_ylim(0, max(1000, max(altitude_data) + 100))  # Étend l'axe Y
-
-    return line,
+# Tampon de taille fixe + décimation min/max : le coût d'une image reste constant sur un vol de plusieurs heures
+plot = LivePlot([("Altitude (m)", 'tab:red')], title="Évolution de l'altitude en temps réel")
 
-# Animation avec matplotlib
-ani = FuncAnimation(fig, update, init_func=init, blit=False, interval=100)
+# Fonction qui ajoute un échantillon avant chaque image
+def update():
+    plot.append(ut() - start_ut, altitude())
 
-# Afficher le graphique
-plt.show()
\ No newline at end of file
+# Animation (blitting) et affichage du graphique
+plot.run(update, interval=100)
+plot.report()
+streams.close()